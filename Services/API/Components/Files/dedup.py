@@ -0,0 +1,44 @@
+from pymongo import collection
+from datetime import datetime as dt, timezone
+
+# Etapas en orden, con el `process` que cada una deja en `results` y los campos propios que se copian.
+STAGES: list[tuple[str, str, tuple]] = [
+    ('ocr', 'Docling', ()),
+    ('ner', 'NER', ('skills',)),
+    ('cv', 'CV', ('picture_id',)),
+]
+
+
+def find_source(coll: collection.Collection, sha256: str) -> dict:
+    """El documento ya procesado (lo más completo posible) con el mismo contenido."""
+    for stage, _, _ in reversed(STAGES):
+        source = coll.find_one({'sha256': sha256, f'{stage}_status': 'done'}, sort=[('_id', -1)])
+        if source is not None:
+            return source
+    return None
+
+
+def inherit_results(source: dict) -> dict:
+    """
+    Campos para un documento nuevo con el mismo contenido que `source`: se copian los
+    resultados de las etapas ya terminadas y la primera etapa sin terminar queda en cola.
+    """
+    now: dt = dt.now(timezone.utc)
+    fields: dict = {'results': [], 'dedup_of': source['file_id']}
+    pending: bool = False
+    for stage, process, extra in STAGES:
+        result = next((r for r in reversed(source.get('results', [])) if r.get('process') == process), None)
+        if not pending and source.get(f'{stage}_status') == 'done' and result is not None:
+            fields['results'].append(result)
+            fields[f'{stage}_status'] = 'done'
+            fields[f'{stage}_finished_at'] = now
+            for field in extra:
+                if field in source:
+                    fields[field] = source[field]
+        elif not pending:
+            fields[f'{stage}_status'] = 'pending'
+            fields[f'{stage}_queued_at'] = now
+            pending = True
+        else:
+            fields[f'{stage}_status'] = 'waiting'
+    return fields
@@ -1,30 +1,40 @@
 from pymongo import MongoClient, collection
+from bson import ObjectId
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from Components.Mongo.mongo_connection import mongoDB_connection
-from datetime import datetime as dt
+from Components.Files.skills import normalize_skill
+from Components.Files.listing import OPTIONAL_FIELDS, InvalidListing, list_page, projection, serialize
+from Components.Search.skill_index import get_skill_index
+from Components.Search.text_index import get_text_index
+from datetime import datetime as dt, timedelta, timezone
 from typing import Literal
-import re
 from fastapi import Query
 
 
 router = APIRouter()
 
-@router.get('/all', summary= 'Returns all files', description= 'Retrieves information for every file present in MongoDB', tags=['Files'])
-def get_files():
+# Parámetros comunes de los listados (ver Components/Files/listing.py)
+_LIMIT = Query(50, ge=1, le=200)
+_CURSOR = Query(None, description='`next_cursor` de la página anterior')
+_FIELDS = Query(None, description=f"Campos extra al resumen, separados por coma: {', '.join(OPTIONAL_FIELDS)}")
+_WITH_TOTAL = Query(True, description='Incluir el total (aproximado/cacheado)')
+
+@router.get('/all', summary= 'Returns all files', description= 'Retrieves a page of files (newest first) with a summary projection; use next_cursor for the next page and fields= for heavy payloads', tags=['Files'])
+def get_files(limit: int = _LIMIT, cursor: str = _CURSOR, fields: str = _FIELDS, with_total: bool = _WITH_TOTAL):
     try:
         db: MongoClient = mongoDB_connection()
         coll = db['nlp-vitae']['files']
         
-        files = list(coll.find().sort('creation_date', -1))
-
-        if files:
-            for file in files:
-                file['_id'] = str(file['_id'])
+        try:
+            page = list_page(coll, {}, limit, cursor=cursor, fields=fields, with_total=with_total)
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
 
+        if page['data'] or cursor:
             return JSONResponse(
                 status_code=200,
-                content={'data': files}
+                content=page
             )
         else:
             return JSONResponse(
@@ -44,10 +54,9 @@ def get_file(file_id: str):
         coll = db['nlp-vitae']['files']
         file = coll.find_one({'file_id' : file_id})
         if file is not None:
-            file['_id'] = str(file['_id'])
             return JSONResponse(
                 status_code=200,
-                content={'data' : file}
+                content={'data' : serialize(file)}
             )
         if file is None:
             return JSONResponse(
@@ -61,11 +70,12 @@ def get_file(file_id: str):
         )
     
 @router.get('/filter/date/{creation_date}', summary='Returns files information for a specific date', description="It retrieves file information from MongoDB using a date as filter", tags=['Files'])
-def get_files(creation_date: str):
+def get_files_by_date(creation_date: str, limit: int = _LIMIT, cursor: str = _CURSOR, fields: str = _FIELDS,
+                      with_total: bool = _WITH_TOTAL):
     try:
         try:
-            date_obj = dt.strptime(creation_date, "%d-%m-%Y")
-            date_str = date_obj.strftime("%d-%m-%Y")
+            # El día en la hora del servidor (la misma con la que se escribe `creation_date`).
+            day_start = dt.strptime(creation_date, "%d-%m-%Y").astimezone(timezone.utc)
         except ValueError:
             return JSONResponse(
                 status_code=400,
@@ -75,15 +85,17 @@ def get_files(creation_date: str):
         db: MongoClient = mongoDB_connection()
         coll = db['nlp-vitae']['files']
         
-        files = list(coll.find({'creation_date': {'$regex': f'^{date_str}'}}))
-
-        if files:
-            for file in files:
-                file['_id'] = str(file['_id'])
+        # Rango sobre el índice `created_at` (en lugar de un $regex sobre el texto).
+        query = {'created_at': {'$gte': day_start, '$lt': day_start + timedelta(days=1)}}
+        try:
+            page = list_page(coll, query, limit, cursor=cursor, fields=fields, with_total=with_total, sort='created_at')
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
 
+        if page['data'] or cursor:
             return JSONResponse(
                 status_code=200,
-                content={'data': files}
+                content=page
             )
         else:
             return JSONResponse(
@@ -95,6 +107,51 @@ def get_files(creation_date: str):
             status_code=500,
             content={'message': f'An exception occurred: {err}'}
         )
+
+@router.get('/filter/range', summary='Returns files created in a time range', description="Files with from <= created_at < to (ISO 8601; without offset, server local time), newest first", tags=['Files'])
+def get_files_by_range(
+    date_from: dt = Query(None, alias='from', description='Inicio (inclusive), p.ej. 2025-03-01T00:00:00-03:00'),
+    date_to: dt = Query(None, alias='to', description='Fin (exclusivo)'),
+    limit: int = _LIMIT,
+    cursor: str = _CURSOR,
+    fields: str = _FIELDS,
+    with_total: bool = _WITH_TOTAL
+):
+    try:
+        if date_from is None and date_to is None:
+            return JSONResponse(status_code=400, content={'message': 'Debe indicar from y/o to'})
+        bounds = {}
+        if date_from is not None:
+            bounds['$gte'] = date_from.astimezone(timezone.utc)
+        if date_to is not None:
+            bounds['$lt'] = date_to.astimezone(timezone.utc)
+        if date_from is not None and date_to is not None and bounds['$gte'] >= bounds['$lt']:
+            return JSONResponse(status_code=400, content={'message': 'from debe ser anterior a to'})
+
+        db: MongoClient = mongoDB_connection()
+        coll = db['nlp-vitae']['files']
+
+        try:
+            page = list_page(coll, {'created_at': bounds}, limit, cursor=cursor, fields=fields,
+                             with_total=with_total, sort='created_at')
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                **page,
+                'filters': {
+                    'from': bounds['$gte'].isoformat() if '$gte' in bounds else None,
+                    'to': bounds['$lt'].isoformat() if '$lt' in bounds else None
+                }
+            }
+        )
+    except Exception as err:
+        return JSONResponse(
+            status_code=500,
+            content={'message': f'An exception occurred: {err}'}
+        )
     
 # --- NUEVO: endpoints de imagen (GridFS) ---
 
@@ -206,19 +263,18 @@ def get_picture_by_file(file_id: str, download: bool = False):
 def get_files_by_skills(
     skills: str = Query(..., description="Lista de habilidades separadas por coma, p.ej.: 'Angular, NodeJS, MongoDB'"),
     mode: Literal['any', 'all'] = Query('any', description="'any' (al menos una) o 'all' (todas)"),
-    page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=200)
+    limit: int = _LIMIT,
+    cursor: str = _CURSOR,
+    fields: str = _FIELDS,
+    with_total: bool = _WITH_TOTAL
 ):
     """
-    Busca en la estructura:
-      results: [
-        { process: "NER", data: { habilidades_tecnicas: [ ... ] } },
-        ...
-      ]
+    Busca sobre `skills`: las habilidades canónicas que NER guarda en cada documento
+    (índice multikey `skills`). Las habilidades pedidas se normalizan igual, así que
+    "NodeJS", "node.js" y "Node" encuentran lo mismo, y "Java" no matchea "JavaScript".
 
     - mode='any': al menos una habilidad coincide
     - mode='all': deben coincidir todas
-    - Case-insensitive y tolera variaciones (usa regex escapado)
     """
     try:
         # Parseo y sanitización de skills
@@ -226,42 +282,170 @@ def get_files_by_skills(
         if not skills_list:
             return JSONResponse(status_code=400, content={'message': 'Debe indicar al menos una habilidad'})
 
-        # Compilo regex case-insensitive escapando caracteres especiales (sirve para "C++", "CSS/Sass", etc.)
-        patterns = [re.compile(re.escape(s), re.IGNORECASE) for s in skills_list]
+        # Igualdad exacta sobre la forma canónica: la resuelve el índice `skills`.
+        canonical = list(dict.fromkeys(filter(None, (normalize_skill(s) for s in skills_list))))
 
         db: MongoClient = mongoDB_connection()
         coll = db['nlp-vitae']['files']
 
-        elem_match = {'process': 'NER'}
-
-        # Armado de condición sobre el array data.habilidades_tecnicas del elemento NER
-        if mode == 'all':
-            elem_match['data.habilidades_tecnicas'] = {'$all': patterns}
-        else:
-            elem_match['data.habilidades_tecnicas'] = {'$in': patterns}
+        query = {'skills': {'$all' if mode == 'all' else '$in': canonical}}
 
-        query = {'results': {'$elemMatch': elem_match}}
-
-        # Paginación
-        skip = (page - 1) * limit
-
-        total = coll.count_documents(query)
-        cursor = coll.find(query).sort('creation_date', -1).skip(skip).limit(limit)
-        files = list(cursor)
+        # Paginación por cursor: sin skip(), cada página cuesta lo mismo.
+        try:
+            page = list_page(coll, query, limit, cursor=cursor, fields=fields, with_total=with_total)
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
 
-        if not files:
+        if not page['data'] and not cursor:
             return JSONResponse(
                 status_code=404,
-                content={'message': 'No files found', 'total': total, 'page': page, 'limit': limit}
+                content={'message': 'No files found', 'limit': limit}
             )
 
-        for f in files:
-            f['_id'] = str(f['_id'])
+        return JSONResponse(
+            status_code=200,
+            content={
+                **page,
+                'filters': {
+                    'skills': skills_list,
+                    'canonical': canonical,
+                    'mode': mode
+                }
+            }
+        )
+
+    except Exception as err:
+        return JSONResponse(
+            status_code=500,
+            content={'message': f'An exception occurred: {err}'}
+        )
+
+@router.get(
+    '/search',
+    summary='Búsqueda full-text sobre el texto de los CVs',
+    description='Ranking BM25 sobre el texto extraído por el OCR. Admite frases entre comillas: \'python "ingeniero de software"\'',
+    tags=['Files']
+)
+def search_files(
+    q: str = Query(..., min_length=1, description='Términos y/o frases entre comillas'),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=200),
+    fields: str = _FIELDS
+):
+    """
+    Consulta el índice invertido local (Components/Search/text_index.py): los términos se
+    normalizan igual que el texto (sin tildes, sin stopwords, stemming liviano). Las frases
+    son obligatorias; los términos sueltos suman puntaje. Cada resultado es el resumen del
+    listado (Components/Files/listing.py) más los campos pedidos con `fields=`.
+    """
+    try:
+        try:
+            summary = projection(fields)
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
+
+        index = get_text_index()
+        if not index.ready:
+            return JSONResponse(status_code=503, content={'message': 'Search index is still building'})
+
+        total, ranked = index.search(q, limit=limit, offset=(page - 1) * limit)
+
+        db: MongoClient = mongoDB_connection()
+        coll = db['nlp-vitae']['files']
+        # El índice full-text identifica los documentos por su `_id`.
+        files = {str(f['_id']): f for f in coll.find({'_id': {'$in': [ObjectId(hit['id']) for hit in ranked]}}, summary)}
+
+        data = []
+        for hit in ranked:
+            file = files.get(hit['id'])
+            if file is None:
+                continue
+            file = serialize(file)
+            file['score'] = hit['score']
+            data.append(file)
 
         return JSONResponse(
             status_code=200,
             content={
-                'data': files,
+                'data': data,
+                'pagination': {
+                    'total': total,
+                    'page': page,
+                    'limit': limit,
+                    'pages': (total + limit - 1) // limit
+                },
+                'query': q
+            }
+        )
+
+    except Exception as err:
+        return JSONResponse(
+            status_code=500,
+            content={'message': f'An exception occurred: {err}'}
+        )
+
+@router.get(
+    '/search/skills',
+    summary='Busca archivos por habilidades, ordenados por relevancia',
+    description="Ranking sobre el índice invertido en memoria: puntaje = suma de los pesos de las habilidades que coinciden (opcionalmente ponderadas por IDF)",
+    tags=['Files']
+)
+def search_files_by_skills(
+    skills: str = Query(..., description="Habilidades separadas por coma, con peso opcional: 'Python:2, Docker, AWS:1.5'"),
+    mode: Literal['any', 'all'] = Query('any', description="'any' (al menos una) o 'all' (todas)"),
+    idf: bool = Query(False, description='Pondera cada habilidad por su rareza (IDF)'),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=200),
+    fields: str = _FIELDS
+):
+    """
+    El ranking se resuelve en memoria (Components/Search/skill_index.py) sin consultar Mongo;
+    sólo se leen los documentos de la página pedida, por `file_id`, con la proyección
+    resumida del listado (más los campos pedidos con `fields=`).
+    """
+    try:
+        try:
+            summary = projection(fields)
+        except InvalidListing as err:
+            return JSONResponse(status_code=400, content={'message': str(err)})
+
+        weights: dict[str, float] = {}
+        for item in skills.split(','):
+            name, _, weight = item.rpartition(':') if ':' in item else (item, '', '')
+            skill = normalize_skill(name)
+            if skill is None:
+                continue
+            try:
+                weights[skill] = weights.get(skill, 0.0) + (float(weight) if weight.strip() else 1.0)
+            except ValueError:
+                return JSONResponse(status_code=400, content={'message': f'Peso inválido para {name.strip()}: {weight}'})
+        if not weights:
+            return JSONResponse(status_code=400, content={'message': 'Debe indicar al menos una habilidad'})
+
+        index = get_skill_index()
+        if not index.ready:
+            return JSONResponse(status_code=503, content={'message': 'Skill index is still building'})
+
+        total, ranked = index.search(weights, mode=mode, idf=idf, limit=limit, offset=(page - 1) * limit)
+
+        db: MongoClient = mongoDB_connection()
+        coll = db['nlp-vitae']['files']
+        files = {f['file_id']: f for f in coll.find({'file_id': {'$in': [hit['file_id'] for hit in ranked]}}, summary)}
+
+        data = []
+        for hit in ranked:
+            file = files.get(hit['file_id'])
+            if file is None:
+                continue
+            file = serialize(file)
+            file['score'] = hit['score']
+            file['matched_skills'] = hit['matched']
+            data.append(file)
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                'data': data,
                 'pagination': {
                     'total': total,
                     'page': page,
@@ -269,8 +453,9 @@ def get_files_by_skills(
                     'pages': (total + limit - 1) // limit
                 },
                 'filters': {
-                    'skills': skills_list,
-                    'mode': mode
+                    'skills': weights,
+                    'mode': mode,
+                    'idf': idf
                 }
             }
         )
@@ -0,0 +1,156 @@
+"""
+Listados paginados de `files`: paginación por cursor (keyset), proyección resumida y
+totales aproximados/cacheados.
+
+- Cursor: la página siguiente se pide con `_id < último _id` sobre el índice de `_id`
+  (orden de alta), o con `(created_at, _id) < último` sobre el índice `created_at` en los
+  listados por fecha; así cada página cuesta lo mismo sin importar la profundidad (sin skip()).
+  El cursor es opaco para el cliente (base64 url-safe).
+- Proyección: por defecto sólo el resumen del documento; los campos pesados (texto del OCR,
+  JSON del NER) se piden explícitamente con `fields=`.
+- Total: sin filtro sale de la metadata de la colección (estimated_document_count); con filtro
+  se cuenta y se cachea `LISTING_COUNT_TTL` segundos por consulta.
+"""
+from pymongo import collection
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime as dt, timezone
+from threading import Lock
+from typing import Any
+import base64
+import binascii
+import os
+import struct
+import time
+
+# Cantidad de habilidades que viaja en el resumen (el array completo con fields=skills).
+TOP_SKILLS: int = int(os.getenv('LISTING_TOP_SKILLS', '10'))
+
+SUMMARY_PROJECTION: dict = {
+    'file_id': 1,
+    'name': 1,
+    'creation_date': 1,
+    'created_at': 1,
+    'size': 1,
+    'picture_id': 1,
+    'dedup_of': 1,
+    'ocr_status': 1,
+    'ner_status': 1,
+    'cv_status': 1,
+    'ocr_finished_at': 1,
+    'ner_finished_at': 1,
+    'cv_finished_at': 1,
+    'skills': {'$slice': TOP_SKILLS},
+}
+
+# Campos que se pueden agregar al resumen con `fields=` (separados por coma).
+OPTIONAL_FIELDS: tuple = ('results', 'skills', 'ner_provisional', 'sha256', 'storage_format', 'ocr_profile')
+
+
+class InvalidListing(ValueError):
+    """Cursor o `fields` inválidos: el endpoint responde 400."""
+
+
+def projection(fields: str = None) -> dict:
+    """Proyección del resumen más los campos opcionales pedidos."""
+    result: dict = dict(SUMMARY_PROJECTION)
+    for field in (f.strip() for f in (fields or '').split(',')):
+        if not field:
+            continue
+        if field not in OPTIONAL_FIELDS:
+            raise InvalidListing(f'Unknown field: {field}. Allowed: {", ".join(OPTIONAL_FIELDS)}')
+        result[field] = 1
+    return result
+
+
+def encode_cursor(doc: dict, sort: str = '_id') -> str:
+    """_id (12 bytes) y, si se ordena por `created_at`, sus milisegundos (8 bytes)."""
+    raw: bytes = ObjectId(doc['_id']).binary
+    if sort == 'created_at':
+        created: dt = doc['created_at'].replace(tzinfo=doc['created_at'].tzinfo or timezone.utc)
+        raw += struct.pack('<q', round(created.timestamp() * 1000))
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str = '_id') -> dict:
+    """Condición de "después del cursor" para el orden descendente `sort`."""
+    try:
+        raw: bytes = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        if len(raw) != (20 if sort == 'created_at' else 12):
+            raise ValueError('cursor length')
+        last_id: ObjectId = ObjectId(raw[:12])
+        if sort != 'created_at':
+            return {'_id': {'$lt': last_id}}
+        created: dt = dt.fromtimestamp(struct.unpack('<q', raw[12:])[0] / 1000, timezone.utc)
+    except (binascii.Error, InvalidId, ValueError, OverflowError, OSError) as err:
+        raise InvalidListing('Invalid cursor') from err
+    return {'$or': [{'created_at': {'$lt': created}}, {'created_at': created, '_id': {'$lt': last_id}}]}
+
+
+def serialize(value: Any) -> Any:
+    """
+    El documento listo para JSONResponse: ObjectId y fechas como texto, también dentro de
+    sub-documentos y arrays (p.ej. `ner_provisional.created_at` o `results[].timestamp`).
+    """
+    if isinstance(value, dict):
+        return {key: serialize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dt):
+        return value.isoformat()
+    return value
+
+
+class CountCache:
+    """Totales por consulta, cacheados unos segundos: el total de un listado no necesita ser exacto."""
+
+    def __init__(self, ttl: float = None):
+        self.ttl: float = ttl if ttl is not None else float(os.getenv('LISTING_COUNT_TTL', '30'))
+        self._lock: Lock = Lock()
+        self._counts: dict[str, tuple[float, int]] = {}
+
+    def count(self, coll: collection.Collection, query: dict) -> tuple[int, bool]:
+        """(total, aproximado)."""
+        if not query:
+            return coll.estimated_document_count(), True
+        key: str = repr(sorted(query.items()))
+        now: float = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1], True
+        total: int = coll.count_documents(query)
+        with self._lock:
+            # Consultas libres (p.ej. combinaciones de habilidades): se descartan las vencidas.
+            if len(self._counts) > 1000:
+                self._counts = {k: v for k, v in self._counts.items() if now - v[0] < self.ttl}
+            self._counts[key] = (now, total)
+        return total, False
+
+
+_counts: CountCache = CountCache()
+
+
+def list_page(coll: collection.Collection, query: dict, limit: int, cursor: str = None,
+              fields: str = None, with_total: bool = True, sort: str = '_id') -> dict:
+    """
+    Una página del listado, de la más nueva a la más vieja según `sort` ('_id' o
+    'created_at'). Devuelve `data` y `pagination` con `next_cursor` (None en la última
+    página) y el total (aproximado si así se indica).
+    """
+    page_query: dict = {'$and': [query, decode_cursor(cursor, sort)]} if cursor else query
+    order: list = [('created_at', -1), ('_id', -1)] if sort == 'created_at' else [('_id', -1)]
+    # Un documento de más para saber si hay otra página sin contar.
+    docs: list = list(coll.find(page_query, projection(fields)).sort(order).limit(limit + 1))
+    more: bool = len(docs) > limit
+    docs = docs[:limit]
+
+    pagination: dict = {
+        'limit': limit,
+        'next_cursor': encode_cursor(docs[-1], sort) if more else None,
+    }
+    if with_total:
+        pagination['total'], pagination['total_approximate'] = _counts.count(coll, query)
+    return {'data': [serialize(doc) for doc in docs], 'pagination': pagination}
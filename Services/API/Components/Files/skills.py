@@ -0,0 +1,177 @@
+"""
+Normalización de habilidades a su forma canónica en minúsculas ("NodeJS", "node.js" y "Node"
+-> "node.js"). Se guarda en el campo `skills` de cada documento de `files`, con un índice
+multikey, para filtrar por igualdad exacta.
+
+Este módulo es idéntico en NER (Components/Model/Skills.py, al escribir el resultado) y en
+la API (Components/Files/skills.py, al consultar y en la migración): si cambia el
+diccionario hay que actualizar ambos y re-correr la migración con --rebuild.
+"""
+from typing import Any
+import re
+import unicodedata
+
+# Tecnologías conocidas: nombre canónico -> alias (en minúsculas) con que aparecen en los CVs.
+# Sólo alias sin ambigüedad dentro de un texto (el extractor por reglas de NER los busca en el
+# CV): "go", "r" o "rest" son palabras comunes y van en `_STANDALONE_ALIASES`.
+TECHNOLOGIES: dict[str, tuple[str, ...]] = {
+    'Python': ('python', 'python3'),
+    'Java': ('java',),
+    'JavaScript': ('javascript', 'js', 'ecmascript'),
+    'TypeScript': ('typescript',),
+    'C': ('lenguaje c', 'ansi c'),
+    'R': ('rstudio', 'lenguaje r'),
+    'C++': ('c++', 'cpp'),
+    'C#': ('c#', 'csharp'),
+    'Go': ('golang',),
+    'Rust': ('rust',),
+    'Kotlin': ('kotlin',),
+    'Swift': ('swift',),
+    'PHP': ('php',),
+    'Ruby': ('ruby',),
+    'Scala': ('scala',),
+    'SQL': ('sql', 't-sql', 'pl/sql', 'plsql'),
+    'Bash': ('bash', 'shell scripting'),
+    'HTML': ('html', 'html5'),
+    'CSS': ('css', 'css3'),
+    'Sass': ('sass', 'scss'),
+    'Node.js': ('node.js', 'nodejs', 'node js'),
+    'React': ('react', 'react.js', 'reactjs'),
+    'React Native': ('react native',),
+    'Angular': ('angular', 'angularjs'),
+    'Vue.js': ('vue', 'vue.js', 'vuejs'),
+    'Next.js': ('next.js', 'nextjs'),
+    'Express': ('express.js', 'expressjs'),
+    'Django': ('django',),
+    'Flask': ('flask',),
+    'FastAPI': ('fastapi',),
+    'Spring': ('spring', 'spring boot', 'springboot'),
+    'Ruby on Rails': ('ruby on rails', 'rails'),
+    'Laravel': ('laravel',),
+    '.NET': ('.net', 'dotnet', '.net core', 'asp.net'),
+    'GraphQL': ('graphql',),
+    'REST': ('api rest', 'rest api', 'restful'),
+    'PostgreSQL': ('postgresql', 'postgres'),
+    'MySQL': ('mysql',),
+    'SQL Server': ('sql server', 'mssql'),
+    'Oracle': ('oracle',),
+    'SQLite': ('sqlite',),
+    'MongoDB': ('mongodb', 'mongo'),
+    'Redis': ('redis',),
+    'Elasticsearch': ('elasticsearch', 'elastic search'),
+    'Kafka': ('kafka', 'apache kafka'),
+    'RabbitMQ': ('rabbitmq',),
+    'Spark': ('spark', 'apache spark', 'pyspark'),
+    'Hadoop': ('hadoop',),
+    'Airflow': ('airflow', 'apache airflow'),
+    'Docker': ('docker',),
+    'Kubernetes': ('kubernetes', 'k8s'),
+    'Terraform': ('terraform',),
+    'Ansible': ('ansible',),
+    'Jenkins': ('jenkins',),
+    'GitHub Actions': ('github actions',),
+    'GitLab CI': ('gitlab ci', 'gitlab-ci'),
+    'Git': ('git',),
+    'Linux': ('linux',),
+    'AWS': ('aws', 'amazon web services'),
+    'Azure': ('azure', 'microsoft azure'),
+    'GCP': ('gcp', 'google cloud', 'google cloud platform'),
+    'Pandas': ('pandas',),
+    'NumPy': ('numpy',),
+    'scikit-learn': ('scikit-learn', 'sklearn', 'scikit learn'),
+    'TensorFlow': ('tensorflow',),
+    'PyTorch': ('pytorch',),
+    'Keras': ('keras',),
+    'Power BI': ('power bi', 'powerbi'),
+    'Tableau': ('tableau',),
+    'Excel': ('excel', 'microsoft excel'),
+    'SAP': ('sap',),
+    'Salesforce': ('salesforce',),
+    'Jira': ('jira',),
+    'Figma': ('figma',),
+    'Scrum': ('scrum',),
+    'Kanban': ('kanban',),
+}
+
+
+# Alias que sólo son seguros cuando el valor completo es la habilidad (no dentro de un texto).
+_STANDALONE_ALIASES: dict[str, str] = {
+    'node': 'Node.js', 'go': 'Go', 'r': 'R', 'c': 'C', 'ts': 'TypeScript', 'rest': 'REST',
+    'api': 'REST', 'k8': 'Kubernetes', 'postgre': 'PostgreSQL', 'ms excel': 'Excel',
+}
+
+# Claves con el nombre de la habilidad cuando el LLM devuelve objetos ({"nombre": "Python", "nivel": ...}).
+_NAME_KEYS: tuple[str, ...] = ('nombre', 'name', 'habilidad', 'skill', 'tecnologia', 'herramienta')
+# Sufijo de versión: "3", "v2.7", "2.x", "3.*", "8+", "1.2.x".
+_VERSION: re.Pattern = re.compile(r'\s+v?\d+(?:\.(?:\d+|x|\*))*x?\+?$')
+_PARENTHESIS: re.Pattern = re.compile(r'\s*\(([^)]*)\)\s*')
+
+
+def _fold(text: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples."""
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip(' .,;:-*•')
+
+
+_ALIASES: dict[str, str] = {
+    **{_fold(alias): canonical.lower() for alias, canonical in _STANDALONE_ALIASES.items()},
+    **{_fold(alias): canonical.lower() for canonical, aliases in TECHNOLOGIES.items() for alias in aliases},
+    **{_fold(canonical): canonical.lower() for canonical in TECHNOLOGIES},
+}
+
+
+def normalize_skill(value: str) -> str:
+    """
+    Forma canónica de una habilidad: el nombre del diccionario en minúsculas si se reconoce
+    (también sin versión o por la sigla entre paréntesis: "Amazon Web Services (AWS)"), o el
+    texto plegado (minúsculas, sin tildes) si no. None si queda vacío.
+    """
+    folded: str = _fold(value)
+    if not folded:
+        return None
+    candidates: list[str] = [folded, _VERSION.sub('', folded)]
+    inner: list[str] = _PARENTHESIS.findall(folded)
+    if inner:
+        outer: str = _fold(_PARENTHESIS.sub(' ', folded))
+        candidates += [outer, _VERSION.sub('', outer)] + [_fold(part) for part in inner]
+    for candidate in candidates:
+        if candidate in _ALIASES:
+            return _ALIASES[candidate]
+    return folded
+
+
+def _strings(value: Any) -> list[str]:
+    """Strings de habilidades dentro de la estructura que devuelva el LLM (listas, objetos o categorías)."""
+    if isinstance(value, str):
+        return [part for part in re.split(r'[,;|\n]', value) if part.strip()]
+    if isinstance(value, list):
+        return [text for item in value for text in _strings(item)]
+    if isinstance(value, dict):
+        for key in _NAME_KEYS:
+            if isinstance(value.get(key), str):
+                return _strings(value[key])
+        return [text for item in value.values() for text in _strings(item)]
+    return []
+
+
+def normalize_skills(value: Any) -> list[str]:
+    """
+    Lista canónica, sin duplicados y en orden de aparición. "HTML/CSS" se separa en sus
+    partes si el valor completo no es un alias conocido (como "PL/SQL").
+    """
+    skills: list[str] = []
+    for text in _strings(value):
+        skill: str = normalize_skill(text)
+        if skill is not None and skill not in _ALIASES.values() and '/' in skill:
+            parts: list[str] = [normalize_skill(part) for part in skill.split('/')]
+            skills.extend(part for part in parts if part)
+        elif skill is not None:
+            skills.append(skill)
+    return list(dict.fromkeys(skills))
+
+
+def skills_from_result(data: dict) -> list[str]:
+    """`skills` de un documento a partir del JSON de NER (su `habilidades_tecnicas`)."""
+    if not isinstance(data, dict):
+        return []
+    return normalize_skills(data.get('habilidades_tecnicas'))
@@ -0,0 +1,67 @@
+"""
+Migración reanudable: completa `created_at` (fecha BSON en UTC) a partir del texto
+`creation_date` ("%d-%m-%Y %H:%M:%S", hora local del servidor) en los documentos que todavía
+no lo tienen, y crea el índice que usan los listados por rango. Si el texto no se puede
+interpretar se usa la fecha de creación del `_id`.
+
+Las colas de OCR, NER y CV ordenan por `created_at`: los documentos sin migrar quedan primeros.
+
+Uso (dentro del contenedor de la API):
+    python -m Components.Migrations.created_at [--batch-size 500]
+
+También corre en segundo plano al iniciar la API (MIGRATE_CREATED_AT=false lo desactiva).
+"""
+from datetime import datetime as dt
+from pymongo import MongoClient, UpdateOne
+from Components.Mongo.mongo_connection import mongoDB_connection, close_connection
+from Components.Migrations.stage_status import _parse_date
+import argparse
+
+
+def document_created_at(file: dict) -> dt:
+    return _parse_date(file.get('creation_date')) or file['_id'].generation_time
+
+
+def migrate(batch_size: int = 500) -> int:
+    db: MongoClient = mongoDB_connection()
+    coll = db['nlp-vitae']['files']
+    coll.create_index([('created_at', -1), ('_id', -1)], name='created_at')
+
+    migrated: int = 0
+    last_id = None
+    while True:
+        query: dict = {'created_at': {'$exists': False}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(coll.find(query, {'creation_date': 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        ops = [
+            UpdateOne({'_id': file['_id'], 'created_at': {'$exists': False}},
+                      {'$set': {'created_at': document_created_at(file)}})
+            for file in batch
+        ]
+        coll.bulk_write(ops, ordered=False)
+        migrated += len(ops)
+        last_id = batch[-1]['_id']
+        print(f'Converted creation_date of {migrated} documents ...')
+    return migrated
+
+
+def run_in_background() -> None:
+    try:
+        total: int = migrate()
+        print(f'created_at migration finished. Documents updated: {total}.')
+    except Exception as err:
+        print(f'An exception ocurred in created_at migration: {err}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert string creation dates into BSON created_at datetimes.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    try:
+        total: int = migrate(batch_size=args.batch_size)
+        print(f'created_at migration finished. Documents updated: {total}.')
+    finally:
+        close_connection()
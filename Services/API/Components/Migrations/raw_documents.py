@@ -0,0 +1,115 @@
+"""
+Migración reanudable: re-codifica los PDFs del bucket GridFS `documents` que fueron
+guardados en base64 y los deja como binario crudo (`storage_format: "raw"`).
+
+Procesa los documentos de `files` en lotes; cada documento se migra de forma atómica
+(se sube el PDF crudo, se actualiza la referencia sólo si nadie la cambió y recién
+entonces se borra el blob base64). Si se interrumpe, al volver a correrla continúa con
+los documentos que faltan.
+
+Uso (dentro del contenedor de la API):
+    python -m Components.Migrations.raw_documents [--batch-size 50]
+
+También puede correr en segundo plano al iniciar la API con MIGRATE_RAW_DOCUMENTS=true.
+"""
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+from gridfs import GridFS, GridIn
+from gridfs.errors import FileExists, NoFile
+from bson import ObjectId
+from Components.Mongo.mongo_connection import mongoDB_connection, close_connection
+from Components.Mongo.documents import RAW, find_blob
+import argparse
+import base64
+import hashlib
+
+
+def migrate_document(db, fs: GridFS, file: dict) -> bool:
+    """Migra un documento. Devuelve True si lo re-codificó."""
+    old_id = ObjectId(file['file_base64_id'])
+    try:
+        grid_out = fs.get(old_id)
+    except NoFile:
+        print(f"Blob {old_id} not found for file_id: {file['file_id']}. Skipping.")
+        return False
+
+    content: bytes = base64.b64decode(grid_out.read())
+    # Igual que stream_upload: el hash permite deduplicar también los documentos migrados.
+    sha256: str = hashlib.sha256(content).hexdigest()
+    new_id = find_blob(db, sha256)
+    created: bool = new_id is None
+    if created:
+        # new_file + abort en vez de fs.put: si falla el cierre, put deja los chunks huérfanos.
+        grid_in: GridIn = fs.new_file(filename=grid_out.filename, content_type='application/pdf', sha256=sha256)
+        try:
+            grid_in.write(content)
+            grid_in.close()
+            new_id = grid_in._id
+        except (FileExists, DuplicateKeyError):
+            # El mismo contenido se subió o migró mientras tanto (índice único sobre sha256;
+            # GridIn convierte el DuplicateKeyError en FileExists).
+            grid_in.abort()
+            new_id = find_blob(db, sha256)
+            created = False
+        except BaseException:
+            grid_in.abort()
+            raise
+
+    res = db['files'].update_one(
+        {'_id': file['_id'], 'file_base64_id': file['file_base64_id'], 'storage_format': {'$exists': False}},
+        {'$set': {'file_base64_id': str(new_id), 'storage_format': RAW, 'size': len(content), 'sha256': sha256}}
+    )
+    if res.modified_count == 0:
+        # Otro proceso lo migró (o cambió) mientras tanto: descartamos nuestra copia.
+        if created:
+            fs.delete(new_id)
+        return False
+
+    # El blob viejo sólo se borra si ningún otro documento lo referencia.
+    if db['files'].count_documents({'file_base64_id': file['file_base64_id']}, limit=1) == 0:
+        fs.delete(old_id)
+    return True
+
+
+def migrate(batch_size: int = 50) -> int:
+    client: MongoClient = mongoDB_connection()
+    db = client['nlp-vitae']
+    fs: GridFS = GridFS(db, collection='documents')
+
+    migrated: int = 0
+    last_id = None
+    while True:
+        query: dict = {'storage_format': {'$exists': False}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db['files'].find(query, {'file_id': 1, 'file_base64_id': 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        for file in batch:
+            try:
+                if migrate_document(db, fs, file):
+                    migrated += 1
+            except Exception as err:
+                print(f"An exception ocurred migrating file_id {file.get('file_id')}: {err}")
+        last_id = batch[-1]['_id']
+        print(f'Migrated {migrated} documents to raw storage ...')
+    return migrated
+
+
+def run_in_background() -> None:
+    try:
+        total: int = migrate()
+        print(f'Raw documents migration finished. Documents migrated: {total}.')
+    except Exception as err:
+        print(f'An exception ocurred in raw documents migration: {err}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-encode base64 PDFs in GridFS as raw binary.')
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+    try:
+        total: int = migrate(batch_size=args.batch_size)
+        print(f'Raw documents migration finished. Documents migrated: {total}.')
+    finally:
+        close_connection()
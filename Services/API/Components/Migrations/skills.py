@@ -0,0 +1,57 @@
+"""
+Migración reanudable: completa el campo `skills` (habilidades canónicas, ver
+Components/Files/skills.py) de los documentos que ya tienen resultado de NER y crea su
+índice multikey. Sólo toca documentos sin `skills`; con --rebuild recalcula todos (p.ej.
+después de ampliar el diccionario de alias).
+
+Uso (dentro del contenedor de la API):
+    python -m Components.Migrations.skills [--batch-size 500] [--rebuild]
+"""
+from pymongo import MongoClient, UpdateOne
+from Components.Mongo.mongo_connection import mongoDB_connection, close_connection
+from Components.Files.skills import skills_from_result
+import argparse
+
+
+def document_skills(file: dict) -> list[str]:
+    """`skills` según el último resultado de NER del documento."""
+    result = next((r for r in reversed(file.get('results') or []) if r.get('process') == 'NER'), None)
+    return skills_from_result(result.get('data')) if result is not None else []
+
+
+def migrate(batch_size: int = 500, rebuild: bool = False) -> int:
+    db: MongoClient = mongoDB_connection()
+    coll = db['nlp-vitae']['files']
+    coll.create_index('skills', name='skills')
+
+    query: dict = {'results.process': 'NER'}
+    if not rebuild:
+        query['skills'] = {'$exists': False}
+    projection: dict = {'results.process': 1, 'results.data.habilidades_tecnicas': 1}
+
+    migrated: int = 0
+    last_id = None
+    while True:
+        # Paginado por _id: en --rebuild los documentos siguen matcheando después de actualizarlos.
+        page: dict = dict(query, _id={'$gt': last_id}) if last_id is not None else query
+        batch = list(coll.find(page, projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        ops = [UpdateOne({'_id': file['_id']}, {'$set': {'skills': document_skills(file)}}) for file in batch]
+        coll.bulk_write(ops, ordered=False)
+        migrated += len(ops)
+        last_id = batch[-1]['_id']
+        print(f'Normalized skills of {migrated} documents ...')
+    return migrated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the canonical skills array from NER results.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rebuild', action='store_true', help='Recompute skills for every document with NER results.')
+    args = parser.parse_args()
+    try:
+        total: int = migrate(batch_size=args.batch_size, rebuild=args.rebuild)
+        print(f'Skills migration finished. Documents updated: {total}.')
+    finally:
+        close_connection()
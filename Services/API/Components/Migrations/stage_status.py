@@ -0,0 +1,97 @@
+"""
+Migración única: deriva el estado explícito del pipeline (`ocr_status`, `ner_status`,
+`cv_status` y sus timestamps) a partir del array `results` de los documentos existentes
+y crea los índices compuestos que usan las colas de cada etapa.
+
+Es idempotente y reanudable: sólo toca documentos que todavía no tienen `ocr_status`.
+
+Uso (dentro del contenedor de la API):
+    python -m Components.Migrations.stage_status [--batch-size 500]
+"""
+from datetime import datetime as dt, timezone
+from pymongo import MongoClient, UpdateOne, collection
+from Components.Mongo.mongo_connection import mongoDB_connection, close_connection
+from Components.Mongo.indexes import replace_index
+import argparse
+
+STAGES: list[tuple[str, tuple]] = [
+    ('ocr', ('Docling', 'OCR')),
+    ('ner', ('NER',)),
+    ('cv', ('CV',)),
+]
+
+
+def _parse_date(value) -> dt:
+    if isinstance(value, dt):
+        return value
+    if isinstance(value, str):
+        for fmt in ('%d-%m-%Y %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+            try:
+                return dt.strptime(value, fmt).astimezone(timezone.utc)
+            except ValueError:
+                continue
+    return None
+
+
+def derive_stage_fields(file: dict) -> dict:
+    """Calcula los campos de estado de cada etapa según los resultados ya guardados."""
+    results: list = file.get('results') or []
+    created: dt = _parse_date(file.get('creation_date'))
+    fields: dict = {}
+    previous_done: bool = True
+    for stage, processes in STAGES:
+        result = next((r for r in reversed(results) if r.get('process') in processes), None)
+        if result is not None:
+            fields[f'{stage}_status'] = 'done'
+            finished = _parse_date(result.get('timestamp'))
+            if finished:
+                fields[f'{stage}_finished_at'] = finished
+        elif previous_done:
+            fields[f'{stage}_status'] = 'pending'
+            if created:
+                fields[f'{stage}_queued_at'] = created
+        else:
+            fields[f'{stage}_status'] = 'waiting'
+        previous_done = result is not None
+    return fields
+
+
+def ensure_indexes(coll: collection.Collection) -> None:
+    coll.create_index('file_id', name='file_id')
+    for stage, _ in STAGES:
+        replace_index(coll, [(f'{stage}_status', 1), ('created_at', 1)], f'{stage}_queue')
+        coll.create_index([(f'{stage}_status', 1), (f'{stage}_lease_until', 1)], name=f'{stage}_leases')
+
+
+def migrate(batch_size: int = 500) -> int:
+    db: MongoClient = mongoDB_connection()
+    coll = db['nlp-vitae']['files']
+    ensure_indexes(coll)
+
+    migrated: int = 0
+    while True:
+        batch = list(coll.find(
+            {'ocr_status': {'$exists': False}},
+            {'file_id': 1, 'creation_date': 1, 'results.process': 1, 'results.timestamp': 1}
+        ).limit(batch_size))
+        if not batch:
+            break
+        ops = [
+            UpdateOne({'_id': file['_id'], 'ocr_status': {'$exists': False}}, {'$set': derive_stage_fields(file)})
+            for file in batch
+        ]
+        coll.bulk_write(ops, ordered=False)
+        migrated += len(ops)
+        print(f'Migrated {migrated} documents ...')
+    return migrated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Derive per-stage status fields from results arrays.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    try:
+        total: int = migrate(batch_size=args.batch_size)
+        print(f'Stage status migration finished. Documents updated: {total}.')
+    finally:
+        close_connection()
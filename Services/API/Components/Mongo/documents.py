@@ -0,0 +1,118 @@
+from pymongo import database
+from pymongo.errors import DuplicateKeyError
+from gridfs import GridFS, GridIn, GridOut
+from gridfs.errors import FileExists
+from typing import Iterator
+from bson import ObjectId
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import base64
+
+# Formato del PDF guardado en el bucket GridFS `documents` (campo `storage_format` del documento de `files`).
+# Los documentos anteriores no tienen el campo y están guardados en base64.
+RAW: str = 'raw'
+BASE64: str = 'base64'
+
+# Tamaño de lectura al subir: coincide con el chunk por defecto de GridFS (255 KiB).
+UPLOAD_CHUNK_SIZE: int = 255 * 1024
+
+
+class UploadTooLarge(Exception):
+    """El archivo supera el tamaño máximo permitido."""
+
+
+def storage_format(file_doc: dict) -> str:
+    return file_doc.get('storage_format', BASE64)
+
+
+def open_document(db: database.Database, file_doc: dict) -> GridOut:
+    """Abre el PDF en GridFS sin leerlo (levanta gridfs.errors.NoFile si no existe)."""
+    fs: GridFS = GridFS(db, collection='documents')
+    return fs.get(ObjectId(file_doc['file_base64_id']))
+
+
+def iter_range(grid_out: GridOut, start: int, end: int) -> Iterator[bytes]:
+    """Devuelve los bytes [start, end] (inclusive) del archivo, chunk a chunk de GridFS."""
+    grid_out.seek(start)
+    remaining: int = end - start + 1
+    while remaining > 0:
+        data: bytes = grid_out.read(min(grid_out.chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def iter_base64(grid_out: GridOut) -> Iterator[bytes]:
+    """Decodifica en streaming un PDF guardado en base64 (formato anterior)."""
+    pending: bytes = b''
+    while True:
+        data: bytes = grid_out.readchunk()
+        if not data:
+            break
+        pending += data
+        # Sólo se decodifican bloques completos de 4 caracteres base64.
+        cut: int = len(pending) - len(pending) % 4
+        if cut:
+            yield base64.b64decode(pending[:cut])
+            pending = pending[cut:]
+    if pending:
+        yield base64.b64decode(pending)
+
+
+def read_document(db: database.Database, file_doc: dict) -> bytes:
+    """Lee el PDF de GridFS y devuelve los bytes originales, sin importar el formato en que se guardó."""
+    content: bytes = open_document(db, file_doc).read()
+    if storage_format(file_doc) == BASE64:
+        return base64.b64decode(content)
+    return content
+
+
+async def stream_upload(db: database.Database, upload: UploadFile, max_bytes: int) -> tuple[ObjectId, int, str]:
+    """
+    Copia el archivo subido a GridFS en bloques de UPLOAD_CHUNK_SIZE, calculando tamaño y
+    SHA-256 sobre la marcha; nunca mantiene el PDF completo en memoria.
+    Devuelve (id en GridFS, tamaño en bytes, sha256 hex). Si se supera `max_bytes`
+    aborta la subida (borra los chunks ya escritos) y levanta UploadTooLarge.
+    """
+    fs: GridFS = GridFS(db, collection='documents')
+    grid_in: GridIn = fs.new_file(filename=upload.filename, content_type='application/pdf')
+    digest = hashlib.sha256()
+    size: int = 0
+    try:
+        while True:
+            chunk: bytes = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f'File exceeds the maximum allowed size of {max_bytes} bytes')
+            digest.update(chunk)
+            await run_in_threadpool(grid_in.write, chunk)
+        sha256: str = digest.hexdigest()
+
+        # Mismo contenido ya guardado: se reutiliza ese blob y se descarta la copia nueva.
+        existing = await run_in_threadpool(find_blob, db, sha256)
+        if existing is not None:
+            await run_in_threadpool(grid_in.abort)
+            return existing, size, sha256
+
+        grid_in.sha256 = sha256
+        try:
+            await run_in_threadpool(grid_in.close)
+        except (FileExists, DuplicateKeyError):
+            # Otra subida idéntica ganó la carrera (índice único sobre documents.files.sha256):
+            # GridIn convierte el DuplicateKeyError del índice en FileExists.
+            await run_in_threadpool(grid_in.abort)
+            return await run_in_threadpool(find_blob, db, sha256), size, sha256
+    except BaseException:
+        await run_in_threadpool(grid_in.abort)
+        raise
+    return grid_in._id, size, sha256
+
+
+def find_blob(db: database.Database, sha256: str) -> ObjectId:
+    """Id del PDF en GridFS con ese hash de contenido (o None)."""
+    doc = db['documents.files'].find_one({'sha256': sha256}, {'_id': 1})
+    return doc['_id'] if doc else None
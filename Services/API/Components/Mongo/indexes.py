@@ -0,0 +1,49 @@
+from pymongo import MongoClient, collection
+from pymongo.errors import OperationFailure
+from Components.Mongo.mongo_connection import mongoDB_connection
+
+# IndexOptionsConflict / IndexKeySpecsConflict
+_INDEX_CONFLICT: tuple = (85, 86)
+
+
+def replace_index(coll: collection.Collection, keys: list, name: str) -> None:
+    """
+    create_index que reemplaza un índice anterior con el mismo nombre y otras claves (p.ej. las
+    colas `{etapa}_queue` sobre `creation_date`). Igual que LeaseClaimer.ensure_indexes de los
+    servicios de OCR, NER y CV.
+    """
+    try:
+        coll.create_index(keys, name=name)
+    except OperationFailure as err:
+        if err.code not in _INDEX_CONFLICT:
+            raise
+        try:
+            coll.drop_index(name)
+        except OperationFailure:
+            pass  # otra réplica ya lo borró
+        coll.create_index(keys, name=name)
+
+
+def ensure_indexes() -> None:
+    """Crea (si no existen) los índices que usa la API. create_index es idempotente."""
+    db: MongoClient = mongoDB_connection()
+    database = db['nlp-vitae']
+
+    files = database['files']
+    files.create_index('file_id', name='file_id')
+    files.create_index('sha256', name='sha256')
+    # Listados por fecha (`created_at` desc, `_id` desempata el cursor).
+    files.create_index([('created_at', -1), ('_id', -1)], name='created_at')
+    # Multikey: un valor por habilidad canónica (ver Components/Files/skills.py).
+    files.create_index('skills', name='skills')
+    # Polling de los índices de búsqueda en memoria cuando no hay change streams.
+    files.create_index('ner_finished_at', name='ner_finished_at')
+    files.create_index('ocr_finished_at', name='ocr_finished_at')
+
+    # Un único blob por contenido en el bucket `documents` (los blobs anteriores no tienen hash).
+    database['documents.files'].create_index(
+        'sha256',
+        name='sha256_unique',
+        unique=True,
+        partialFilterExpression={'sha256': {'$type': 'string'}}
+    )
@@ -0,0 +1,74 @@
+"""
+Análisis de texto para la búsqueda full-text: el mismo para indexar y para consultar.
+
+minúsculas + sin tildes -> tokens alfanuméricos ("c++" y "c#" se conservan) -> sin stopwords
+de español e inglés -> stemming liviano (plurales y género). Cada término conserva su
+posición en el texto original, así las frases siguen funcionando aunque se quiten stopwords
+("ingeniero de software").
+"""
+import re
+import unicodedata
+
+_TOKEN: re.Pattern = re.compile(r'[a-z0-9]+[+#]*')
+
+STOPWORDS: frozenset = frozenset((
+    # español
+    'a', 'al', 'algo', 'ante', 'con', 'como', 'cual', 'de', 'del', 'desde', 'donde', 'e', 'el', 'ella',
+    'ellos', 'en', 'entre', 'era', 'es', 'esa', 'ese', 'eso', 'esta', 'este', 'esto', 'fue', 'ha', 'hasta',
+    'la', 'las', 'le', 'les', 'lo', 'los', 'mas', 'me', 'mi', 'mis', 'muy', 'ni', 'no', 'nos', 'o', 'para',
+    'pero', 'por', 'que', 'se', 'ser', 'si', 'sin', 'sobre', 'son', 'su', 'sus', 'tambien', 'te', 'tu',
+    'un', 'una', 'uno', 'unos', 'unas', 'y', 'ya', 'yo',
+    # inglés
+    'an', 'and', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'for', 'from', 'has', 'have', 'he', 'her',
+    'his', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'my', 'of', 'on', 'or', 'our', 'she', 'so', 'than',
+    'that', 'the', 'their', 'them', 'then', 'there', 'these', 'they', 'this', 'to', 'was', 'we', 'were',
+    'which', 'while', 'who', 'will', 'with', 'you', 'your',
+))
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin tildes (NFKD sin marcas combinantes)."""
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(ch))
+
+
+def stem(term: str) -> str:
+    """
+    Stemming liviano para español e inglés: sólo plurales y género ("desarrolladores" y
+    "desarrolladora" -> "desarrollador", "technologies" -> "technology"). Los términos cortos,
+    con dígitos o con símbolos quedan igual.
+    """
+    if len(term) <= 4 or not term.isalpha():
+        return term
+    if term.endswith('ies') and len(term) > 5:
+        return term[:-3] + 'y'
+    if term.endswith('es') and len(term) > 5:
+        term = term[:-2]
+    elif term.endswith('s') and not term.endswith('ss'):
+        term = term[:-1]
+    if term[-1] in 'aoe' and len(term) > 4:
+        term = term[:-1]
+    return term
+
+
+def analyze(text: str) -> list[tuple[str, int]]:
+    """[(término, posición)] del texto, en orden."""
+    return [
+        (stem(token), position)
+        for position, token in enumerate(_TOKEN.findall(fold(text)))
+        if token not in STOPWORDS
+    ]
+
+
+def parse_query(query: str) -> tuple[list[str], list[list[tuple[str, int]]]]:
+    """
+    Separa la consulta en términos sueltos y frases entre comillas. Devuelve
+    (términos, frases); cada frase es [(término, desplazamiento relativo)].
+    """
+    phrases: list[list[tuple[str, int]]] = []
+    for quoted in re.findall(r'"([^"]+)"', query):
+        terms: list[tuple[str, int]] = analyze(quoted)
+        if terms:
+            start: int = terms[0][1]
+            phrases.append([(term, position - start) for term, position in terms])
+    loose: str = re.sub(r'"[^"]*"?', ' ', query)
+    return list(dict.fromkeys(term for term, _ in analyze(loose))), phrases
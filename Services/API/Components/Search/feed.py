@@ -0,0 +1,98 @@
+from threading import Thread, Event
+from datetime import datetime as dt, timedelta, timezone
+from typing import Callable
+from pymongo import collection
+from pymongo.errors import OperationFailure, PyMongoError
+from Components.Mongo.mongo_connection import mongoDB_connection
+import os
+import time
+
+# Códigos de error de MongoDB relevantes para change streams
+_NOT_REPLICA_SET: int = 40573          # mongod standalone: no soporta $changeStream
+_HISTORY_LOST: tuple = (136, 280, 286)  # resume token fuera del oplog / inválido
+# Margen del polling por relojes desfasados entre servicios (las actualizaciones son idempotentes).
+_POLL_OVERLAP: timedelta = timedelta(seconds=5)
+
+
+class ChangeFeed(Thread):
+    """
+    Mantiene al día un índice en memoria del proceso con los cambios de `nlp-vitae.files`.
+
+    Abre el change stream (con `fullDocument` de los updates) y recién entonces llama a
+    `on_reset(coll)` para construir el índice completo: lo que cambie mientras se construye
+    llega después como evento y se aplica con `on_change(change)` (que debe ser idempotente).
+    Si el stream se corta, al reconectar se reconstruye todo; así no hace falta persistir
+    resume tokens.
+
+    Sin replica set (mongod standalone) construye una vez y después llama cada
+    `poll_interval` segundos a `on_poll(coll, since)` con la fecha de la consulta anterior
+    (menos un margen por relojes desfasados entre servicios).
+
+    `on_idle()`, si se indica, se llama alrededor de una vez por segundo desde el mismo hilo
+    (p.ej. para bajar a disco lo acumulado en memoria).
+    """
+
+    def __init__(self, name: str, pipeline: list, on_reset: Callable[[collection.Collection], None],
+                 on_change: Callable[[dict], None], on_poll: Callable[[collection.Collection, dt], None] = None,
+                 on_idle: Callable[[], None] = None, poll_interval: float = None, retry_interval: float = 5):
+        self.name_id = name
+        self.pipeline = pipeline
+        self.on_reset = on_reset
+        self.on_change = on_change
+        self.on_poll = on_poll
+        self.on_idle = on_idle
+        self.poll_interval: float = poll_interval or float(os.getenv('SEARCH_POLL_SECONDS', '30'))
+        self.retry_interval = retry_interval
+        self.mode: str = 'starting'
+        self._stopped: Event = Event()
+        super().__init__(daemon=True)
+
+    def _coll(self) -> collection.Collection:
+        return mongoDB_connection()['nlp-vitae']['files']
+
+    def _poll(self) -> None:
+        self.mode = 'polling'
+        coll = self._coll()
+        since: dt = dt.now(timezone.utc)
+        self.on_reset(coll)
+        next_poll: float = time.monotonic() + self.poll_interval
+        while not self._stopped.wait(1 if self.on_idle else self.poll_interval):
+            if self.on_poll is not None and time.monotonic() >= next_poll:
+                started: dt = dt.now(timezone.utc)
+                try:
+                    self.on_poll(coll, since - _POLL_OVERLAP)
+                    since = started
+                except PyMongoError as err:
+                    print(f'An exception ocurred polling {self.name_id}: {err}')
+                next_poll = time.monotonic() + self.poll_interval
+            if self.on_idle is not None:
+                self.on_idle()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                coll = self._coll()
+                with coll.watch(self.pipeline, full_document='updateLookup', max_await_time_ms=1000) as stream:
+                    self.on_reset(coll)
+                    self.mode = 'change_stream'
+                    print(f'Change stream opened ({self.name_id}).')
+                    while not self._stopped.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self.on_change(change)
+                        if self.on_idle is not None:
+                            self.on_idle()
+            except OperationFailure as err:
+                if err.code == _NOT_REPLICA_SET:
+                    print(f'Change streams are not available (standalone mongod). Polling for {self.name_id}.')
+                    self._poll()
+                    return
+                if err.code not in _HISTORY_LOST:
+                    print(f'An exception ocurred in change stream ({self.name_id}): {err}')
+                    self._stopped.wait(self.retry_interval)
+            except PyMongoError as err:
+                print(f'An exception ocurred in change stream ({self.name_id}): {err}')
+                self._stopped.wait(self.retry_interval)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,240 @@
+"""
+Segmentos del índice full-text (ver Components/Search/text_index.py).
+
+Un segmento es inmutable y se lee con mmap. Formato (little-endian):
+
+    header    magic "NLPVSEG1", n_docs, n_terms y los offsets de cada sección
+    lengths   n_docs x uint32: cantidad de términos de cada documento (para BM25)
+    keys      file_id de cada documento, separados por "\\n"
+    terms     n_terms entradas de tamaño fijo, ordenadas por término (búsqueda binaria):
+              offset/largo del término en `blob`, offset/largo de su bloque de documentos,
+              offset/largo de su bloque de posiciones y df
+    blob      los términos en UTF-8, concatenados
+    postings  por término: bloque de documentos [delta del doc, tf]* y bloque de posiciones
+              [deltas de posición]* por documento, todo en varints
+
+Los documentos se identifican dentro del segmento por su número local (0..n_docs-1).
+"""
+from array import array
+from typing import Iterator
+import mmap
+import os
+import struct
+
+MAGIC: bytes = b'NLPVSEG1'
+_HEADER: struct.Struct = struct.Struct('<8sIIQQQQQ')
+_ENTRY: struct.Struct = struct.Struct('<QIQIQII')
+
+# Una posting: (documento local, tf, posiciones o None si no se pidieron)
+Posting = tuple[int, int, list[int]]
+
+
+def encode_varints(values, out: bytearray) -> None:
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_varints(data: bytes) -> list[int]:
+    values: list[int] = []
+    value: int = 0
+    shift: int = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = 0
+            shift = 0
+    return values
+
+
+class MemorySegment:
+    """Buffer en memoria de los documentos todavía no escritos a disco; se busca igual que un Segment."""
+
+    def __init__(self):
+        self.keys: list[str] = []
+        self.lengths: list[int] = []
+        self._postings: dict[str, list[tuple[int, list[int]]]] = {}
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, terms: list[tuple[str, int]]) -> int:
+        """Agrega un documento analizado ([(término, posición)]) y devuelve su número local."""
+        doc: int = len(self.keys)
+        self.keys.append(key)
+        self.lengths.append(len(terms))
+        positions: dict[str, list[int]] = {}
+        for term, position in terms:
+            positions.setdefault(term, []).append(position)
+        for term, term_positions in positions.items():
+            self._postings.setdefault(term, []).append((doc, term_positions))
+        return doc
+
+    def key(self, doc: int) -> str:
+        return self.keys[doc]
+
+    def length(self, doc: int) -> int:
+        return self.lengths[doc]
+
+    def df(self, term: str) -> int:
+        return len(self._postings.get(term, ()))
+
+    def postings(self, term: str, positions: bool = False) -> list[Posting]:
+        return [(doc, len(p), p if positions else None) for doc, p in self._postings.get(term, ())]
+
+    def terms(self) -> Iterator[str]:
+        return iter(sorted(self._postings))
+
+
+def write_segment(path: str, keys: list[str], lengths: list[int], postings: Iterator[tuple[str, list[Posting]]]) -> None:
+    """
+    Escribe un segmento. `postings` da (término, [(doc, tf, posiciones)]) en orden de término
+    y de documento. Se escribe a un temporal y se renombra: un segmento a medio escribir
+    nunca queda visible.
+    """
+    entries: bytearray = bytearray()
+    blob: bytearray = bytearray()
+    data: bytearray = bytearray()
+    n_terms: int = 0
+    for term, plist in postings:
+        if not plist:
+            continue
+        encoded: bytes = term.encode('utf-8')
+        docs_block: bytearray = bytearray()
+        positions_block: bytearray = bytearray()
+        previous: int = 0
+        for doc, tf, term_positions in plist:
+            encode_varints((doc - previous, tf), docs_block)
+            previous = doc
+            last: int = 0
+            deltas: list[int] = []
+            for position in term_positions:
+                deltas.append(position - last)
+                last = position
+            encode_varints(deltas, positions_block)
+        entries += _ENTRY.pack(
+            len(blob), len(encoded),
+            len(data), len(docs_block),
+            len(data) + len(docs_block), len(positions_block),
+            len(plist),
+        )
+        blob += encoded
+        data += docs_block
+        data += positions_block
+        n_terms += 1
+
+    lengths_bytes: bytes = array('I', lengths).tobytes()
+    keys_bytes: bytes = '\n'.join(keys).encode('utf-8')
+    lengths_off: int = _HEADER.size
+    keys_off: int = lengths_off + len(lengths_bytes)
+    terms_off: int = keys_off + len(keys_bytes)
+    blob_off: int = terms_off + len(entries)
+    postings_off: int = blob_off + len(blob)
+
+    tmp: str = f'{path}.tmp'
+    with open(tmp, 'wb') as handle:
+        handle.write(_HEADER.pack(MAGIC, len(keys), n_terms, lengths_off, keys_off, terms_off, blob_off, postings_off))
+        for section in (lengths_bytes, keys_bytes, entries, blob, data):
+            handle.write(section)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path)
+
+
+class Segment:
+    """Segmento en disco, mapeado en memoria. Las posting lists se decodifican al consultarlas."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name: str = os.path.splitext(os.path.basename(path))[0]
+        self._file = open(path, 'rb')
+        self._mm: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_docs, self.n_terms, lengths_off, keys_off, terms_off, blob_off, postings_off = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Not a search segment: {path}')
+        self._terms_off: int = terms_off
+        self._blob_off: int = blob_off
+        self._postings_off: int = postings_off
+        self.lengths: array = array('I')
+        self.lengths.frombytes(self._mm[lengths_off:keys_off])
+        self.keys: list[str] = self._mm[keys_off:terms_off].decode('utf-8').split('\n') if self.n_docs else []
+
+    def key(self, doc: int) -> str:
+        return self.keys[doc]
+
+    def length(self, doc: int) -> int:
+        return self.lengths[doc]
+
+    def _entry(self, index: int) -> tuple:
+        return _ENTRY.unpack_from(self._mm, self._terms_off + index * _ENTRY.size)
+
+    def _term(self, entry: tuple) -> bytes:
+        start: int = self._blob_off + entry[0]
+        return self._mm[start:start + entry[1]]
+
+    def _find(self, term: str) -> tuple:
+        """Entrada del término (búsqueda binaria sobre el diccionario mapeado) o None."""
+        target: bytes = term.encode('utf-8')
+        low, high = 0, self.n_terms
+        while low < high:
+            middle: int = (low + high) // 2
+            entry: tuple = self._entry(middle)
+            current: bytes = self._term(entry)
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                return entry
+        return None
+
+    def df(self, term: str) -> int:
+        entry: tuple = self._find(term)
+        return entry[6] if entry else 0
+
+    def postings(self, term: str, positions: bool = False) -> list[Posting]:
+        entry: tuple = self._find(term)
+        if entry is None:
+            return []
+        _, _, docs_off, docs_len, positions_off, positions_len, _ = entry
+        start: int = self._postings_off + docs_off
+        values: list[int] = decode_varints(self._mm[start:start + docs_len])
+        docs: list[int] = []
+        doc: int = 0
+        for delta in values[0::2]:
+            doc += delta
+            docs.append(doc)
+        tfs: list[int] = values[1::2]
+        if not positions:
+            return [(doc, tf, None) for doc, tf in zip(docs, tfs)]
+        start = self._postings_off + positions_off
+        deltas: list[int] = decode_varints(self._mm[start:start + positions_len])
+        result: list[Posting] = []
+        cursor: int = 0
+        for doc, tf in zip(docs, tfs):
+            term_positions: list[int] = []
+            position: int = 0
+            for delta in deltas[cursor:cursor + tf]:
+                position += delta
+                term_positions.append(position)
+            cursor += tf
+            result.append((doc, tf, term_positions))
+        return result
+
+    def terms(self) -> Iterator[str]:
+        for index in range(self.n_terms):
+            yield self._term(self._entry(index)).decode('utf-8')
+
+    def size(self) -> int:
+        return len(self._mm)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
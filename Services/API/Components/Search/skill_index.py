@@ -0,0 +1,217 @@
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime as dt, timezone
+from threading import Lock
+from pymongo import collection
+from Components.Search.feed import ChangeFeed
+import heapq
+import math
+import os
+
+
+class SkillIndex:
+    """
+    Índice invertido en memoria: habilidad canónica (ver Components/Files/skills.py) ->
+    posting list ordenada de ordinales de documento en un `array('I')` (4 bytes por entrada).
+
+    Cada documento de `files` recibe un ordinal creciente la primera vez que se indexa; los
+    ordinales de documentos borrados quedan como lápida (file_id None). Una búsqueda sólo
+    recorre las posting lists de las habilidades pedidas y elige el top-k con un heap: no
+    toca Mongo.
+    """
+
+    def __init__(self):
+        self._lock: Lock = Lock()
+        self._postings: dict[str, array] = {}
+        self._ordinals: dict[str, int] = {}       # _id del documento -> ordinal
+        self._file_ids: list[str] = []            # ordinal -> file_id (None si se borró)
+        self._skills: list[tuple[str, ...]] = []  # ordinal -> habilidades indexadas
+        self._live: int = 0
+        self.ready: bool = False
+        self.built_at: dt = None
+        self.updates: int = 0
+
+    # ---------- Escritura ----------
+    def _add(self, key: str, file_id: str, skills: tuple[str, ...]) -> None:
+        ordinal: int = self._ordinals.get(key)
+        if ordinal is None:
+            ordinal = len(self._file_ids)
+            self._ordinals[key] = ordinal
+            self._file_ids.append(file_id)
+            self._skills.append(())
+            self._live += 1
+        elif self._file_ids[ordinal] is None:
+            self._file_ids[ordinal] = file_id
+            self._live += 1
+        old: tuple[str, ...] = self._skills[ordinal]
+        for skill in set(old) - set(skills):
+            self._discard(skill, ordinal)
+        for skill in set(skills) - set(old):
+            postings: array = self._postings.setdefault(skill, array('I'))
+            if not postings or postings[-1] < ordinal:
+                postings.append(ordinal)
+            else:
+                insort(postings, ordinal)
+        self._skills[ordinal] = skills
+
+    def _discard(self, skill: str, ordinal: int) -> None:
+        postings: array = self._postings.get(skill)
+        position: int = bisect_left(postings, ordinal)
+        if position < len(postings) and postings[position] == ordinal:
+            postings.pop(position)
+        if not postings:
+            del self._postings[skill]
+
+    def upsert(self, key: str, file_id: str, skills: list[str]) -> None:
+        """Indexa (o re-indexa) un documento. `key` es su _id."""
+        with self._lock:
+            self._add(key, file_id, tuple(dict.fromkeys(skills or [])))
+            self.updates += 1
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            ordinal: int = self._ordinals.get(key)
+            if ordinal is None or self._file_ids[ordinal] is None:
+                return
+            for skill in self._skills[ordinal]:
+                self._discard(skill, ordinal)
+            self._file_ids[ordinal] = None
+            self._skills[ordinal] = ()
+            self._live -= 1
+            self.updates += 1
+
+    def build(self, coll: collection.Collection) -> None:
+        """Construye el índice completo desde `files` (en orden de _id) y lo reemplaza de una vez."""
+        fresh: SkillIndex = SkillIndex()
+        cursor = coll.find({'skills.0': {'$exists': True}}, {'file_id': 1, 'skills': 1}).sort('_id', 1)
+        for file in cursor:
+            fresh._add(str(file['_id']), file.get('file_id'), tuple(dict.fromkeys(file['skills'])))
+        with self._lock:
+            self._postings, self._ordinals = fresh._postings, fresh._ordinals
+            self._file_ids, self._skills, self._live = fresh._file_ids, fresh._skills, fresh._live
+            self.built_at = dt.now(timezone.utc)
+            self.ready = True
+        print(f'Skill index built: {self._live} documents, {len(self._postings)} skills.')
+
+    def apply(self, change: dict) -> None:
+        """Aplica un evento del change stream de `files`."""
+        key: str = str(change['documentKey']['_id'])
+        if change['operationType'] == 'delete':
+            self.remove(key)
+            return
+        document: dict = change.get('fullDocument')
+        if document is None:
+            # Borrado antes de leerlo (updateLookup no lo encontró).
+            self.remove(key)
+        elif document.get('skills'):
+            self.upsert(key, document.get('file_id'), document['skills'])
+        else:
+            self.remove(key)
+
+    def refresh(self, coll: collection.Collection, since: dt) -> None:
+        """Sin change streams: re-indexa los documentos con NER terminado desde `since`."""
+        for file in coll.find({'ner_finished_at': {'$gte': since}}, {'file_id': 1, 'skills': 1}):
+            if file.get('skills'):
+                self.upsert(str(file['_id']), file.get('file_id'), file['skills'])
+            else:
+                self.remove(str(file['_id']))
+
+    # ---------- Consulta ----------
+    def _intersect(self, lists: list[array]) -> list[int]:
+        """Ordinales presentes en todas las listas: recorre la más corta y busca en las demás con bisect."""
+        lists = sorted(lists, key=len)
+        result: list[int] = []
+        cursors: list[int] = [0] * len(lists)
+        for ordinal in lists[0]:
+            for i, postings in enumerate(lists[1:], start=1):
+                cursors[i] = bisect_left(postings, ordinal, cursors[i])
+                if cursors[i] == len(postings) or postings[cursors[i]] != ordinal:
+                    break
+            else:
+                result.append(ordinal)
+        return result
+
+    def idf(self, skill: str) -> float:
+        """IDF suavizado (como en BM25): las habilidades raras pesan más que las comunes."""
+        df: int = len(self._postings.get(skill, ()))
+        return math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+
+    def search(self, weights: dict[str, float], mode: str = 'any', idf: bool = False,
+               limit: int = 20, offset: int = 0) -> tuple[int, list[dict]]:
+        """
+        weights: habilidad canónica -> peso. Puntaje de un documento = suma de los pesos de las
+        habilidades que tiene (por su IDF si `idf`). mode='all' exige todas.
+        Devuelve (total de documentos que coinciden, página [{'file_id', 'score', 'matched'}])
+        ordenada por puntaje y, a igual puntaje, del más nuevo al más viejo.
+        """
+        with self._lock:
+            found: dict[str, array] = {skill: self._postings[skill] for skill in weights if skill in self._postings}
+            if not found or (mode == 'all' and len(found) < len(weights)):
+                return 0, []
+            weight: dict[str, float] = {
+                skill: weights[skill] * (self.idf(skill) if idf else 1.0) for skill in found
+            }
+            scores: dict[int, float] = {}
+            if mode == 'all':
+                total_weight: float = sum(weight.values())
+                scores = dict.fromkeys(self._intersect(list(found.values())), total_weight)
+            else:
+                for skill, postings in found.items():
+                    for ordinal in postings:
+                        scores[ordinal] = scores.get(ordinal, 0.0) + weight[skill]
+            top: list[tuple[int, float]] = heapq.nlargest(
+                offset + limit, scores.items(), key=lambda item: (item[1], item[0])
+            )[offset:]
+            page: list[dict] = [
+                {
+                    'file_id': self._file_ids[ordinal],
+                    'score': round(score, 4),
+                    'matched': [skill for skill in self._skills[ordinal] if skill in found],
+                }
+                for ordinal, score in top
+            ]
+            return len(scores), page
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'documents': self._live,
+                'skills': len(self._postings),
+                'postings': sum(len(postings) for postings in self._postings.values()),
+                'postings_bytes': sum(postings.itemsize * len(postings) for postings in self._postings.values()),
+                'updates': self.updates,
+                'built_at': self.built_at.isoformat() if self.built_at else None,
+            }
+
+
+# Eventos de `files` que pueden cambiar `skills`: NER terminó (o la migración lo completó),
+# un documento deduplicado que ya lo trae, o un borrado.
+SKILLS_PIPELINE: list = [
+    {'$match': {'$or': [
+        {'operationType': 'insert', 'fullDocument.skills': {'$exists': True}},
+        {'updateDescription.updatedFields.skills': {'$exists': True}},
+        {'operationType': {'$in': ['delete', 'replace']}},
+    ]}},
+    {'$project': {'operationType': 1, 'documentKey': 1, 'fullDocument.file_id': 1, 'fullDocument.skills': 1}},
+]
+
+_index: SkillIndex = SkillIndex()
+
+
+def get_skill_index() -> SkillIndex:
+    """Índice del proceso (uno por réplica de la API)."""
+    return _index
+
+
+def skill_index_feed() -> ChangeFeed:
+    """Hilo que construye el índice al arrancar y lo mantiene al día (SKILL_INDEX_ENABLED)."""
+    if os.getenv('SKILL_INDEX_ENABLED', 'true').lower() != 'true':
+        return None
+    return ChangeFeed(
+        name='skill-index',
+        pipeline=SKILLS_PIPELINE,
+        on_reset=_index.build,
+        on_change=_index.apply,
+        on_poll=_index.refresh,
+    )
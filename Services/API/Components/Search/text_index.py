@@ -0,0 +1,431 @@
+from datetime import datetime as dt, timedelta, timezone
+from threading import RLock
+from pymongo import collection
+from Components.Search.analysis import analyze, parse_query
+from Components.Search.feed import ChangeFeed
+from Components.Search.segment import MemorySegment, Segment, Posting, write_segment
+from itertools import groupby
+import heapq
+import json
+import math
+import os
+import time
+
+# Resultados de `results` que tienen el texto del CV (el OCR actual y el histórico).
+TEXT_PROCESSES: tuple[str, ...] = ('Docling', 'OCR')
+_BUFFER: str = 'buffer'
+# Al retomar desde el manifiesto se relee un poco antes de `synced_at` (relojes de OCR y API).
+_CATCH_UP_OVERLAP: timedelta = timedelta(seconds=60)
+# Los documentos se identifican por el `_id` de Mongo (los eventos de borrado no traen file_id).
+# Un manifiesto de otra versión se descarta y el índice se reconstruye.
+_MANIFEST_VERSION: int = 2
+
+
+def document_text(file: dict) -> str:
+    """Texto del último resultado de OCR del documento, o None."""
+    for result in reversed(file.get('results') or []):
+        if result.get('process') in TEXT_PROCESSES and isinstance(result.get('data'), str):
+            return result['data']
+    return None
+
+
+class TextIndex:
+    """
+    Índice invertido full-text sobre el texto del OCR, con ranking BM25 y frases.
+
+    Almacenamiento (SEARCH_INDEX_DIR), al estilo de un LSM:
+      - los documentos nuevos van a un buffer en memoria (MemorySegment), que se busca igual
+      - el buffer se escribe como segmento inmutable (Components/Search/segment.py, leído con
+        mmap) al llegar a SEARCH_FLUSH_DOCS documentos o SEARCH_FLUSH_SECONDS segundos
+      - re-indexar o borrar un documento deja una lápida sobre su versión anterior (los
+        documentos se identifican por su `_id`, como en el índice de habilidades)
+      - con más de SEARCH_MAX_SEGMENTS segmentos se fusionan los más chicos, descartando
+        los documentos con lápida
+      - `manifest.json` lista los segmentos vigentes, sus lápidas y `synced_at`: al reiniciar
+        sólo se re-indexa lo que terminó el OCR desde entonces
+
+    Todas las escrituras vienen de un único hilo (ChangeFeed); las búsquedas pueden venir de
+    cualquiera y toman el lock mientras recorren las posting lists.
+    """
+
+    def __init__(self, directory: str = None, flush_docs: int = None, flush_seconds: float = None,
+                 max_segments: int = None, k1: float = 1.2, b: float = 0.75):
+        self.directory: str = directory or os.getenv('SEARCH_INDEX_DIR', '/data/search-index')
+        self.flush_docs: int = flush_docs or int(os.getenv('SEARCH_FLUSH_DOCS', '1000'))
+        self.flush_seconds: float = flush_seconds or float(os.getenv('SEARCH_FLUSH_SECONDS', '30'))
+        self.max_segments: int = max_segments or int(os.getenv('SEARCH_MAX_SEGMENTS', '8'))
+        self.k1 = k1
+        self.b = b
+        self._lock: RLock = RLock()
+        self._segments: list[Segment] = []
+        self._deleted: dict[str, set[int]] = {}
+        self._buffer: MemorySegment = MemorySegment()
+        self._buffer_since: float = None
+        self._locations: dict[str, tuple[str, int]] = {}  # _id -> (segmento o buffer, doc local)
+        self._live: int = 0
+        self._total_length: int = 0
+        self._next_segment: int = 1
+        self._opened: bool = False
+        self._syncing: bool = False
+        self.synced_at: dt = None
+        self.ready: bool = False
+        self.flushes: int = 0
+        self.merges: int = 0
+
+    # ---------- Manifiesto y segmentos ----------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _write_manifest(self) -> None:
+        manifest: dict = {
+            'version': _MANIFEST_VERSION,
+            'next_segment': self._next_segment,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+            'segments': [
+                {'name': segment.name, 'deleted': sorted(self._deleted.get(segment.name, ()))}
+                for segment in self._segments
+            ],
+        }
+        tmp: str = f'{self._manifest_path()}.tmp'
+        with open(tmp, 'w') as handle:
+            json.dump(manifest, handle)
+        os.replace(tmp, self._manifest_path())
+
+    def _source(self, name: str):
+        if name == _BUFFER:
+            return self._buffer
+        return next(segment for segment in self._segments if segment.name == name)
+
+    def open(self) -> None:
+        """Carga el manifiesto y mapea los segmentos (los archivos que no figuran se borran)."""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest: dict = {}
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path()) as handle:
+                manifest = json.load(handle)
+            if manifest.get('version') != _MANIFEST_VERSION:
+                print(f"Search index manifest version {manifest.get('version')} is outdated. Rebuilding.")
+                manifest = {}
+        listed: set[str] = set()
+        with self._lock:
+            for entry in manifest.get('segments', []):
+                segment: Segment = Segment(os.path.join(self.directory, f"{entry['name']}.seg"))
+                deleted: set[int] = set(entry.get('deleted', ()))
+                self._segments.append(segment)
+                self._deleted[segment.name] = deleted
+                listed.add(segment.name)
+                for doc, key in enumerate(segment.keys):
+                    if doc in deleted:
+                        continue
+                    previous = self._locations.get(key)
+                    if previous is not None:
+                        self._delete_location(previous)
+                    self._locations[key] = (segment.name, doc)
+                    self._live += 1
+                    self._total_length += segment.length(doc)
+            self._next_segment = manifest.get('next_segment', 1)
+            synced_at: str = manifest.get('synced_at')
+            self.synced_at = dt.fromisoformat(synced_at) if synced_at else None
+        # Restos de escrituras interrumpidas o de segmentos ya fusionados.
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.tmp') or (filename.endswith('.seg') and filename[:-4] not in listed):
+                os.remove(os.path.join(self.directory, filename))
+        self._opened = True
+
+    # ---------- Escritura ----------
+    def _delete_location(self, location: tuple[str, int]) -> None:
+        name, doc = location
+        source = self._source(name)
+        if name == _BUFFER:
+            self._deleted.setdefault(_BUFFER, set()).add(doc)
+        else:
+            self._deleted[name].add(doc)
+        self._live -= 1
+        self._total_length -= source.length(doc)
+
+    def upsert(self, key: str, text: str) -> None:
+        """Indexa (o re-indexa) el texto de un documento (`key`: su `_id`)."""
+        terms: list[tuple[str, int]] = analyze(text or '')
+        with self._lock:
+            self._remove_locked(key)
+            doc: int = self._buffer.add(key, terms)
+            self._locations[key] = (_BUFFER, doc)
+            self._live += 1
+            self._total_length += len(terms)
+            if self._buffer_since is None:
+                self._buffer_since = time.monotonic()
+
+    def _remove_locked(self, key: str) -> None:
+        location = self._locations.pop(key, None)
+        if location is not None:
+            self._delete_location(location)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove_locked(key)
+
+    def _reconcile(self, coll: collection.Collection) -> int:
+        """Quita los documentos que se borraron de `files` mientras no se seguía el change stream."""
+        existing: set[str] = {str(file['_id']) for file in coll.find({'ocr_status': 'done'}, {'_id': 1})}
+        with self._lock:
+            stale: list[str] = [key for key in self._locations if key not in existing]
+            for key in stale:
+                self._remove_locked(key)
+        return len(stale)
+
+    def flush(self) -> None:
+        """Escribe el buffer como un segmento nuevo y actualiza el manifiesto."""
+        buffer: MemorySegment = self._buffer
+        flushed_at: dt = dt.now(timezone.utc)
+        if buffer.n_docs:
+            name: str = f'seg_{self._next_segment:06d}'
+            write_segment(
+                os.path.join(self.directory, f'{name}.seg'), buffer.keys, buffer.lengths,
+                ((term, buffer.postings(term, positions=True)) for term in buffer.terms()),
+            )
+            segment: Segment = Segment(os.path.join(self.directory, f'{name}.seg'))
+            with self._lock:
+                self._segments.append(segment)
+                self._deleted[name] = self._deleted.pop(_BUFFER, set())
+                for doc, key in enumerate(buffer.keys):
+                    if self._locations.get(key) == (_BUFFER, doc):
+                        self._locations[key] = (name, doc)
+                self._buffer = MemorySegment()
+                self._next_segment += 1
+            self.flushes += 1
+        self._buffer_since = None
+        if not self._syncing:
+            # Durante `sync` no avanza: si se corta a la mitad, al reiniciar se retoma desde el principio.
+            self.synced_at = flushed_at
+        self._write_manifest()
+
+    def merge(self) -> None:
+        """Fusiona los segmentos más chicos en uno, sin los documentos con lápida."""
+        if len(self._segments) <= self.max_segments:
+            return
+        count: int = len(self._segments) - self.max_segments + 1
+        chosen: list[Segment] = sorted(self._segments, key=lambda segment: segment.size())[:max(count, 2)]
+        keys: list[str] = []
+        lengths: list[int] = []
+        remap: list[dict[int, int]] = []
+        for segment in chosen:
+            deleted: set[int] = self._deleted.get(segment.name, set())
+            mapping: dict[int, int] = {}
+            for doc in range(segment.n_docs):
+                if doc not in deleted:
+                    mapping[doc] = len(keys)
+                    keys.append(segment.key(doc))
+                    lengths.append(segment.length(doc))
+            remap.append(mapping)
+
+        def merged_postings():
+            for term, _ in groupby(heapq.merge(*(segment.terms() for segment in chosen))):
+                plist: list[Posting] = []
+                for segment, mapping in zip(chosen, remap):
+                    plist.extend(
+                        (mapping[doc], tf, positions)
+                        for doc, tf, positions in segment.postings(term, positions=True)
+                        if doc in mapping
+                    )
+                yield term, plist
+
+        name: str = f'seg_{self._next_segment:06d}'
+        write_segment(os.path.join(self.directory, f'{name}.seg'), keys, lengths, merged_postings())
+        segment: Segment = Segment(os.path.join(self.directory, f'{name}.seg'))
+        with self._lock:
+            names: set[str] = {old.name for old in chosen}
+            self._segments = [old for old in self._segments if old.name not in names] + [segment]
+            self._deleted[name] = set()
+            for old, mapping in zip(chosen, remap):
+                del self._deleted[old.name]
+                for doc, new_doc in mapping.items():
+                    self._locations[old.key(doc)] = (name, new_doc)
+            self._next_segment += 1
+            self._write_manifest()
+            for old in chosen:
+                old.close()
+        for old in chosen:
+            os.remove(old.path)
+        self.merges += 1
+        print(f'Search index merged {len(chosen)} segments into {name} ({len(keys)} documents).')
+
+    def maintain(self, force: bool = False) -> None:
+        """Flush del buffer si está lleno o es viejo (o `force`) y merge si hay demasiados segmentos."""
+        full: bool = self._buffer.n_docs >= self.flush_docs
+        stale: bool = self._buffer_since is not None and time.monotonic() - self._buffer_since >= self.flush_seconds
+        if force or full or stale:
+            self.flush()
+            self.merge()
+
+    # ---------- Alimentación desde `files` ----------
+    def sync(self, coll: collection.Collection) -> None:
+        """
+        Al (re)conectar el change stream: la primera vez construye el índice desde cero; si
+        ya hay un manifiesto, re-indexa sólo lo que el OCR terminó desde `synced_at`.
+        """
+        if not self._opened:
+            self.open()
+        self._syncing = True
+        started: dt = dt.now(timezone.utc)
+        query: dict = {'ocr_status': 'done'}
+        if self.synced_at is not None:
+            query['ocr_finished_at'] = {'$gte': self.synced_at - _CATCH_UP_OVERLAP}
+            self._reconcile(coll)
+        indexed: int = 0
+        for file in coll.find(query, {'results.process': 1, 'results.data': 1}):
+            text: str = document_text(file)
+            if text is not None:
+                self.upsert(str(file['_id']), text)
+                indexed += 1
+                self.maintain()
+        self._syncing = False
+        self.synced_at = started
+        self.maintain(force=True)
+        self.ready = True
+        print(f'Search index synced: {indexed} documents indexed, {self._live} in total.')
+
+    def apply(self, change: dict) -> None:
+        """Aplica un evento del change stream (OCR terminado, documento deduplicado, reemplazado o borrado)."""
+        key: str = str(change['documentKey']['_id'])
+        document: dict = change.get('fullDocument')
+        if change['operationType'] == 'delete' or document is None:
+            # Borrado (o borrado antes de que updateLookup lo leyera).
+            self.remove(key)
+        else:
+            text: str = document_text(document)
+            if text is not None:
+                self.upsert(key, text)
+            elif change['operationType'] == 'replace':
+                self.remove(key)
+        self.maintain()
+
+    def refresh(self, coll: collection.Collection, since: dt) -> None:
+        """Sin change streams: re-indexa lo que el OCR terminó desde `since` y quita lo borrado."""
+        self._reconcile(coll)
+        for file in coll.find({'ocr_finished_at': {'$gte': since}}, {'results.process': 1, 'results.data': 1}):
+            text: str = document_text(file)
+            if text is not None:
+                self.upsert(str(file['_id']), text)
+        self.maintain()
+
+    # ---------- Consulta ----------
+    @staticmethod
+    def _phrase_docs(phrase: list[tuple[str, int]], lists: dict[str, dict[int, list[int]]]) -> set[int]:
+        """Documentos donde los términos de la frase aparecen con los desplazamientos de la consulta."""
+        first, first_offset = phrase[0]
+        docs: set[int] = set(lists[first])
+        for term, _ in phrase[1:]:
+            docs &= lists[term].keys()
+        matched: set[int] = set()
+        for doc in docs:
+            positions: dict[str, set[int]] = {term: set(lists[term][doc]) for term, _ in phrase}
+            for start in lists[first][doc]:
+                base: int = start - first_offset
+                if all(base + offset in positions[term] for term, offset in phrase):
+                    matched.add(doc)
+                    break
+        return matched
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> tuple[int, list[dict]]:
+        """
+        BM25 sobre los términos de la consulta. Las frases entre comillas son obligatorias
+        (y sus términos suman al puntaje); los términos sueltos, opcionales si hay frases.
+        Devuelve (total de documentos que coinciden, página [{'id' (el `_id`), 'score'}]).
+        """
+        terms, phrases = parse_query(query)
+        phrase_terms: set[str] = {term for phrase in phrases for term, _ in phrase}
+        scored_terms: list[str] = list(dict.fromkeys(terms + [term for phrase in phrases for term, _ in phrase]))
+        if not scored_terms:
+            return 0, []
+
+        with self._lock:
+            if not self._live:
+                return 0, []
+            avgdl: float = self._total_length / self._live
+            sources: list = self._segments + [self._buffer]
+            names: list[str] = [segment.name for segment in self._segments] + [_BUFFER]
+            idf: dict[str, float] = {}
+            for term in scored_terms:
+                df: int = min(sum(source.df(term) for source in sources), self._live)
+                idf[term] = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+
+            scores: dict[tuple[int, int], float] = {}
+            for index, (source, name) in enumerate(zip(sources, names)):
+                deleted: set[int] = self._deleted.get(name, set())
+                lists: dict[str, dict[int, list[int]]] = {}
+                frequencies: dict[str, dict[int, int]] = {}
+                for term in scored_terms:
+                    plist: list[Posting] = source.postings(term, positions=term in phrase_terms)
+                    frequencies[term] = {doc: tf for doc, tf, _ in plist if doc not in deleted}
+                    if term in phrase_terms:
+                        lists[term] = {doc: positions for doc, _, positions in plist if doc not in deleted}
+
+                allowed: set[int] = None
+                for phrase in phrases:
+                    docs: set[int] = self._phrase_docs(phrase, lists)
+                    allowed = docs if allowed is None else allowed & docs
+
+                for term in scored_terms:
+                    for doc, tf in frequencies[term].items():
+                        if allowed is not None and doc not in allowed:
+                            continue
+                        norm: float = self.k1 * (1 - self.b + self.b * source.length(doc) / avgdl)
+                        scores[(index, doc)] = scores.get((index, doc), 0.0) + idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))[offset:]
+            page: list[dict] = [
+                {'id': sources[index].key(doc), 'score': round(score, 4)}
+                for (index, doc), score in top
+            ]
+            return len(scores), page
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'documents': self._live,
+                'segments': len(self._segments),
+                'segment_bytes': sum(segment.size() for segment in self._segments),
+                'buffered': self._buffer.n_docs,
+                'tombstones': sum(len(deleted) for deleted in self._deleted.values()),
+                'avg_length': round(self._total_length / self._live, 1) if self._live else 0,
+                'flushes': self.flushes,
+                'merges': self.merges,
+                'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+            }
+
+
+# Eventos de `files` con texto nuevo (el OCR terminó o se insertó un documento deduplicado),
+# reemplazos y borrados.
+TEXT_PIPELINE: list = [
+    {'$match': {'$or': [
+        {'operationType': 'insert', 'fullDocument.ocr_status': 'done'},
+        {'updateDescription.updatedFields.ocr_status': 'done'},
+        {'operationType': {'$in': ['delete', 'replace']}},
+    ]}},
+    {'$project': {
+        'operationType': 1, 'documentKey': 1,
+        'fullDocument.results.process': 1, 'fullDocument.results.data': 1,
+    }},
+]
+
+_index: TextIndex = TextIndex()
+
+
+def get_text_index() -> TextIndex:
+    """Índice del proceso (cada réplica de la API tiene su directorio)."""
+    return _index
+
+
+def text_index_feed() -> ChangeFeed:
+    """Hilo que abre/construye el índice al arrancar y lo mantiene al día (SEARCH_INDEX_ENABLED)."""
+    if os.getenv('SEARCH_INDEX_ENABLED', 'true').lower() != 'true':
+        return None
+    return ChangeFeed(
+        name='text-index',
+        pipeline=TEXT_PIPELINE,
+        on_reset=_index.sync,
+        on_change=_index.apply,
+        on_poll=_index.refresh,
+        on_idle=_index.maintain,
+    )
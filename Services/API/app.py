@@ -1,18 +1,44 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
 from pymongo import MongoClient
-from gridfs import GridFS
+from gridfs.errors import NoFile
 import os
+from threading import Thread
 import uuid
-import base64
-from Components.Mongo.mongo_connection import mongoDB_connection
+from Components.Mongo.mongo_connection import mongoDB_connection, close_connection, pool_stats
+from Components.Mongo.documents import open_document, iter_range, iter_base64, storage_format, stream_upload, UploadTooLarge, RAW, BASE64
+from Components.Mongo.indexes import ensure_indexes
 from Components.Files.file import router as file_router
-from datetime import datetime as dt
-from bson import ObjectId
-import io
+from Components.Files.dedup import find_source, inherit_results
+from Components.Migrations import raw_documents, created_at
+from Components.Search.skill_index import get_skill_index, skill_index_feed
+from Components.Search.text_index import get_text_index, text_index_feed
+from datetime import datetime as dt, timezone
+from typing import Literal
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title='API for NLP-Vitae application')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        ensure_indexes()
+    except Exception as err:
+        print(f'An exception ocurred creating indexes: {err}')
+    if os.getenv('MIGRATE_RAW_DOCUMENTS', 'false').lower() == 'true':
+        Thread(target=raw_documents.run_in_background, daemon=True).start()
+    # Barata e idempotente (sólo documentos sin `created_at`): las colas FIFO dependen de ella.
+    if os.getenv('MIGRATE_CREATED_AT', 'true').lower() == 'true':
+        Thread(target=created_at.run_in_background, daemon=True).start()
+    # Índices de búsqueda (habilidades y full-text): se construyen en segundo plano y siguen los cambios de `files`.
+    feeds = [feed for feed in (skill_index_feed(), text_index_feed()) if feed is not None]
+    for feed in feeds:
+        feed.start()
+    yield
+    for feed in feeds:
+        feed.stop()
+    close_connection()
+
+app = FastAPI(title='API for NLP-Vitae application', lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # En producción, especifica los dominios permitidos
@@ -29,39 +55,71 @@ async def health() -> JSONResponse:
         content={'status' : 'API Service is OK'}
     )
 
+@app.get('/health/mongo', summary='MongoDB pool statistics', description="Returns connection pool statistics of the shared MongoDB client.", tags=['Health'])
+async def health_mongo() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'pool' : pool_stats()}
+    )
+
+@app.get('/health/search', summary='In-memory search index statistics', description="Returns size and state of the in-memory skill index and the full-text index.", tags=['Health'])
+async def health_search() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'skills' : get_skill_index().stats(), 'text' : get_text_index().stats()}
+    )
 
-@app.post('/upload', summary='Upload a PDF file and save it in MongoDB', description="Returns OK if the file is uploaded correctly", tags=['Upload'])
-async def upload(file: UploadFile = File(...)) -> JSONResponse:
-    try:
-        path_destination: str = f"uploads/{file.filename}"
-        os.makedirs(os.path.dirname(path_destination), exist_ok=True)
-        
-        file_content: bytes = await file.read()
-        
-        with open(path_destination, "wb") as f:
-            f.write(file_content)
 
+# Tamaño máximo de un PDF subido (por defecto 50 MiB)
+MAX_UPLOAD_BYTES: int = int(os.getenv('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+
+@app.post('/upload', summary='Upload a PDF file and save it in MongoDB', description="Returns OK if the file is uploaded correctly. Already processed content reuses its results unless force_reprocess=true. ocr_profile selects the OCR pipeline profile (fast, balanced or accurate).", tags=['Upload'])
+async def upload(file: UploadFile = File(...), force_reprocess: bool = False,
+                 ocr_profile: Literal['fast', 'balanced', 'accurate'] = None) -> JSONResponse:
+    try:
         db: MongoClient = mongoDB_connection()
-        fs: GridFS = GridFS(db['nlp-vitae'], collection='documents')
         file_id: uuid.UUID = uuid.uuid4()
-        encoded_content: bytes = base64.b64encode(file_content)
-        file_base64_id = fs.put(encoded_content, filename=file.filename)
+        try:
+            # El PDF se guarda tal cual (sin base64); `file_base64_id` conserva su nombre por compatibilidad.
+            file_base64_id, size, sha256 = await stream_upload(db['nlp-vitae'], file, MAX_UPLOAD_BYTES)
+        except UploadTooLarge as err:
+            return JSONResponse(
+                status_code=413,
+                content={'message': str(err)}
+            )
 
         creation: dt = dt.now()
         coll = db['nlp-vitae']['files']
         file_document = {
             "file_id": str(file_id),
             "file_base64_id": str(file_base64_id),
+            "storage_format": RAW,
+            "size": size,
+            "sha256": sha256,
             "name": file.filename,
             "creation_date": creation.strftime("%d-%m-%Y %H:%M:%S"),
-            "results" : []
+            "created_at": creation.astimezone(timezone.utc),
+            "results" : [],
+            # Estado del pipeline: OCR queda en cola; NER y CV esperan a la etapa anterior.
+            "ocr_status": "pending",
+            "ocr_queued_at": creation.astimezone(timezone.utc),
+            "ner_status": "waiting",
+            "cv_status": "waiting"
         }
+        if ocr_profile:
+            # Perfil del pipeline de OCR pedido para este documento (el servicio OCR puede forzar otro).
+            file_document["ocr_profile"] = ocr_profile
+        # Mismo contenido ya procesado: se reutilizan sus resultados en lugar de volver a encolarlo.
+        source: dict = None if force_reprocess else find_source(coll, sha256)
+        if source is not None:
+            file_document.update(inherit_results(source))
         coll.insert_one(file_document)
 
         return JSONResponse(
             status_code=200,
             content={'message': f'File {file.filename} created successfully and loaded in MongoDB.',
-                     'file_id' : str(file_id)}
+                     'file_id' : str(file_id),
+                     'dedup_of' : source['file_id'] if source else None}
         )
 
     except Exception as err:
@@ -70,8 +128,39 @@ async def upload(file: UploadFile = File(...)) -> JSONResponse:
             content={'message': f'An exception occurred: {err}'}
         )
     
-@app.get('/download/{file_id}', summary='Download a PDF file based on file_id provided.', description="Returns a PDF File.", tags=['Download'])
-async def download(file_id: str):
+def _parse_range(header: str, length: int) -> tuple[int, int]:
+    """
+    Interpreta un header `Range: bytes=...` de un único rango.
+    Devuelve (inicio, fin) inclusive, None si no aplica (se sirve el archivo completo)
+    o levanta ValueError si el rango no es satisfacible (416).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, sep, last = header[len('bytes='):].strip().partition('-')
+    if not sep or not (first.isdigit() or first == '') or not (last.isdigit() or last == ''):
+        return None
+    if first == '':
+        if last == '' or int(last) == 0:
+            raise ValueError('Empty suffix range')
+        return max(0, length - int(last)), length - 1
+    start: int = int(first)
+    end: int = min(int(last), length - 1) if last else length - 1
+    if last and int(last) < start:
+        return None
+    if start >= length:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix('W/') for c in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+@app.get('/download/{file_id}', summary='Download a PDF file based on file_id provided.', description="Returns a PDF File. Supports Range requests (206) and If-None-Match (304).", tags=['Download'])
+def download(file_id: str, request: Request, download: bool = True):
     try:
         # Conexión a MongoDB
         db: MongoClient = mongoDB_connection()
@@ -80,21 +169,46 @@ async def download(file_id: str):
         
         file = coll.find_one({'file_id': file_id})
         if not file:
-            raise HTTPException(status_code=404, detail="File not found")
+            return JSONResponse(status_code=404, content={'message': 'File not found'})
 
-        fs: GridFS = GridFS(database, collection='documents')
-        pdf = fs.find_one({'_id': ObjectId(file['file_base64_id'])})
-        if not pdf:
-            raise HTTPException(status_code=404, detail="PDF not found in GridFS")
-        
-        pdf_content: bytes = pdf.read()
-        decoded_content: bytes = base64.b64decode(pdf_content)
+        try:
+            pdf = open_document(database, file)
+        except NoFile:
+            return JSONResponse(status_code=404, content={'message': 'PDF not found in GridFS'})
 
-        return StreamingResponse(
-            io.BytesIO(decoded_content),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={pdf.filename}"}
-        )
+        etag: str = f'"{file.get("sha256") or f"{pdf._id}-{pdf.length}"}"'
+        disposition: str = 'attachment' if download else 'inline'
+        headers: dict = {
+            'Content-Disposition': f'{disposition}; filename="{pdf.filename or file.get("name")}"',
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache',
+        }
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': headers['Cache-Control']})
+
+        # Formato anterior (base64): se decodifica en streaming; el tamaño final no se conoce de antemano.
+        if storage_format(file) == BASE64:
+            return StreamingResponse(iter_base64(pdf), media_type='application/pdf', headers=headers)
+
+        length: int = pdf.length
+        headers['Accept-Ranges'] = 'bytes'
+        range_header: str = request.headers.get('range')
+        if_range: str = request.headers.get('if-range')
+        if if_range and if_range.strip() != etag:
+            range_header = None
+        try:
+            byte_range = _parse_range(range_header, length)
+        except ValueError:
+            return Response(status_code=416, headers={'Content-Range': f'bytes */{length}', 'ETag': etag})
+
+        if byte_range is None:
+            headers['Content-Length'] = str(length)
+            return StreamingResponse(iter_range(pdf, 0, length - 1), media_type='application/pdf', headers=headers)
+
+        start, end = byte_range
+        headers['Content-Range'] = f'bytes {start}-{end}/{length}'
+        headers['Content-Length'] = str(end - start + 1)
+        return StreamingResponse(iter_range(pdf, start, end), status_code=206, media_type='application/pdf', headers=headers)
     except Exception as err:
         return JSONResponse(
             status_code=500,
@@ -0,0 +1,28 @@
+"""
+Pruebas de Components/Files/listing.py. Correr desde Services/API:
+    python -m pytest tests
+"""
+from datetime import datetime as dt, timezone
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from Components.Files.listing import serialize
+
+
+def test_serialize_nested_provisional_result():
+    created: dt = dt(2025, 3, 1, 12, 30, tzinfo=timezone.utc)
+    doc: dict = {
+        '_id': ObjectId(),
+        'file_id': 'f-1',
+        'created_at': created,
+        'ner_status': 'processing',
+        'ner_provisional': {'data': {'habilidades_tecnicas': ['python']}, 'created_at': created},
+        'results': [{'process': 'Docling', 'data': 'texto', 'timestamp': created, 'blob': ObjectId()}],
+    }
+
+    data: dict = serialize(doc)
+
+    assert data['ner_provisional']['created_at'] == created.isoformat()
+    assert data['results'][0]['timestamp'] == created.isoformat()
+    assert isinstance(data['_id'], str) and isinstance(data['results'][0]['blob'], str)
+    # Lo que hacen los endpoints: no debe levantar "Object of type datetime is not JSON serializable".
+    JSONResponse(content={'data': data})
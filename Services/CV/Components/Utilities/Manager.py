@@ -1,27 +1,35 @@
 from Components.Mongo.mongo_connection import mongoDB_connection
 from pymongo import MongoClient
 from Components.Utilities.Worker import Worker
+from Components.Utilities.Lease import LeaseClaimer, new_owner_id
 
 class Manager:
 
     def __init__(self, worker: Worker=None):
         self.worker: Worker = worker
+        self.owner: str = new_owner_id()
+        self.claimer: LeaseClaimer = LeaseClaimer(stage='cv')
+        self._indexes_ready: bool = False
 
-    def search_for_files(self):
+    def search_for_files(self) -> bool:
+        """Reclama el archivo más antiguo pendiente y lo procesa. Devuelve True si procesó uno."""
         try:
             print('Searching for oldest File to start processing (CV) ...')
             db : MongoClient = mongoDB_connection()
             coll = db['nlp-vitae']['files']
+            if not self._indexes_ready:
+                self.claimer.ensure_indexes(coll)
+                self._indexes_ready = True
 
-            file = coll.find_one(
-                {'results.0': {'$exists': True}, 'results.1': {'$exists': True}, 'results.2': {'$exists' : False}},
-                sort=[('creation_date', 1)]
-            )
+            file, lease = self.claimer.claim(coll, self.owner)
             if file:
-                print(f"File found. file_id: {file['file_id']}. Starting picture extraction...")
-                self.worker.process(file_id=file['file_id'])
+                print(f"File claimed by {self.owner}. file_id: {file['file_id']}. Starting picture extraction...")
+                with lease:
+                    self.worker.process(file_id=file['file_id'], lease=lease)
+                return True
             else:
                 print('No file found matching the criteria.')
+                return False
         except Exception as err:
             print(f'An exception ocurred: {err}')
-    
+            return False
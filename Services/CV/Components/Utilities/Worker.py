@@ -1,18 +1,19 @@
 from datetime import datetime as dt
 from Components.Mongo.mongo_connection import mongoDB_connection
+from Components.Mongo.documents import read_document
 from pymongo import MongoClient
 import face_recognition
 import fitz
 from gridfs import GridFS
-from bson import ObjectId
 from PIL import Image
 import io
 import numpy as np
-import base64
 import uuid
+from Components.Utilities.Lease import Lease
+
 class Worker:
 
-    def process(self, file_id: str):
+    def process(self, file_id: str, lease: Lease = None):
         try:
             db: MongoClient = mongoDB_connection()
             database = db['nlp-vitae']
@@ -21,13 +22,7 @@ class Worker:
             file = coll.find_one({'file_id': file_id})
 
             if file:
-                file_base64_id: str = file['file_base64_id']
-
-                fs: GridFS = GridFS(database, collection='documents')
-                file = fs.find_one({'_id': ObjectId(file_base64_id)})
-
-                file_content: bytes = file.read()
-                decoded_content = base64.b64decode(file_content)
+                decoded_content: bytes = read_document(database, file)
 
                 pdf = fitz.open("pdf", decoded_content)
                 profile_pic = None
@@ -49,35 +44,22 @@ class Worker:
                             end_time: dt = dt.now()
                             duration = (end_time - init_time).total_seconds()
 
-                            coll.find_one_and_update(
-                            {'file_id': file_id},
-                            {'$push': { 'results' : {
-                                'process' : 'CV',
-                                'data' : f'Profile pictured extracted with _id: {str(picture_id)}',
-                                'duration' : duration
-                            }
-                            }})
-
-                            coll.find_one_and_update(
-                                {'file_id': file_id},
-                                {'$set': {'picture_id': str(picture_id)}}
+                            self._save_result(
+                                coll, file_id, lease,
+                                data=f'Profile pictured extracted with _id: {str(picture_id)}',
+                                picture_id=str(picture_id),
+                                duration=duration
                             )
                             print(f'Profile picture found and saved. Stopping further processing.')
                             return
                         
                 end_time: dt = dt.now()
                 duration = (end_time - init_time).total_seconds()
-                coll.find_one_and_update(
-                {'file_id': file_id},
-                {'$push': { 'results' : {
-                    'process' : 'CV',
-                    'data' : f'No profile pictured found in file with file_id {file_id}.',
-                    'duration' : duration
-                }
-                }})
-                coll.find_one_and_update(
-                    {'file_id': file_id},
-                    {'$set': {'picture_id': 'No profile picture was found.'}}
+                self._save_result(
+                    coll, file_id, lease,
+                    data=f'No profile pictured found in file with file_id {file_id}.',
+                    picture_id='No profile picture was found.',
+                    duration=duration
                 )
                 print(f'No profile picture detected in file_id: {file_id}.')
 
@@ -86,8 +68,25 @@ class Worker:
                 return None
         except Exception as err:
             print(f'An exception occurred: {err}')
+            if lease is not None:
+                lease.fail(str(err))
             return None
 
+    def _save_result(self, coll, file_id: str, lease: Lease, data: str, picture_id: str, duration: float):
+        update: dict = {
+            '$push': { 'results' : {
+                'process' : 'CV',
+                'data' : data,
+                'duration' : duration
+            }},
+            '$set': {'picture_id': picture_id}
+        }
+        if lease is not None:
+            if not lease.complete(update):
+                print(f'Lease lost for file_id: {file_id}. Result discarded.')
+        else:
+            coll.find_one_and_update({'file_id': file_id}, update)
+
     def _face_detection(self, image: Image):
         image_array = np.array(image)
         faces = face_recognition.face_locations(image_array)
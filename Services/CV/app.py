@@ -2,11 +2,22 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from threading import Thread
+import os
 from Components.Utilities.Timer import CustomTimer
+from Components.Utilities.Dispatcher import ChangeStreamWatcher, stage_pipeline
 from Components.Utilities.Manager import Manager
 from Components.Utilities.Worker import Worker
+from Components.Mongo.mongo_connection import close_connection, pool_stats
 
-_timer: CustomTimer = CustomTimer(manager=Manager(worker=Worker()))
+# Cantidad de workers concurrentes dentro del proceso (cada uno reclama sus propios archivos).
+_concurrency: int = int(os.getenv('WORKER_CONCURRENCY', '1'))
+_timers: list[CustomTimer] = [CustomTimer(manager=Manager(worker=Worker())) for _ in range(_concurrency)]
+# Despierta a los workers apenas llega trabajo (change streams); sin replica set quedan en polling.
+_watcher: ChangeStreamWatcher = ChangeStreamWatcher(
+    name='cv-files',
+    pipeline=stage_pipeline('cv', previous='ner'),
+    targets=_timers
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,15 +29,21 @@ async def lifespan(app: FastAPI):
 def onStart():
     try:
         print('Initializing Task (Thread).')
-        _timer.interval = 5
-        _timer.start()
+        for _timer in _timers:
+            _timer.interval = float(os.getenv('POLL_MIN_INTERVAL', '1'))
+            _timer.max_interval = float(os.getenv('POLL_MAX_INTERVAL', '30'))
+            _timer.start()
+        _watcher.start()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
 def onStop():
     try:
         print('Ending Task (Thread).')
-        _timer.stop()
+        _watcher.stop()
+        for _timer in _timers:
+            _timer.stop()
+        close_connection()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
@@ -37,4 +54,11 @@ def health() -> JSONResponse:
     return JSONResponse(
         status_code=200,
         content={'status' : 'CV Service is OK'}
-    )
\ No newline at end of file
+    )
+
+@app.get('/health/mongo', summary='MongoDB pool statistics', description="Returns connection pool statistics of the shared MongoDB client.", tags=['Health'])
+def health_mongo() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'pool' : pool_stats()}
+    )
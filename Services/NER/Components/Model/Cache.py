@@ -0,0 +1,112 @@
+from datetime import datetime as dt, timezone
+from threading import Lock
+from pymongo import collection
+from Components.Mongo.mongo_connection import mongoDB_connection
+import os
+
+
+class ExtractionCache:
+    """
+    Cache persistente de extracciones del LLM en la colección `llm_cache`, direccionado por
+    contenido: la clave es el hash de LLM.cache_key (texto tras `_shrink`, modelo, versión del
+    prompt y opciones), así que un CV re-subido o exportado dos veces no vuelve a Ollama.
+
+    Expiración:
+      - índice TTL sobre `accessed_at` (se renueva en cada hit): LLM_CACHE_TTL_DAYS
+      - tope de entradas: cada LLM_CACHE_PRUNE_EVERY escrituras se borran las usadas hace
+        más tiempo hasta quedar en LLM_CACHE_MAX_ENTRIES
+
+    Un error del cache nunca hace fallar la etapa: se trata como un miss.
+    """
+
+    def __init__(self, enabled: bool = None, ttl_days: int = None, max_entries: int = None, prune_every: int = None):
+        self.enabled: bool = enabled if enabled is not None else os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ttl_days: int = ttl_days or int(os.getenv('LLM_CACHE_TTL_DAYS', '30'))
+        self.max_entries: int = max_entries or int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+        self.prune_every: int = prune_every or int(os.getenv('LLM_CACHE_PRUNE_EVERY', '100'))
+        self._lock: Lock = Lock()
+        self._indexes_ready: bool = False
+        self._counters: dict[str, int] = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'errors': 0}
+
+    def _coll(self) -> collection.Collection:
+        coll = mongoDB_connection()['nlp-vitae']['llm_cache']
+        if not self._indexes_ready:
+            coll.create_index('accessed_at', name='llm_cache_ttl', expireAfterSeconds=self.ttl_days * 24 * 3600)
+            self._indexes_ready = True
+        return coll
+
+    def _count(self, counter: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counters[counter] += amount
+            return self._counters[counter]
+
+    def get(self, key: str) -> dict:
+        """Resultado cacheado para `key` o None."""
+        if not self.enabled:
+            return None
+        try:
+            doc = self._coll().find_one_and_update(
+                {'_id': key},
+                {'$set': {'accessed_at': dt.now(timezone.utc)}, '$inc': {'hits': 1}},
+                projection={'data': 1},
+            )
+        except Exception as err:
+            print(f'An exception ocurred reading LLM cache: {err}')
+            self._count('errors')
+            return None
+        self._count('hits' if doc else 'misses')
+        return doc['data'] if doc else None
+
+    def put(self, key: str, data: dict, model: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            now: dt = dt.now(timezone.utc)
+            self._coll().update_one(
+                {'_id': key},
+                {'$set': {'data': data, 'model': model, 'accessed_at': now},
+                 '$setOnInsert': {'created_at': now, 'hits': 0}},
+                upsert=True,
+            )
+            if self._count('stores') % self.prune_every == 0:
+                self.prune()
+        except Exception as err:
+            print(f'An exception ocurred writing LLM cache: {err}')
+            self._count('errors')
+
+    def prune(self) -> int:
+        """Borra las entradas menos usadas recientemente por encima de `max_entries`."""
+        coll = self._coll()
+        excess: int = coll.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return 0
+        ids: list = [doc['_id'] for doc in coll.find({}, {'_id': 1}).sort('accessed_at', 1).limit(excess)]
+        deleted: int = coll.delete_many({'_id': {'$in': ids}}).deleted_count
+        self._count('evictions', deleted)
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters: dict[str, int] = dict(self._counters)
+        lookups: int = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 3) if lookups else 0.0
+        counters['enabled'] = self.enabled
+        try:
+            counters['entries'] = self._coll().estimated_document_count() if self.enabled else 0
+        except Exception:
+            counters['entries'] = None
+        return counters
+
+
+_cache: ExtractionCache = None
+_cache_lock: Lock = Lock()
+
+
+def get_cache() -> ExtractionCache:
+    """Cache del proceso (compartido por todos los workers, con contadores únicos)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache()
+    return _cache
@@ -1,21 +1,43 @@
+import asyncio
+import hashlib
 import json
+import math
+import os
 import re
-import requests
+import httpx
+from datetime import datetime as dt, timezone
+from threading import Lock
 from typing import Any, Dict, Optional, Union
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+# Respuestas que se reintentan (además de los errores de transporte: desconexiones, timeouts).
+RETRY_STATUS: frozenset = frozenset((500, 502, 503, 504))
 
 
 class LLM:
     """
-    Cliente para Ollama (/api/generate y /api/chat) orientado a extracción JSON.
+    Cliente asíncrono para Ollama (/api/generate y /api/chat) orientado a extracción JSON.
 
+    - Pool de conexiones HTTP/1.1 keep-alive (httpx.AsyncClient) con hasta `max_inflight`
+      pedidos a la vez; Ollama los atiende en paralelo según OLLAMA_NUM_PARALLEL.
+    - Cada pedido tiene un deadline total (reintentos incluidos) y se puede cancelar
+      cancelando la tarea que lo espera.
     - Forza salida JSON con `format="json"`.
     - Reduce tiempos muertos con `stream=True` (opcional).
-    - Evita truncados con `num_ctx` alto y `num_keep` para proteger el system prompt.
-    - Incluye warm-up y keep_alive para mantener el modelo cargado.
+    - Elige `num_ctx` de un conjunto chico de tamaños (LLM_CTX_BUCKETS) según una estimación de
+      tokens del prompt + `max_tokens`: los CVs cortos no pagan un KV cache de 8k y Ollama no
+      recarga el modelo en cada pedido por un `num_ctx` distinto. `num_keep` protege el system prompt.
+    - Incluye warm-up, refresco de keep_alive y consulta de modelos cargados (/api/ps) para
+      mantener el modelo residente; cuenta las cargas en frío (`load_duration`) y su costo.
+    - Un pool de conexiones por event loop: lo pueden usar los workers, el keeper de
+      residencia y los endpoints, cada uno desde su loop.
     """
 
+    # Subir al cambiar el prompt de sistema o el de usuario: invalida el cache de extracciones.
+    PROMPT_VERSION: str = "1"
+    _USER_PROMPT: str = "Extrae entidades del siguiente CV y responde SOLO JSON:\n"
+    _CHUNK_PROMPT: str = "Fragmento de un CV (secciones: {sections}). Extrae sus entidades y responde SOLO JSON:\n"
+    _FIELDS_PROMPT: str = "Devuelve SOLO estas claves (las demás ya están extraídas): {fields}.\n"
+
     def __init__(
         self,
         base_url: str = "http://llm:11434",
@@ -23,31 +45,44 @@ class LLM:
         # Usá tu límite real; 800s te cubre warm-ups largos locales
         connect_timeout: int = 10,
         read_timeout: int = 800,
-        keep_alive: str = "5m",         # mantiene el modelo cargado en Ollama
-        default_num_ctx: int = 8192,    # tamaño de contexto (bajá a 6144 o 4096 si tu HW no da)
+        keep_alive: str = None,         # mantiene el modelo cargado en Ollama (LLM_KEEP_ALIVE)
+        default_num_ctx: int = 8192,    # contexto del warm-up (los pedidos usan `ctx_buckets`)
         default_num_keep: int = 384,    # tokens del inicio que Ollama NO recorta
         default_temperature: float = 0.0,
+        max_inflight: int = None,       # pedidos simultáneos (LLM_MAX_INFLIGHT)
+        deadline: float = None,         # segundos totales por pedido (LLM_REQUEST_DEADLINE)
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        ctx_buckets: list[int] = None,  # tamaños de contexto posibles (LLM_CTX_BUCKETS)
+        chars_per_token: float = None,  # para estimar tokens (LLM_CHARS_PER_TOKEN)
+        cold_load_seconds: float = None,  # load_duration a partir del cual es una carga en frío
     ):
         self.base = base_url.rstrip("/")
         self.url_generate = f"{self.base}/api/generate"
         self.url_chat = f"{self.base}/api/chat"
         self.model = model
-        self.timeout = (connect_timeout, read_timeout)
-        self.keep_alive = keep_alive
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.keep_alive = keep_alive or os.getenv('LLM_KEEP_ALIVE', '5m')
         self.default_num_ctx = default_num_ctx
         self.default_num_keep = default_num_keep
         self.default_temperature = default_temperature
-
-        # Sesión con reintentos (5xx, desconexiones transitorias)
-        self.s = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=(500, 502, 503, 504),
-            allowed_methods=frozenset(["POST"]),
+        self.max_inflight: int = max_inflight or int(os.getenv('LLM_MAX_INFLIGHT', '2'))
+        self.deadline: float = deadline or float(os.getenv('LLM_REQUEST_DEADLINE', str(read_timeout)))
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.ctx_buckets: list[int] = sorted(
+            ctx_buckets or [int(size) for size in os.getenv('LLM_CTX_BUCKETS', '2048,4096,8192').split(',')]
         )
-        self.s.mount("http://", HTTPAdapter(max_retries=retries))
-        self.s.mount("https://", HTTPAdapter(max_retries=retries))
+        self.chars_per_token: float = chars_per_token or float(os.getenv('LLM_CHARS_PER_TOKEN', '3.0'))
+        self.cold_load_seconds: float = cold_load_seconds or float(os.getenv('LLM_COLD_LOAD_SECONDS', '1'))
+        self._stats_lock: Lock = Lock()
+        self._token_stats: Dict[str, int] = {"requests": 0, "estimated": 0, "actual": 0}
+        self._load_stats: Dict[str, Any] = {
+            "cold_loads": 0, "cold_load_seconds": 0.0, "max_cold_load_seconds": 0.0,
+            "last_cold_load": None, "by_source": {},
+        }
+        # Uno por event loop, creado dentro del loop que lo usa (ver `_http`).
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
 
         # Prompt de sistema compacto (reglas clave)
         self._SYSTEM = (
@@ -81,9 +116,223 @@ class LLM:
                 return json.loads(m.group(0))
             raise ValueError("La respuesta no contiene JSON parseable")
 
+    def _user_prompt(self, text: str, sections: Optional[str], fields: Optional[str] = None) -> str:
+        prefix = self._CHUNK_PROMPT.format(sections=sections) if sections else self._USER_PROMPT
+        if fields:
+            prefix = self._FIELDS_PROMPT.format(fields=fields) + prefix
+        return prefix + self._shrink(text)
+
+    def estimate_tokens(self, text: str) -> int:
+        """Estimación barata (sin tokenizer): caracteres / LLM_CHARS_PER_TOKEN, redondeado hacia arriba."""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def context_size(self, prompt_tokens: int, max_tokens: int) -> int:
+        """El bucket más chico que entra prompt (+10% de margen) + respuesta; si no, el más grande."""
+        needed: int = int(prompt_tokens * 1.1) + max_tokens
+        return next((size for size in self.ctx_buckets if size >= needed), self.ctx_buckets[-1])
+
+    def _options(
+        self,
+        max_tokens: int,
+        temperature: Optional[float],
+        num_ctx: int,
+        num_keep: Optional[int],
+        extra_options: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        opts: Dict[str, Any] = {
+            "temperature": self.default_temperature if temperature is None else temperature,
+            "num_predict": max_tokens,
+            "num_ctx": num_ctx,
+            "num_keep": self.default_num_keep if num_keep is None else num_keep,
+        }
+        if extra_options:
+            opts.update(extra_options)
+        return opts
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_inflight,
+                    max_keepalive_connections=self.max_inflight,
+                ),
+            )
+        return self._clients[loop]
+
+    @staticmethod
+    def _stats(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Contadores que Ollama agrega a la respuesta final (tokens y duraciones en ns)."""
+        return {key: data.get(key) for key in (
+            "prompt_eval_count", "eval_count", "load_duration", "prompt_eval_duration", "eval_duration", "total_duration",
+        )}
+
+    async def _send(self, url: str, payload: Dict[str, Any], streaming: bool, mode: str) -> tuple[str, Dict[str, Any]]:
+        """Un intento: devuelve (texto generado completo, estadísticas de Ollama)."""
+        if not streaming:
+            resp = await self._http().post(url, json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            raw = (
+                data.get("message", {}).get("content")
+                if mode == "chat"
+                else data.get("response", "")
+            )
+            if not raw:
+                raise ValueError("Respuesta vacía del modelo")
+            return raw, self._stats(data)
+
+        # --- Streaming: acumulamos response por líneas JSON ---
+        async with self._http().stream("POST", url, json=payload) as r:
+            r.raise_for_status()
+            buf: list[str] = []
+            stats: Dict[str, Any] = {}
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                    piece = (
+                        chunk.get("message", {}).get("content")
+                        if mode == "chat"
+                        else chunk.get("response", "")
+                    )
+                    if piece:
+                        buf.append(piece)
+                    if chunk.get("done"):
+                        stats = self._stats(chunk)
+                        break
+                except Exception:
+                    # ruido en el stream → lo ignoramos
+                    continue
+            full = "".join(buf)
+            if not full:
+                raise ValueError("Stream sin contenido")
+            return full, stats
+
+    async def _post(self, url: str, payload: Dict[str, Any], streaming: bool = False,
+                    mode: str = "generate") -> tuple[str, Dict[str, Any]]:
+        """`_send` con reintentos y backoff exponencial ante 5xx o errores de transporte."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._send(url, payload, streaming, mode)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    raise
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    def _record_tokens(self, estimated: int, stats: Dict[str, Any], num_ctx: int) -> None:
+        actual: Optional[int] = stats.get("prompt_eval_count")
+        print(f"LLM: num_ctx {num_ctx}, prompt tokens estimated {estimated} / actual {actual}, "
+              f"generated {stats.get('eval_count')}.")
+        if actual:
+            with self._stats_lock:
+                self._token_stats["requests"] += 1
+                self._token_stats["estimated"] += estimated
+                self._token_stats["actual"] += actual
+
+    def _record_load(self, stats: Dict[str, Any], source: str) -> None:
+        """Cuenta una carga en frío si Ollama tardó más de `cold_load_seconds` en cargar el modelo."""
+        seconds: float = (stats.get("load_duration") or 0) / 1e9
+        if seconds < self.cold_load_seconds:
+            return
+        print(f"LLM: cold load of {self.model} ({source}) took {seconds:.1f}s.")
+        with self._stats_lock:
+            self._load_stats["cold_loads"] += 1
+            self._load_stats["cold_load_seconds"] = round(self._load_stats["cold_load_seconds"] + seconds, 3)
+            self._load_stats["max_cold_load_seconds"] = max(self._load_stats["max_cold_load_seconds"], round(seconds, 3))
+            self._load_stats["last_cold_load"] = dt.now(timezone.utc).isoformat()
+            self._load_stats["by_source"][source] = self._load_stats["by_source"].get(source, 0) + 1
+
+    def token_stats(self) -> Dict[str, Any]:
+        """Estimado vs real (prompt_eval_count) acumulado, para ajustar LLM_CHARS_PER_TOKEN."""
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._token_stats)
+        stats["ratio"] = round(stats["actual"] / stats["estimated"], 3) if stats["estimated"] else None
+        stats["ctx_buckets"] = self.ctx_buckets
+        return stats
+
+    def load_stats(self) -> Dict[str, Any]:
+        """Cargas en frío del modelo (cantidad, segundos totales y máximo) por origen del pedido."""
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._load_stats, by_source=dict(self._load_stats["by_source"]))
+        stats["cold_load_threshold_seconds"] = self.cold_load_seconds
+        return stats
+
+    async def aclose(self) -> None:
+        """Cierra el pool de conexiones del event loop actual."""
+        client: httpx.AsyncClient = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
     # ---------- API pública ----------
-    def warm_up(self) -> None:
-        """Carga el modelo en memoria para evitar latencias del primer golpe."""
+    def cache_key(
+        self,
+        text: str,
+        *,
+        mode: str = "generate",
+        max_tokens: int = 1024,
+        temperature: Optional[float] = None,
+        num_ctx: Optional[int] = None,
+        num_keep: Optional[int] = None,
+        extra_options: Optional[Dict[str, Any]] = None,
+        sections: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> str:
+        """
+        Clave de cache de `ask` con los mismos argumentos: SHA-256 del texto tras `_shrink`,
+        el modelo, la versión y el contenido del prompt y las opciones de generación.
+        """
+        if num_ctx is None:
+            num_ctx = self.context_size(self.estimate_tokens(self._SYSTEM + self._user_prompt(text, sections, fields)), max_tokens)
+        material = {
+            "text": self._shrink(text),
+            "model": self.model,
+            "prompt_version": self.PROMPT_VERSION,
+            "prompt": hashlib.sha256((self._SYSTEM + self._user_prompt("", sections, fields)).encode("utf-8")).hexdigest(),
+            "mode": mode,
+            "options": self._options(max_tokens, temperature, num_ctx, num_keep, extra_options),
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    async def loaded_model(self) -> Optional[Dict[str, Any]]:
+        """
+        Entrada de /api/ps para `self.model` si Ollama lo tiene cargado, o None. Levanta
+        httpx.HTTPError si Ollama no responde.
+        """
+        resp = await self._http().get(f"{self.base}/api/ps", timeout=10)
+        resp.raise_for_status()
+        for entry in resp.json().get("models") or []:
+            name: str = entry.get("name") or entry.get("model") or ""
+            if name == self.model or name.split(":")[0] == self.model:
+                return entry
+        return None
+
+    async def refresh_keep_alive(self, num_ctx: Optional[int] = None) -> bool:
+        """
+        Renueva (o hace) la carga del modelo con un pedido sin prompt: Ollama sólo carga el
+        modelo y reinicia su `keep_alive`. Se pasa el `num_ctx` con el que está cargado para
+        no forzar una recarga.
+        """
+        payload: Dict[str, Any] = {"model": self.model, "keep_alive": self.keep_alive, "stream": False}
+        if num_ctx:
+            payload["options"] = {"num_ctx": num_ctx}
+        try:
+            async with asyncio.timeout(self.deadline):
+                resp = await self._http().post(self.url_generate, json=payload)
+                resp.raise_for_status()
+            self._record_load(self._stats(resp.json()), "keep_alive")
+            return True
+        except Exception as err:
+            print(f"LLM: keep-alive refresh failed: {err}")
+            return False
+
+    async def warm_up(self) -> bool:
+        """Carga el modelo en memoria para evitar latencias del primer golpe. Devuelve si lo logró."""
         payload = {
             "model": self.model,
             "system": self._SYSTEM,
@@ -99,13 +348,16 @@ class LLM:
             },
         }
         try:
-            r = self.s.post(self.url_generate, json=payload, timeout=self.timeout)
-            r.raise_for_status()
-        except Exception:
-            # No interrumpe la app si falla el warm-up; podés loguearlo si querés.
-            pass
+            async with asyncio.timeout(self.deadline):
+                _, stats = await self._post(self.url_generate, payload)
+            self._record_load(stats, "warm_up")
+            return True
+        except Exception as err:
+            # No interrumpe la app si falla el warm-up.
+            print(f"LLM: warm-up failed: {err}")
+            return False
 
-    def ask(
+    async def ask(
         self,
         text: str,
         *,
@@ -116,24 +368,24 @@ class LLM:
         num_ctx: Optional[int] = None,
         num_keep: Optional[int] = None,
         extra_options: Optional[Dict[str, Any]] = None,  # para pasar stops, top_k, etc.
+        sections: Optional[str] = None,    # si `text` es un fragmento: secciones que contiene
+        fields: Optional[str] = None,      # claves a devolver si no se piden todas (p.ej. las no resueltas por reglas)
+        deadline: Optional[float] = None,  # segundos; por defecto `self.deadline`
     ) -> Dict[str, Any]:
         """
         Ejecuta la consulta y devuelve SIEMPRE un dict (JSON parseado) o levanta excepción.
 
         - `streaming=True` acumula chunks del campo "response" y reduce timeouts percibidos.
         - `extra_options` se mergea en `options` (sin pisar los defaults salvo que lo indiques).
+        - Si se cancela la tarea, se corta el pedido HTTP en curso (asyncio.CancelledError).
         """
         sys = self._SYSTEM
-        user_prompt = "Extrae entidades del siguiente CV y responde SOLO JSON:\n" + self._shrink(text)
+        user_prompt = self._user_prompt(text, sections, fields)
 
-        opts: Dict[str, Any] = {
-            "temperature": self.default_temperature if temperature is None else temperature,
-            "num_predict": max_tokens,
-            "num_ctx": self.default_num_ctx if num_ctx is None else num_ctx,
-            "num_keep": self.default_num_keep if num_keep is None else num_keep,
-        }
-        if extra_options:
-            opts.update(extra_options)
+        estimated: int = self.estimate_tokens(sys + user_prompt)
+        if num_ctx is None:
+            num_ctx = self.context_size(estimated, max_tokens)
+        opts: Dict[str, Any] = self._options(max_tokens, temperature, num_ctx, num_keep, extra_options)
 
         if mode == "chat":
             url = self.url_chat
@@ -160,47 +412,16 @@ class LLM:
                 "options": opts,
             }
 
+        deadline = self.deadline if deadline is None else deadline
         try:
-            if not streaming:
-                resp = self.s.post(url, json=payload, timeout=self.timeout)
-                resp.raise_for_status()
-                data = resp.json()
-                raw = (
-                    data.get("message", {}).get("content")
-                    if mode == "chat"
-                    else data.get("response", "")
-                )
-                if not raw:
-                    raise ValueError("Respuesta vacía del modelo")
-                return self._coerce_json(raw)
-
-            # --- Streaming: acumulamos response por líneas JSON ---
-            with self.s.post(url, json=payload, timeout=self.timeout, stream=True) as r:
-                r.raise_for_status()
-                buf: list[str] = []
-                for line in r.iter_lines(decode_unicode=True):
-                    if not line:
-                        continue
-                    try:
-                        chunk = json.loads(line)
-                        piece = (
-                            chunk.get("message", {}).get("content")
-                            if mode == "chat"
-                            else chunk.get("response", "")
-                        )
-                        if piece:
-                            buf.append(piece)
-                        if chunk.get("done"):
-                            break
-                    except Exception:
-                        # ruido en el stream → lo ignoramos
-                        continue
-                full = "".join(buf)
-                if not full:
-                    raise RuntimeError("Stream sin contenido")
-                return self._coerce_json(full)
-
-        except requests.RequestException as e:
+            async with asyncio.timeout(deadline):
+                raw, stats = await self._post(url, payload, streaming=streaming, mode=mode)
+            self._record_tokens(estimated, stats, num_ctx)
+            self._record_load(stats, "request")
+            return self._coerce_json(raw)
+        except TimeoutError as e:
+            raise RuntimeError(f"Deadline de {deadline}s excedido consultando al LLM") from e
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Error HTTP consultando al LLM: {e}") from e
         except ValueError as e:
             raise RuntimeError(f"Error parseando JSON del LLM: {e}") from e
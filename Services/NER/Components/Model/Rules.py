@@ -0,0 +1,183 @@
+from collections import deque
+from typing import Any, Dict
+from Components.Model.Sections import heading_section
+from Components.Model.Skills import TECHNOLOGIES
+import os
+import re
+import unicodedata
+
+
+class KeywordMatcher:
+    """
+    Autómata de Aho-Corasick sobre caracteres: encuentra todos los alias de un diccionario
+    en una sola pasada por el texto, sin importar cuántos alias haya. Sólo se aceptan
+    coincidencias de palabra completa (sin letras o dígitos pegados a los lados) y, si se
+    solapan, gana la más larga ("node.js" y no "js").
+    """
+
+    def __init__(self, keywords: dict[str, str]):
+        """keywords: alias (en minúsculas) -> nombre canónico."""
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, str]]] = [[]]
+        for alias, canonical in keywords.items():
+            state: int = 0
+            for ch in alias:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._out[state].append((len(alias), canonical))
+
+        # Enlaces de falla por niveles (BFS): los hijos de la raíz vuelven a la raíz.
+        queue: deque = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback: int = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target: int = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """[(inicio, fin, canónico)] sin solapamientos, en orden de aparición; `text` ya en minúsculas."""
+        matches: list[tuple[int, int, str]] = []
+        state: int = 0
+        for end, ch in enumerate(text, start=1):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, canonical in self._out[state]:
+                start: int = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, canonical))
+
+        selected: list[tuple[int, int, str]] = []
+        for start, end, canonical in sorted(matches, key=lambda match: (match[0], match[0] - match[1])):
+            if not selected or start >= selected[-1][1]:
+                selected.append((start, end, canonical))
+        return selected
+
+
+_TECH_MATCHER: KeywordMatcher = KeywordMatcher(
+    {alias: canonical for canonical, aliases in TECHNOLOGIES.items() for alias in aliases}
+)
+
+_EMAIL: re.Pattern = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}', re.IGNORECASE)
+_PHONE: re.Pattern = re.compile(r'(?<![\w/.-])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{1,4}\)[\s.-]?)?\d(?:[\s.-]?\d){6,13}(?![\w/-])')
+_LINKEDIN: re.Pattern = re.compile(r'(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/[\w%-]+', re.IGNORECASE)
+_GITHUB: re.Pattern = re.compile(r'(?:https?://)?(?:www\.)?github\.com/[a-z0-9](?:[a-z0-9-]*[a-z0-9])?', re.IGNORECASE)
+_BIRTH_DATE: re.Pattern = re.compile(
+    r'(?:fecha de nacimiento|nacimiento|nacido el|date of birth|birth ?date|born)\s*[:\-]?\s*'
+    r'(\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2}))',
+    re.IGNORECASE,
+)
+# Rangos de años ("2019 - 2021", "03/2018-05/2020"): no son teléfonos.
+_DATE_LIKE: re.Pattern = re.compile(r'^(?:\d{1,2}[/.-])?(?:19|20)\d{2}\s*[-–]\s*(?:\d{1,2}[/.-])?(?:19|20)\d{2}$')
+_NAME_WORD: re.Pattern = re.compile(r"^[^\W\d_][^\W\d_'’.-]*(?:['’.-][^\W\d_]+)*\.?$")
+
+
+def _fold(text: str) -> str:
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(ch))
+
+
+def _phone(text: str) -> str:
+    for match in _PHONE.finditer(text):
+        candidate: str = match.group().strip()
+        digits: int = sum(ch.isdigit() for ch in candidate)
+        if 8 <= digits <= 15 and not _DATE_LIKE.match(candidate):
+            return candidate
+    return None
+
+
+def _name(text: str, max_lines: int = 5) -> str:
+    """Nombre: una de las primeras líneas con 2 a 5 palabras capitalizadas y sin datos de contacto."""
+    lines: list[str] = [line.strip() for line in text.splitlines() if line.strip()][:max_lines]
+    for line in lines:
+        words: list[str] = line.split()
+        if not 2 <= len(words) <= 5 or heading_section(line) is not None:
+            continue
+        if 'curriculum' in _fold(line) or not all(_NAME_WORD.match(word) and word[0].isupper() for word in words):
+            continue
+        return line.title() if line.isupper() else line
+    return None
+
+
+def extract_personal(text: str) -> Dict[str, Any]:
+    """Datos de contacto con las claves que usa el resto del pipeline (ver ExtractedView.tsx)."""
+    personal: Dict[str, Any] = {}
+    name: str = _name(text)
+    if name:
+        personal['nombre'] = name
+    emails: list[str] = list(dict.fromkeys(email.lower() for email in _EMAIL.findall(text)))
+    if emails:
+        personal['correo_electronico'] = emails
+    phone: str = _phone(_EMAIL.sub(' ', text))
+    if phone:
+        personal['telefono'] = phone
+    for key, pattern in (('linkedin', _LINKEDIN), ('github', _GITHUB)):
+        match = pattern.search(text)
+        if match:
+            personal[key] = match.group()
+    birth = _BIRTH_DATE.search(_fold(text))
+    if birth:
+        personal['fecha_nacimiento'] = birth.group(1)
+    return personal
+
+
+def extract_technologies(text: str) -> list[str]:
+    """Tecnologías del diccionario presentes en el texto (canónicas, en orden de aparición)."""
+    # Las URLs y correos no cuentan ("github.com/juan-python", "ana@react.dev").
+    clean: str = _EMAIL.sub(' ', re.sub(r'\S+\.(?:com|io|dev|org|net)/\S*', ' ', text.lower()))
+    return list(dict.fromkeys(canonical for _, _, canonical in _TECH_MATCHER.find(clean)))
+
+
+def extract(text: str) -> Dict[str, Any]:
+    """
+    Extracción determinística (regex + diccionario) de los campos fáciles:
+    {'datos_personales': {...}, 'habilidades_tecnicas': [...]}. Tarda milisegundos.
+    """
+    return {
+        'datos_personales': extract_personal(text) or None,
+        'habilidades_tecnicas': extract_technologies(text),
+    }
+
+
+def complete_fields(rules: Dict[str, Any], min_skills: int = None) -> tuple[str, ...]:
+    """
+    Claves que las reglas resuelven y no hace falta pedirle al LLM: las habilidades si se
+    encontraron al menos `min_skills` tecnologías distintas del diccionario (RULES_MIN_SKILLS;
+    con pocas, lo más probable es que el CV tenga otras que el diccionario no conoce), y los
+    datos personales si se encontró el nombre y al menos un medio de contacto.
+    """
+    min_skills = min_skills or int(os.getenv('RULES_MIN_SKILLS', '5'))
+    fields: list[str] = []
+    personal: Dict[str, Any] = rules.get('datos_personales') or {}
+    if personal.get('nombre') and (personal.get('correo_electronico') or personal.get('telefono')):
+        fields.append('datos_personales')
+    if len(rules.get('habilidades_tecnicas') or []) >= min_skills:
+        fields.append('habilidades_tecnicas')
+    return tuple(fields)
+
+
+def apply(result: Dict[str, Any], rules: Dict[str, Any], fields: tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Combina el JSON del LLM con las reglas: las claves de `fields` salen de las reglas. Si
+    datos_personales se le pidió al LLM, los contactos encontrados por regex pisan los suyos y
+    el nombre de las reglas sólo se usa si el LLM no dio uno.
+    """
+    merged: Dict[str, Any] = dict(result)
+    for key in fields:
+        merged[key] = rules.get(key)
+    if 'datos_personales' not in fields and rules.get('datos_personales'):
+        personal: Dict[str, Any] = dict(merged.get('datos_personales') or {}) if isinstance(merged.get('datos_personales'), dict) else {}
+        for field, value in rules['datos_personales'].items():
+            if field != 'nombre' or not personal.get('nombre'):
+                personal[field] = value
+        merged['datos_personales'] = personal
+    return merged
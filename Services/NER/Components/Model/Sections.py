@@ -0,0 +1,201 @@
+import json
+import re
+import os
+import unicodedata
+from typing import Any, Dict
+
+# Claves del JSON de extracción (ver el prompt de sistema en Components/Model/LLM.py).
+SCHEMA: tuple[str, ...] = (
+    'datos_personales', 'experiencia_laboral', 'educacion', 'habilidades_tecnicas',
+    'idiomas', 'certificaciones_y_cursos', 'otros',
+)
+
+# Títulos de sección (sin tildes y en minúsculas) -> clave del esquema que llenan.
+_HEADINGS: dict[str, tuple[str, ...]] = {
+    'datos_personales': (
+        'datos personales', 'informacion personal', 'perfil', 'perfil profesional', 'resumen', 'sobre mi',
+        'acerca de mi', 'contacto', 'personal information', 'profile', 'summary', 'about me', 'contact',
+    ),
+    'experiencia_laboral': (
+        'experiencia', 'experiencia laboral', 'experiencia profesional', 'trayectoria', 'trayectoria profesional',
+        'historial laboral', 'antecedentes laborales', 'experience', 'work experience', 'professional experience',
+        'employment', 'employment history', 'work history',
+    ),
+    'educacion': (
+        'educacion', 'formacion', 'formacion academica', 'estudios', 'antecedentes academicos',
+        'education', 'academic background',
+    ),
+    'habilidades_tecnicas': (
+        'habilidades', 'habilidades tecnicas', 'competencias', 'competencias tecnicas', 'conocimientos',
+        'conocimientos tecnicos', 'tecnologias', 'herramientas', 'skills', 'technical skills', 'tech stack',
+        'technologies', 'tools',
+    ),
+    'idiomas': ('idiomas', 'languages'),
+    'certificaciones_y_cursos': (
+        'certificaciones', 'certificados', 'cursos', 'capacitaciones', 'certificaciones y cursos',
+        'cursos y certificaciones', 'certifications', 'courses', 'training', 'certifications and courses',
+    ),
+    'otros': (
+        'proyectos', 'publicaciones', 'referencias', 'voluntariado', 'intereses', 'premios', 'logros',
+        'projects', 'publications', 'references', 'volunteering', 'interests', 'awards', 'achievements',
+    ),
+}
+
+_HEADING_INDEX: dict[str, str] = {title: section for section, titles in _HEADINGS.items() for title in titles}
+# "1. Experiencia laboral:", "## EDUCACIÓN", "• Skills" ...
+_DECORATION: re.Pattern = re.compile(r'^[\s#*•\-–—\d.)]*|[\s:|\-–—]*$')
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin tildes."""
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(ch))
+
+
+def heading_section(line: str) -> str:
+    """Clave del esquema si la línea es un título de sección conocido, o None."""
+    if len(line) > 60:
+        return None
+    title: str = re.sub(r'\s+', ' ', _DECORATION.sub('', _fold(line)))
+    return _HEADING_INDEX.get(title)
+
+
+def split_sections(text: str) -> list[tuple[str, str]]:
+    """
+    Divide el texto en secciones según sus títulos. Lo anterior al primer título (nombre,
+    contacto) es `datos_personales`. Devuelve [(clave, texto)] en el orden del documento.
+    """
+    sections: list[tuple[str, list[str]]] = [('datos_personales', [])]
+    for line in text.splitlines():
+        section: str = heading_section(line) if line.strip() else None
+        if section is not None:
+            sections.append((section, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(section, '\n'.join(lines).strip()) for section, lines in sections if '\n'.join(lines).strip()]
+
+
+def _hard_split(text: str, max_chars: int) -> list[str]:
+    """Parte un texto sin cortes de línea en trozos de hasta `max_chars`, entre palabras."""
+    parts: list[str] = []
+    current: str = ''
+    for word in text.split():
+        # Una "palabra" más larga que el trozo (p.ej. una URL enorme) no tiene otro corte posible.
+        while len(word) > max_chars:
+            if current:
+                parts.append(current)
+                current = ''
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + len(word) + 1 > max_chars:
+            parts.append(current)
+            current = ''
+        current = f'{current} {word}' if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _split_long(text: str, max_chars: int) -> list[str]:
+    """
+    Parte una sección larga en trozos de hasta `max_chars`, cortando entre párrafos (o líneas,
+    o palabras), sin cambiar el orden del texto.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    parts: list[str] = []
+    current: str = ''
+    for block in re.split(r'\n\s*\n', text):
+        pieces: list[str] = [block] if len(block) <= max_chars else block.splitlines()
+        for piece in pieces:
+            if len(piece) > max_chars:
+                # Lo acumulado va antes que los trozos de esta línea.
+                if current:
+                    parts.append(current)
+                hard: list[str] = _hard_split(piece, max_chars)
+                parts.extend(hard[:-1])
+                current = hard[-1] if hard else ''
+                continue
+            if current and len(current) + len(piece) + 2 > max_chars:
+                parts.append(current)
+                current = ''
+            current = f'{current}\n\n{piece}' if current else piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def plan_chunks(text: str, max_chars: int = None) -> list[tuple[tuple[str, ...], str]]:
+    """
+    Trozos a extraer: [(secciones, texto)]. Las secciones contiguas chicas se agrupan en un
+    mismo trozo hasta `max_chars` (LLM_CHUNK_CHARS); las largas se parten. Un CV corto queda
+    en un solo trozo.
+    """
+    max_chars = max_chars or int(os.getenv('LLM_CHUNK_CHARS', '3000'))
+    if len(text) <= max_chars:
+        return [(SCHEMA, text)] if text.strip() else []
+
+    chunks: list[tuple[tuple[str, ...], str]] = []
+    for section, body in split_sections(text):
+        parts: list[str] = _split_long(body, max_chars)
+        # Sólo se agrupan secciones que entran enteras (p.ej. idiomas + certificaciones).
+        if chunks and len(parts) == 1 and len(chunks[-1][1]) + len(parts[0]) + 2 <= max_chars:
+            sections, previous = chunks[-1]
+            chunks[-1] = (tuple(dict.fromkeys(sections + (section,))), f'{previous}\n\n{parts[0]}')
+            continue
+        chunks.extend(((section,), part) for part in parts)
+    return chunks
+
+
+def _canonical(value: Any) -> str:
+    """Forma normalizada de un valor para detectar duplicados (sin mayúsculas, tildes ni espacios extra)."""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', _fold(value)).strip()
+    if isinstance(value, dict):
+        return json.dumps({k: _canonical(v) for k, v in sorted(value.items()) if v not in (None, '', [], {})},
+                          sort_keys=True, ensure_ascii=False)
+    if isinstance(value, list):
+        return json.dumps([_canonical(v) for v in value], ensure_ascii=False)
+    return json.dumps(value)
+
+
+def _as_list(value: Any) -> list:
+    if value in (None, '', {}):
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def merge_partials(partials: list[tuple[tuple[str, ...], Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Une las extracciones parciales [(secciones, json)] en el esquema completo, de forma
+    determinística: para cada clave se toman primero los trozos que contienen su sección y
+    después el resto, en orden de documento.
+      - datos_personales: primer valor no vacío de cada campo
+      - listas: concatenadas, sin duplicados (comparación normalizada)
+    """
+    merged: Dict[str, Any] = {}
+    for key in SCHEMA:
+        ordered: list[Dict[str, Any]] = (
+            [data for sections, data in partials if key in sections]
+            + [data for sections, data in partials if key not in sections]
+        )
+        if key == 'datos_personales':
+            personal: Dict[str, Any] = {}
+            for data in ordered:
+                value = data.get(key)
+                if isinstance(value, dict):
+                    for field, field_value in value.items():
+                        if personal.get(field) in (None, '', []) and field_value not in (None, '', []):
+                            personal[field] = field_value
+            merged[key] = personal or None
+            continue
+
+        items: list = []
+        seen: set = set()
+        for data in ordered:
+            for item in _as_list(data.get(key)):
+                canonical: str = _canonical(item)
+                if canonical not in seen:
+                    seen.add(canonical)
+                    items.append(item)
+        merged[key] = items
+    return merged
@@ -1,27 +1,46 @@
 from Components.Mongo.mongo_connection import mongoDB_connection
 from pymongo import MongoClient
 from Components.Utilities.Worker import Worker
+from Components.Utilities.Lease import Lease, LeaseClaimer, new_owner_id
+from Components.Utilities.Residency import ModelKeeper
+import asyncio
+import os
 
 class Manager:
 
-    def __init__(self, worker: Worker=None):
+    def __init__(self, worker: Worker=None, keeper: ModelKeeper=None):
         self.worker: Worker = worker
+        # Sin el modelo cargado no se reclama (LLM_READINESS_GATE=false lo desactiva).
+        self.keeper: ModelKeeper = keeper if os.getenv('LLM_READINESS_GATE', 'true').lower() == 'true' else None
+        self.owner: str = new_owner_id()
+        self.claimer: LeaseClaimer = LeaseClaimer(stage='ner', next_stage='cv')
+        self._indexes_ready: bool = False
 
-    def search_for_files(self):
+    def claim(self) -> tuple[dict, Lease]:
+        """Reclama el archivo pendiente más antiguo (o devuelve (None, None))."""
+        db : MongoClient = mongoDB_connection()
+        coll = db['nlp-vitae']['files']
+        if not self._indexes_ready:
+            self.claimer.ensure_indexes(coll)
+            self._indexes_ready = True
+        return self.claimer.claim(coll, self.owner)
+
+    async def search_for_files(self) -> bool:
+        """Reclama el archivo más antiguo pendiente y lo procesa. Devuelve True si procesó uno."""
         try:
+            if self.keeper is not None and not self.keeper.ready:
+                print('Model not loaded yet; waiting before claiming files (NER) ...')
+                return False
             print('Searching for oldest File to start processing (NER) ...')
-            db : MongoClient = mongoDB_connection()
-            coll = db['nlp-vitae']['files']
-
-            file = coll.find_one(
-                {'results.0': {'$exists': True}, 'results.1': {'$exists': False}},
-                sort=[('creation_date', 1)]
-            )
+            file, lease = await asyncio.to_thread(self.claim)
             if file:
-                print(f"File found. file_id: {file['file_id']}. Starting text recognition...")
-                self.worker.process(file_id=file['file_id'])
+                print(f"File claimed by {self.owner}. file_id: {file['file_id']}. Starting text recognition...")
+                with lease:
+                    await self.worker.process(file_id=file['file_id'], lease=lease)
+                return True
             else:
                 print('No file found matching the criteria.')
+                return False
         except Exception as err:
             print(f'An exception ocurred: {err}')
-    
+            return False
@@ -0,0 +1,146 @@
+from datetime import datetime as dt
+from threading import Thread, Event
+from typing import Any
+from Components.Model.LLM import LLM
+from Components.Mongo.mongo_connection import mongoDB_connection
+import asyncio
+import os
+
+
+def _parse_range(spec: str) -> tuple[int, int]:
+    """"8-19" -> (8, 19). Vacío -> None."""
+    if not spec.strip():
+        return None
+    start, _, end = spec.partition('-')
+    return int(start), int(end or start)
+
+
+class ModelKeeper(Thread):
+    """
+    Mantiene el modelo residente en Ollama desde un hilo con su propio event loop:
+
+      - al arrancar hace el warm-up en segundo plano (la app no espera la carga)
+      - cada `interval` segundos consulta /api/ps y, si hay documentos en la cola de NER o
+        estamos dentro del horario configurado, renueva el `keep_alive` (o vuelve a cargar
+        el modelo si Ollama lo descargó)
+      - `ready` indica si el modelo está cargado: los Manager no reclaman documentos
+        mientras no lo esté, así la carga en frío la paga el keeper y no el deadline de
+        una extracción. Al quedar listo despierta a los `targets` (Timers).
+
+    Si Ollama no expone /api/ps, `ready` refleja el último warm-up/refresco exitoso.
+    """
+
+    def __init__(self, llm: LLM, targets: list = None, interval: float = None, hours: str = None, days: str = None):
+        """
+        interval: segundos entre chequeos (LLM_RESIDENCY_INTERVAL); menor que LLM_KEEP_ALIVE.
+        hours: horario en que se mantiene el modelo cargado aunque no haya cola (LLM_KEEP_WARM_HOURS, "8-19").
+        days: días de la semana de ese horario, 0 = lunes (LLM_KEEP_WARM_DAYS, "0-4").
+        """
+        self.llm = llm
+        self.targets = targets or []
+        self.interval: float = interval or float(os.getenv('LLM_RESIDENCY_INTERVAL', '60'))
+        self.hours: tuple[int, int] = _parse_range(hours if hours is not None else os.getenv('LLM_KEEP_WARM_HOURS', '8-19'))
+        self.days: tuple[int, int] = _parse_range(days if days is not None else os.getenv('LLM_KEEP_WARM_DAYS', '0-4'))
+        self.ready: bool = False
+        self.state: dict[str, Any] = {'loaded': False, 'checked_at': None, 'reason': 'starting'}
+        self._runs: Event = Event()
+        self._runs.set()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._wake: asyncio.Event = None
+        super().__init__(daemon=True)
+
+    def in_business_hours(self, now: dt = None) -> bool:
+        if self.hours is None:
+            return False
+        now = now or dt.now()
+        if self.days is not None and not self.days[0] <= now.weekday() <= self.days[1]:
+            return False
+        return self.hours[0] <= now.hour <= self.hours[1]
+
+    def queue_size(self) -> int:
+        """Documentos pendientes o en proceso de NER (usa el índice `ner_queue`)."""
+        coll = mongoDB_connection()['nlp-vitae']['files']
+        return coll.count_documents({'ner_status': {'$in': ['pending', 'processing']}})
+
+    async def check(self) -> dict[str, Any]:
+        """Consulta /api/ps y actualiza `ready` y `state`."""
+        try:
+            entry: dict = await self.llm.loaded_model()
+            self.state = {
+                'loaded': entry is not None,
+                'expires_at': (entry or {}).get('expires_at'),
+                'size_vram': (entry or {}).get('size_vram'),
+                'context_length': (entry or {}).get('context_length'),
+            }
+        except Exception as err:
+            self.state = {'loaded': self.ready, 'error': f'{err}'}
+        self.state['checked_at'] = dt.now().isoformat()
+        self._set_ready(self.state['loaded'])
+        return self.state
+
+    def _set_ready(self, ready: bool) -> None:
+        was_ready: bool = self.ready
+        self.ready = ready
+        if ready and not was_ready:
+            print(f'Model {self.llm.model} is loaded. NER workers can claim files.')
+            for target in self.targets:
+                target.wake()
+
+    async def _tick(self) -> None:
+        state: dict[str, Any] = await self.check()
+        reason: str = None
+        if self.in_business_hours():
+            reason = 'business_hours'
+        elif await asyncio.to_thread(self.queue_size) > 0:
+            reason = 'queue'
+        self.state['reason'] = reason
+        if reason is None:
+            # Sin cola fuera de horario: se deja vencer el keep_alive y Ollama libera la memoria.
+            return
+        refreshed: bool = await self.llm.refresh_keep_alive(num_ctx=state.get('context_length'))
+        if 'error' in state:
+            # Sin /api/ps: el refresco dice si Ollama tiene (o pudo cargar) el modelo.
+            self._set_ready(refreshed)
+        elif not state['loaded']:
+            await self.check()
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            print(f'Warming up model {self.llm.model} ...')
+            if await self.llm.warm_up():
+                self._set_ready(True)
+            while self._runs.is_set():
+                try:
+                    await self._tick()
+                except Exception as err:
+                    print(f'An exception ocurred refreshing the model: {err}')
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                    self._wake.clear()
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.llm.aclose()
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def wake(self):
+        """Chequeo inmediato (p.ej. llegó un documento a la cola de NER con el modelo descargado)."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def stop(self):
+        self._runs.clear()
+        self.wake()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'model': self.llm.model,
+            'keep_alive': self.llm.keep_alive,
+            'business_hours': self.in_business_hours(),
+            **self.state,
+        }
@@ -1,36 +1,102 @@
 from threading import Thread, Event
-import time
 from Components.Utilities.Manager import Manager
+import asyncio
 
 class Timer(Thread):
-    
-    interval : int
+    """
+    Hilo con su propio event loop de asyncio y `slots` bucles de búsqueda concurrentes: cada
+    slot reclama y procesa un documento a la vez, así que hay hasta `slots` extracciones en
+    vuelo. Sin trabajo, cada slot espera con backoff exponencial hasta que lo despierten.
+    """
 
-    def __init__(self, interval: int = None):
+    interval : float
+    max_interval : float
+
+    def __init__(self, interval: float = None, max_interval: float = None, slots: int = 1):
+        """
+        interval: espera mínima entre búsquedas cuando no hay trabajo.
+        max_interval: tope del backoff exponencial mientras la cola sigue vacía.
+        slots: documentos procesándose a la vez.
+        """
         self.interval = interval
+        self.max_interval = max_interval
+        self.slots = slots
         self._timer_runs: Event = Event()
         self._timer_runs.set()
-        super().__init__()
-    
+        self._loop: asyncio.AbstractEventLoop = None
+        self._wakes: list[asyncio.Event] = []
+        self._tasks: list[asyncio.Task] = []
+        super().__init__(daemon=True)
+
     def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakes = [asyncio.Event() for _ in range(self.slots)]
+        self._tasks = [asyncio.create_task(self._slot(slot)) for slot in range(self.slots)]
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            await self.close()
+
+    async def _slot(self, slot: int):
+        idle: float = self.interval
         while self._timer_runs.is_set():
-            self.timer()
-            time.sleep(self.interval)
-    
+            if await self.timer(slot):
+                # Hubo trabajo: seguimos drenando la cola sin esperar.
+                idle = self.interval
+                continue
+            try:
+                await asyncio.wait_for(self._wakes[slot].wait(), idle)
+                self._wakes[slot].clear()
+                idle = self.interval
+            except asyncio.TimeoutError:
+                idle = min(idle * 2, self.max_interval or idle)
+
+    def _wake_all(self):
+        for wake in self._wakes:
+            wake.set()
+
+    def wake(self):
+        """Despierta a los slots (p.ej. desde el hilo del change stream) para que busquen trabajo ya."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake_all)
+
     def stop(self):
+        """
+        Detiene los slots cancelando las extracciones en curso (sus documentos vuelven a la cola).
+        Sólo agenda la cancelación: hay que esperar al hilo (join) antes de cerrar la conexión a Mongo.
+        """
         self._timer_runs.clear()
+        if self._loop is not None and not self._loop.is_closed():
+            for task in self._tasks:
+                self._loop.call_soon_threadsafe(task.cancel)
+
+    async def timer(self, slot: int) -> bool:
+        return False
+
+    async def close(self):
+        pass
 
 class CustomTimer(Timer):
 
-    def __init__(self, interval: int = None, manager: Manager = None):
-        super().__init__(interval)
-        self.manager = manager
+    def __init__(self, interval: float = None, max_interval: float = None, managers: list[Manager] = None):
+        super().__init__(interval, max_interval, slots=len(managers or []) or 1)
+        self.managers = managers
 
     '''
     Your custom behaviour goes here (timer function).
+    Devuelve True si procesó un archivo (para seguir drenando la cola).
     '''
-    def timer(self):
-        if self.manager:
-            self.manager.search_for_files()
+    async def timer(self, slot: int) -> bool:
+        if self.managers:
+            return await self.managers[slot].search_for_files()
         else:
-            print("Manager instance not provided.")
\ No newline at end of file
+            print("Manager instance not provided.")
+            return False
+
+    async def close(self):
+        # Cierra el pool de conexiones HTTP del LLM dentro del mismo event loop que lo creó.
+        for manager in self.managers or []:
+            await manager.worker.llm.aclose()
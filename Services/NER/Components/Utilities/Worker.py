@@ -1,41 +1,165 @@
-from datetime import datetime as dt
+from datetime import datetime as dt, timezone
 from Components.Mongo.mongo_connection import mongoDB_connection
 from pymongo import MongoClient
 from Components.Model.LLM import LLM
+from Components.Model.Cache import ExtractionCache, get_cache
+from Components.Model.Sections import SCHEMA, plan_chunks, merge_partials
+from Components.Model import Rules
+from Components.Model.Skills import skills_from_result
+from Components.Utilities.Lease import Lease
+import asyncio
+import math
+import os
+
+# NER_MODE: reglas + LLM para el resto (hybrid), sólo LLM (llm) o sólo reglas, sin LLM (rules_only).
+HYBRID: str = 'hybrid'
+LLM_ONLY: str = 'llm'
+RULES_ONLY: str = 'rules_only'
+MODES: tuple[str, ...] = (HYBRID, LLM_ONLY, RULES_ONLY)
 
 class Worker:
 
-    def __init__(self):
-        self.llm: LLM = LLM()
+    def __init__(self, llm: LLM = None, mode: str = None):
+        """
+        llm: cliente compartido por todos los workers del event loop (un solo pool de conexiones).
+        mode: ver MODES (NER_MODE, por defecto "hybrid").
+        """
+        self.llm: LLM = llm or LLM()
+        self.cache: ExtractionCache = get_cache()
+        self.mode: str = mode or os.getenv('NER_MODE', HYBRID)
+        if self.mode not in MODES:
+            raise ValueError(f'Unknown NER_MODE: {self.mode}. Expected one of {MODES}')
+        # num_predict de una extracción completa; se reduce en proporción a las claves pedidas.
+        self.max_tokens: int = int(os.getenv('LLM_MAX_TOKENS', '1024'))
+
+    async def _extract(self, text: str, rules: dict) -> tuple[dict, dict]:
+        """
+        Divide el texto por secciones (Components/Model/Sections.py), extrae los fragmentos
+        en paralelo (cada uno pasa antes por el cache y usa el contexto justo para su tamaño)
+        y une los resultados.
+
+        Las claves que las reglas ya resolvieron (`rules`, ver Components/Model/Rules.py) no se
+        le piden al LLM: se acota la respuesta a las demás, baja `num_predict` en proporción y
+        se saltean los fragmentos que sólo contienen esas secciones.
+        Devuelve (resultado, {'chunks', 'cached_chunks', 'rules_fields'}).
+        """
+        planned: list[tuple[tuple[str, ...], str]] = plan_chunks(text)
+        if not planned:
+            raise ValueError('OCR result has no text')
+        ruled: tuple[str, ...] = Rules.complete_fields(rules) if rules else ()
+        pending: list[str] = [key for key in SCHEMA if key not in ruled]
+        fields: str = ', '.join(pending) if ruled else None
+        max_tokens: int = max(256, math.ceil(self.max_tokens * len(pending) / len(SCHEMA)))
+        chunks: list[tuple[tuple[str, ...], str]] = [chunk for chunk in planned if not set(chunk[0]) <= set(ruled)]
+
+        hints: list[str] = [None if sections == SCHEMA else ', '.join(sections) for sections, _ in chunks]
+        # Mismo fragmento (tras _shrink), modelo, prompt y opciones: se reutiliza la extracción.
+        keys: list[str] = [
+            self.llm.cache_key(body, max_tokens=max_tokens, sections=hint, fields=fields)
+            for (_, body), hint in zip(chunks, hints)
+        ]
+        partials: list[dict] = await asyncio.to_thread(lambda: [self.cache.get(key) for key in keys])
+        cached: int = sum(1 for partial in partials if partial is not None)
+
+        async def extract_chunk(index: int) -> None:
+            data = await self.llm.ask(chunks[index][1], max_tokens=max_tokens, sections=hints[index], fields=fields)
+            await asyncio.to_thread(self.cache.put, keys[index], data, self.llm.model)
+            partials[index] = data
+
+        # Si un fragmento falla se cancelan los demás (y el documento se reintenta entero).
+        try:
+            async with asyncio.TaskGroup() as group:
+                for index, partial in enumerate(partials):
+                    if partial is None:
+                        group.create_task(extract_chunk(index))
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+
+        result: dict = partials[0] if len(chunks) == 1 else merge_partials(
+            [(sections, data) for (sections, _), data in zip(chunks, partials)]
+        )
+        if rules:
+            result = Rules.apply(result, rules, ruled)
+        return result, {'chunks': len(chunks), 'cached_chunks': cached, 'rules_fields': list(ruled)}
 
-    def process(self, file_id: str):
+    async def process(self, file_id: str, lease: Lease = None):
+        # Las llamadas a MongoDB (síncronas) van a un hilo para no frenar el event loop.
         try:
             db: MongoClient = mongoDB_connection()
             database = db['nlp-vitae']
             coll = database['files']
             init_time: dt = dt.now()
-            file = coll.find_one({'file_id': file_id})
+            file = await asyncio.to_thread(coll.find_one, {'file_id': file_id})
 
             if file:
-                text: str = file['results'][0]['data']
+                ocr_result: dict = self._stage_result(file, 'Docling')
+                if ocr_result is None:
+                    raise ValueError(f'OCR result not found for file_id: {file_id}')
+                text: str = ocr_result['data']
 
-                result = self.llm.ask(text)
+                rules: dict = Rules.extract(text) if self.mode != LLM_ONLY else None
+                if self.mode == RULES_ONLY:
+                    result: dict = {key: rules.get(key, []) for key in SCHEMA}
+                    chunks: dict = {'chunks': 0, 'cached_chunks': 0, 'rules_fields': list(SCHEMA)}
+                else:
+                    if rules:
+                        # Resultado provisorio inmediato mientras el LLM extrae el resto.
+                        await asyncio.to_thread(
+                            coll.update_one,
+                            lease.filter() if lease is not None else {'file_id': file_id},
+                            {'$set': {'ner_provisional': {'data': rules, 'created_at': dt.now(timezone.utc)}}}
+                        )
+                    result, chunks = await self._extract(text, rules)
 
                 end_time: dt = dt.now()
                 duration: float = (end_time - init_time).total_seconds()
-                coll.find_one_and_update(
-                    {'file_id': file_id},
-                    {'$push': { 'results' : {
-                        'process' : 'NER',
-                        'data' : result,
-                        'duration' : duration
-                    }
-                    }})
+                update: dict = {'$push': { 'results' : {
+                    'process' : 'NER',
+                    'data' : result,
+                    'mode' : self.mode,
+                    'rules_fields' : chunks['rules_fields'],
+                    'cached' : chunks['chunks'] > 0 and chunks['cached_chunks'] == chunks['chunks'],
+                    'chunks' : chunks['chunks'],
+                    'cached_chunks' : chunks['cached_chunks'],
+                    'duration' : duration
+                }}, '$set': {'skills': skills_from_result(result)}, '$unset': {'ner_provisional': ''}}
+                if lease is not None:
+                    if not await asyncio.to_thread(lease.complete, update):
+                        print(f'Lease lost for file_id: {file_id}. Result discarded.')
+                        return None
+                else:
+                    await asyncio.to_thread(coll.find_one_and_update, {'file_id': file_id}, update)
 
                 print(f'File with file_id: {file_id} processed correctly.')
             else:
                 print("No file found with the given file_id.")
                 return None
+        except asyncio.CancelledError:
+            # Apagado del servicio: el documento vuelve a la cola sin gastar un intento.
+            print(f'Processing cancelled for file_id: {file_id}.')
+            if lease is not None:
+                self._drop_provisional(lease)
+                lease.release()
+            raise
         except Exception as err:
             print(f'An exception occurred: {err}')
-            return None
\ No newline at end of file
+            if lease is not None:
+                await asyncio.to_thread(self._drop_provisional, lease)
+                await asyncio.to_thread(lease.fail, str(err))
+            return None
+
+    @staticmethod
+    def _drop_provisional(lease: Lease) -> None:
+        """Quita el resultado provisorio de una extracción que no terminó (mientras el lease siga siendo nuestro)."""
+        try:
+            lease.coll.update_one(lease.filter(), {'$unset': {'ner_provisional': ''}})
+        except Exception as err:
+            print(f'An exception occurred removing ner_provisional: {err}')
+
+    @staticmethod
+    def _stage_result(file: dict, process: str) -> dict:
+        """Devuelve el último resultado de `results` generado por `process` (no por posición)."""
+        for result in reversed(file.get('results', [])):
+            if result.get('process') == process:
+                return result
+        return None
@@ -2,12 +2,34 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from threading import Thread
+import os
 from Components.Utilities.Timer import CustomTimer
+from Components.Utilities.Dispatcher import ChangeStreamWatcher, stage_pipeline
 from Components.Utilities.Manager import Manager
-from Components.Utilities.Worker import Worker
+from Components.Utilities.Worker import Worker, RULES_ONLY
+from Components.Utilities.Residency import ModelKeeper
+from Components.Model.LLM import LLM
+from Components.Model.Cache import get_cache
+from Components.Mongo.mongo_connection import close_connection, pool_stats
 from fastapi.middleware.cors import CORSMiddleware
 
-_timer: CustomTimer = CustomTimer(manager=Manager(worker=Worker()))
+# Extracciones en vuelo a la vez (cada slot reclama sus propios archivos); todas comparten
+# el pool de conexiones del LLM. Conviene igualarlo a OLLAMA_NUM_PARALLEL.
+_llm: LLM = LLM()
+_worker: Worker = Worker(llm=_llm)
+_timers: list[CustomTimer] = []
+# Warm-up en segundo plano, keep-alive y readiness del modelo; despierta a los timers al cargarlo.
+_keeper: ModelKeeper = ModelKeeper(llm=_llm, targets=_timers)
+# En modo rules_only no se usa el LLM: no hace falta esperar a que esté cargado.
+_gate: ModelKeeper = _keeper if _worker.mode != RULES_ONLY else None
+_timers.append(CustomTimer(managers=[Manager(worker=_worker, keeper=_gate) for _ in range(_llm.max_inflight)]))
+# Despierta a los workers apenas llega trabajo (change streams); sin replica set quedan en polling.
+# El keeper también se despierta, para cargar el modelo si Ollama lo descargó.
+_watcher: ChangeStreamWatcher = ChangeStreamWatcher(
+    name='ner-files',
+    pipeline=stage_pipeline('ner', previous='ocr'),
+    targets=_timers + [_keeper]
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -15,19 +37,37 @@ async def lifespan(app: FastAPI):
     task.start()
     yield
     onStop()
+    await _llm.aclose()
 
 def onStart():
     try:
         print('Initializing Task (Thread).')
-        _timer.interval = 5
-        _timer.start()
+        if _worker.mode != RULES_ONLY:
+            _keeper.start()
+        for _timer in _timers:
+            _timer.interval = float(os.getenv('POLL_MIN_INTERVAL', '1'))
+            _timer.max_interval = float(os.getenv('POLL_MAX_INTERVAL', '30'))
+            _timer.start()
+        _watcher.start()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
 def onStop():
     try:
         print('Ending Task (Thread).')
-        _timer.stop()
+        _watcher.stop()
+        _keeper.stop()
+        for _timer in _timers:
+            _timer.stop()
+        # Las extracciones canceladas devuelven su documento a la cola (lease.release()) desde el
+        # hilo de cada timer: hay que esperarlas antes de cerrar el cliente de Mongo.
+        timeout: float = float(os.getenv('SHUTDOWN_TIMEOUT', '30'))
+        for _timer in _timers:
+            if _timer.is_alive():
+                _timer.join(timeout)
+            if _timer.is_alive():
+                print(f'Timer did not stop within {timeout}s; its documents will return to the queue when their leases expire.')
+        close_connection()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
@@ -47,6 +87,37 @@ def health() -> JSONResponse:
         content={'status' : 'NER Service is OK'}
     )
 
+@app.get('/health/mongo', summary='MongoDB pool statistics', description="Returns connection pool statistics of the shared MongoDB client.", tags=['Health'])
+def health_mongo() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'pool' : pool_stats()}
+    )
+
+@app.get('/metrics/cache', summary='LLM extraction cache statistics', description='Returns hit/miss counters of the content-addressed LLM extraction cache (since process start) and the number of cached entries.', tags=['Metrics'])
+def cache_metrics() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'cache' : get_cache().stats()}
+    )
+
+@app.get('/metrics/llm', summary='LLM token statistics', description='Returns estimated vs actual (prompt_eval_count) prompt tokens, the context buckets in use and model residency (cold loads and their cost).', tags=['Metrics'])
+def llm_metrics() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'tokens' : _llm.token_stats(), 'residency' : {**_llm.load_stats(), **_keeper.stats()}}
+    )
+
+@app.get('/ready', summary='Readiness check endpoint', description="Returns 200 if the LLM is loaded in Ollama (per /api/ps) and the service can extract, 503 otherwise.", tags=['Health'])
+async def ready() -> JSONResponse:
+    if _worker.mode == RULES_ONLY:
+        return JSONResponse(status_code=200, content={'ready' : True, 'mode' : RULES_ONLY})
+    state: dict = await _keeper.check()
+    return JSONResponse(
+        status_code=200 if _keeper.ready else 503,
+        content={'ready' : _keeper.ready, 'model' : _llm.model, **state}
+    )
+
 @app.get('/model', summary='Model Information', description='Returns details of model version used', tags=['Model'])
 def tversion() -> JSONResponse:
     try:
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+import time
+import os
+
+# Docling
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.base_models import InputFormat, DocumentStream
+from docling.datamodel.pipeline_options import (
+    PdfPipelineOptions,
+    EasyOcrOptions,  # backend OCR EasyOCR
+    TableFormerMode,
+)
+from Components.Model.Profiles import BALANCED, get_profile
+
+
+def _tiny_pdf(text: str = 'NLP-Vitae warm-up') -> bytes:
+    """PDF mínimo de una página con una línea de texto (para precalentar los modelos)."""
+    stream: bytes = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1')
+    objects: list[bytes] = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+        b'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        b'<< /Length ' + str(len(stream)).encode() + b' >>\nstream\n' + stream + b'\nendstream',
+    ]
+    out: bytes = b'%PDF-1.4\n'
+    offsets: list[int] = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref: int = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return out
+
+
+WARMUP_PDF: bytes = _tiny_pdf()
+
+
+class ConversionMetrics:
+    """Tiempos de conversión por configuración, sin contar la inicialización de modelos."""
+
+    def __init__(self):
+        self._lock: Lock = Lock()
+        self._stats: dict[str, dict] = {}
+
+    def _entry(self, key: str) -> dict:
+        return self._stats.setdefault(key, {
+            'init_seconds': 0.0, 'documents': 0, 'total_seconds': 0.0, 'last_seconds': 0.0, 'max_seconds': 0.0,
+        })
+
+    def record_init(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._entry(key)['init_seconds'] = round(seconds, 3)
+
+    def record_conversion(self, key: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._entry(key)
+            entry['documents'] += 1
+            entry['total_seconds'] += seconds
+            entry['last_seconds'] = round(seconds, 3)
+            entry['max_seconds'] = round(max(entry['max_seconds'], seconds), 3)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: {**entry,
+                      'total_seconds': round(entry['total_seconds'], 3),
+                      'avg_seconds': round(entry['total_seconds'] / entry['documents'], 3) if entry['documents'] else 0.0}
+                for key, entry in self._stats.items()
+            }
+
+
+class DoclingConverters:
+    """
+    Un DocumentConverter por configuración de pipeline (sin OCR / EasyOCR con ciertos idiomas,
+    y perfil: ver Components/Model/Profiles.py), construido una sola vez por proceso y reutilizado entre documentos. Inicializar los
+    modelos de layout (y el lector de EasyOCR) tarda más que convertir un CV típico.
+
+    Los converters con EasyOCR (uno por conjunto de idiomas y perfil) se guardan en un LRU:
+    como mucho `max_readers` quedan en memoria y se descarta el usado hace más tiempo.
+    """
+
+    def __init__(self, easyocr_langs: list[str] = None, max_readers: int = None):
+        self.easyocr_langs: list[str] = easyocr_langs or ["es"]  # español por defecto
+        self.max_readers: int = max_readers or int(os.getenv('OCR_MAX_READERS', '3'))
+        self.metrics: ConversionMetrics = ConversionMetrics()
+        self._converters: OrderedDict[str, tuple[DocumentConverter, Lock]] = OrderedDict()
+        self._lock: Lock = Lock()
+
+    @staticmethod
+    def key(do_ocr: bool, langs: list[str] = None, profile: str = BALANCED) -> str:
+        return f"{'easyocr:' + ','.join(sorted(langs)) if do_ocr else 'no_ocr'}@{profile}"
+
+    def _evict_readers(self) -> None:
+        readers: list[str] = [key for key in self._converters if key.startswith('easyocr:')]
+        for key in readers[:max(0, len(readers) - self.max_readers)]:
+            # Una conversión en curso conserva su referencia; el converter se libera al terminar.
+            print(f'Docling: evicting converter {key} ...')
+            del self._converters[key]
+
+    def _build(self, do_ocr: bool, langs: list[str], profile: str) -> DocumentConverter:
+        options: dict = get_profile(profile)
+        if do_ocr:
+            pipeline = PdfPipelineOptions(
+                do_ocr=True,
+                # Si sospechás páginas escaneadas, esto ayuda:
+                # force_full_page_ocr=True,
+                ocr_options=EasyOcrOptions(lang=langs),
+            )
+        else:
+            pipeline = PdfPipelineOptions(do_ocr=False)
+        pipeline.do_table_structure = options['do_table_structure']
+        pipeline.table_structure_options.mode = (
+            TableFormerMode.ACCURATE if options['table_mode'] == 'accurate' else TableFormerMode.FAST
+        )
+        pipeline.do_picture_classification = options['do_picture_classification']
+        converter = DocumentConverter(
+            format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline)}
+        )
+        # Carga los modelos ahora y no en la primera conversión real.
+        converter.initialize_pipeline(InputFormat.PDF)
+        if do_ocr:
+            self._set_ocr_scale(converter, options['ocr_scale'])
+        converter.convert(DocumentStream(name='warmup.pdf', stream=BytesIO(WARMUP_PDF)))
+        return converter
+
+    @staticmethod
+    def _set_ocr_scale(converter: DocumentConverter, scale: float) -> None:
+        """
+        EasyOCR renderiza cada página a su propia escala (`scale` del modelo de OCR, 3 por
+        defecto), no a `images_scale` del pipeline, y las opciones no la exponen: se ajusta
+        sobre el modelo ya construido.
+        """
+        models: list = [
+            model
+            for pipeline in converter.initialized_pipelines.values()
+            for model in getattr(pipeline, 'build_pipe', [])
+            if type(model).__name__.endswith('OcrModel') and hasattr(model, 'scale')
+        ]
+        if not models:
+            print(f'Docling: OCR model not found, ocr_scale={scale} not applied.')
+        for model in models:
+            model.scale = scale
+
+    def get(self, do_ocr: bool, profile: str = BALANCED, langs: list[str] = None) -> tuple[str, DocumentConverter, Lock]:
+        """langs: idiomas de EasyOCR (por defecto `easyocr_langs`); se ignora sin OCR."""
+        langs = sorted(langs or self.easyocr_langs) if do_ocr else None
+        key: str = self.key(do_ocr, langs, profile)
+        with self._lock:
+            if key not in self._converters:
+                print(f'Docling: building converter {key} ...')
+                started: float = time.perf_counter()
+                self._converters[key] = (self._build(do_ocr, langs, profile), Lock())
+                self.metrics.record_init(key, time.perf_counter() - started)
+                if do_ocr:
+                    self._evict_readers()
+            self._converters.move_to_end(key)
+            converter, lock = self._converters[key]
+        return key, converter, lock
+
+    def warm_up(self, with_ocr: bool = True, profiles: tuple[str, ...] = (BALANCED,)) -> None:
+        for profile in profiles:
+            self.get(do_ocr=False, profile=profile)
+            if with_ocr:
+                self.get(do_ocr=True, profile=profile)
+
+    def convert(self, pdf_bytes: bytes, do_ocr: bool = False, page_range: tuple[int, int] = None,
+                profile: str = BALANCED, langs: list[str] = None):
+        """
+        Convierte el PDF con el converter cacheado. Devuelve (ConversionResult, segundos).
+        page_range: (primera, última) página 1-based a convertir; por defecto todas.
+        langs: idiomas de EasyOCR para este documento (por defecto `easyocr_langs`).
+        """
+        key, converter, lock = self.get(do_ocr, profile, langs)
+        stream = DocumentStream(name="input.pdf", stream=BytesIO(pdf_bytes))
+        kwargs: dict = {'page_range': page_range} if page_range else {}
+        # Los pipelines de Docling no son thread-safe: un documento a la vez por converter.
+        with lock:
+            started: float = time.perf_counter()
+            result = converter.convert(stream, **kwargs)
+            seconds: float = time.perf_counter() - started
+        self.metrics.record_conversion(key, seconds)
+        return result, seconds
+
+    def convert_all(self, pdfs: list[bytes], do_ocr: bool = False, profile: str = BALANCED):
+        """
+        Convierte varios PDFs en una sola pasada (conversión multi-documento de Docling,
+        que agrupa páginas en los batches de los modelos). Devuelve (resultados, segundos).
+        """
+        key, converter, lock = self.get(do_ocr, profile)
+        streams = [DocumentStream(name=f"input-{n}.pdf", stream=BytesIO(pdf)) for n, pdf in enumerate(pdfs)]
+        with lock:
+            started: float = time.perf_counter()
+            converted: dict = {result.input.file.name: result for result in converter.convert_all(streams)}
+            seconds: float = time.perf_counter() - started
+        # Docling puede devolverlos fuera de orden: se reordenan por el nombre del stream.
+        results: list = [converted[stream.name] for stream in streams]
+        for _ in results:
+            self.metrics.record_conversion(key, seconds / len(results))
+        return results, seconds
+
+
+_converters: DoclingConverters = None
+_converters_lock: Lock = Lock()
+
+
+def get_converters(easyocr_langs: list[str] = None) -> DoclingConverters:
+    """Registro de converters del proceso (se crea la primera vez que se pide)."""
+    global _converters
+    if _converters is None:
+        with _converters_lock:
+            if _converters is None:
+                _converters = DoclingConverters(easyocr_langs)
+    return _converters
@@ -0,0 +1,205 @@
+from Components.Model.Docling import DoclingConverters, get_converters
+from Components.Model.TextLayer import analyze_pages, page_runs
+from Components.Model.Profiles import BALANCED, FAST, get_profile
+from Components.Model.Language import candidate_languages, detect_languages
+import time
+import os
+
+# Niveles de extracción, del más barato al más caro.
+PYMUPDF: str = 'pymupdf'  # capa de texto tal cual (PyMuPDF)
+DOCLING: str = 'docling'  # análisis de layout de Docling sobre la capa de texto
+OCR: str = 'ocr'          # Docling + EasyOCR
+
+
+class Extractor:
+    """
+    Extracción de texto de un PDF (bytes -> dict), independiente de MongoDB para
+    poder ejecutarse dentro de los procesos del pool de OCR.
+
+    Cada página se resuelve en el nivel más barato que da un texto aceptable: si la capa de
+    texto de PyMuPDF tiene buena calidad se usa directamente; si está desordenada (varias
+    columnas intercaladas) se escala a Docling, y si falta o tiene glifos sin mapear, a OCR.
+
+    Los idiomas de EasyOCR se eligen por documento: se detectan sobre la capa de texto o,
+    si no hay, sobre un OCR rápido de la primera página escaneada.
+
+    Resultado: {'text', 'tier', 'ocr_backend', 'pages': [{'page', 'tier', 'backend'}],
+                'skipped_pages', 'languages', 'language_source',
+                'timings': {nivel: segundos}, 'conversion_seconds'}
+    """
+
+    def __init__(self, enable_ocr_fallback: bool = True, easyocr_langs: list[str] = None, min_page_chars: int = None):
+        """
+        enable_ocr_fallback: si True, las páginas sin texto embebido se procesan
+                             con OCR (EasyOCR).
+        easyocr_langs: lista de idiomas para EasyOCR. Ej: ["es", "en"]
+        min_page_chars: mínimo de caracteres en la capa de texto para considerar
+                        que una página no necesita OCR.
+        """
+        self.enable_ocr_fallback = enable_ocr_fallback
+        self.min_page_chars: int = min_page_chars or int(os.getenv('OCR_MIN_PAGE_CHARS', '20'))
+        # Umbrales de calidad de la capa de texto (ver Components/Model/TextLayer.py)
+        self.fast_path: bool = os.getenv('OCR_PYMUPDF_FAST_PATH', 'true').lower() == 'true'
+        self.min_density: float = float(os.getenv('OCR_MIN_CHAR_DENSITY', '2'))
+        self.max_garbage: float = float(os.getenv('OCR_MAX_GARBAGE_RATIO', '0.1'))
+        self.min_order: float = float(os.getenv('OCR_MIN_ORDER_SCORE', '0.8'))
+        self.detect_language: bool = os.getenv('OCR_DETECT_LANGUAGE', 'true').lower() == 'true'
+        self.candidate_langs: list[str] = candidate_languages()
+        self.converters: DoclingConverters = get_converters(easyocr_langs)
+
+    def _convert_with_docling(
+        self,
+        pdf_bytes: bytes,
+        do_ocr: bool = False,
+        ocr_backend: str = "easyocr",
+        page_range: tuple[int, int] = None,
+        profile: str = BALANCED,
+        langs: list[str] = None,
+    ) -> tuple[dict[int, str], str, float]:
+        """
+        Retorna ({página: texto}, backend_usado, segundos_de_conversión)
+        backend_usado: "no_ocr" | "easyocr"
+        """
+        if do_ocr and ocr_backend != "easyocr":
+            raise ValueError(f"OCR backend no soportado: {ocr_backend}")
+        backend_used: str = "easyocr" if do_ocr else "no_ocr"
+
+        result, seconds = self.converters.convert(
+            pdf_bytes, do_ocr=do_ocr, page_range=page_range, profile=profile, langs=langs
+        )
+        return self._page_texts(result, page_range), backend_used, seconds
+
+    @staticmethod
+    def _page_texts(result, page_range: tuple[int, int] = None) -> dict[int, str]:
+        # Elegí: texto plano o markdown
+        # (si te interesa conservar estructura usá export_to_markdown(page_no=...))
+        first, last = page_range or (1, len(result.document.pages))
+        return {
+            page_no: result.document.export_to_text(page_no=page_no)
+            for page_no in range(first, last + 1)
+        }
+
+    def _page_tier(self, page: dict) -> str:
+        if page['chars'] < self.min_page_chars or page['density'] < self.min_density or page['garbage'] > self.max_garbage:
+            # Sin capa de texto (o inservible): sólo el OCR puede leerla.
+            return OCR if self.enable_ocr_fallback else DOCLING
+        if not self.fast_path or page['order'] < self.min_order:
+            return DOCLING
+        return PYMUPDF
+
+    def _languages(self, pdf_bytes: bytes, pages: list[dict], tiers: dict[int, str]) -> tuple[list[str], str, float]:
+        """
+        Idiomas de EasyOCR para las páginas que van a OCR: (idiomas, origen, segundos del sondeo).
+        origen: "text_layer" | "ocr_probe" | "default"
+        """
+        default: list[str] = sorted(self.converters.easyocr_langs)
+        if not self.detect_language:
+            return default, 'default', 0.0
+        sample: str = '\n'.join(pages[n - 1]['text'] for n, tier in tiers.items() if tier != OCR)
+        langs: list[str] = detect_languages(sample, self.candidate_langs)
+        if langs:
+            return langs, 'text_layer', 0.0
+
+        # Sin capa de texto útil: OCR de baja resolución (perfil rápido) de la primera página escaneada.
+        first: int = min(n for n, tier in tiers.items() if tier == OCR)
+        probe, _, seconds = self._convert_with_docling(pdf_bytes, do_ocr=True, page_range=(first, first), profile=FAST)
+        langs = detect_languages(probe[first], self.candidate_langs)
+        return (langs, 'ocr_probe', seconds) if langs else (default, 'default', seconds)
+
+    @staticmethod
+    def _result(texts: dict[int, str], tiers: dict[int, str], timings: dict[str, float], skipped_pages: int = 0,
+                languages: tuple[list[str], str] = (None, None)) -> dict:
+        backends: dict[int, str] = {n: 'easyocr' if tier == OCR else 'no_ocr' for n, tier in tiers.items()}
+        used_backends: set = set(backends.values())
+        used_tiers: set = set(tiers.values())
+        return {
+            'text': '\n\n'.join(texts[n] for n in sorted(texts) if texts[n].strip()),
+            'tier': used_tiers.pop() if len(used_tiers) == 1 else ('mixed' if used_tiers else PYMUPDF),
+            'ocr_backend': used_backends.pop() if len(used_backends) == 1 else ('mixed' if used_backends else 'no_ocr'),
+            'pages': [{'page': n, 'tier': tiers[n], 'backend': backends[n]} for n in sorted(tiers)],
+            'skipped_pages': skipped_pages,  # páginas sin capa de texto fuera del límite del perfil
+            'languages': languages[0],       # idiomas de EasyOCR (None si ninguna página fue a OCR)
+            'language_source': languages[1],
+            'timings': {tier: round(seconds, 3) for tier, seconds in timings.items()},
+            'conversion_seconds': timings[DOCLING] + timings[OCR],
+        }
+
+    def _analyze(self, pdf_bytes: bytes) -> tuple[list[dict], dict[int, str], float]:
+        started: float = time.perf_counter()
+        pages: list[dict] = analyze_pages(pdf_bytes)
+        tiers: dict[int, str] = {n: self._page_tier(page) for n, page in enumerate(pages, start=1)}
+        return pages, tiers, time.perf_counter() - started
+
+    @staticmethod
+    def _cap(pages: list[dict], tiers: dict[int, str], max_pages: int) -> tuple[dict[int, str], int]:
+        """
+        Limita a `max_pages` las páginas que pasan por Docling/OCR (las primeras). Las demás
+        usan su capa de texto si la tienen (la de PyMuPDF no cuesta nada) y, si no, se omiten.
+        Devuelve (niveles, páginas omitidas).
+        """
+        expensive: list[int] = [n for n, tier in tiers.items() if tier != PYMUPDF]
+        if not max_pages or len(expensive) <= max_pages:
+            return tiers, 0
+        capped: dict[int, str] = dict(tiers)
+        for n in expensive[max_pages:]:
+            if tiers[n] == DOCLING:
+                capped[n] = PYMUPDF
+            else:
+                del capped[n]
+        return capped, len(tiers) - len(capped)
+
+    def extract(self, pdf_bytes: bytes, analysis: tuple[list[dict], dict[int, str], float] = None,
+                profile: str = BALANCED) -> dict:
+        """
+        Extrae cada página en su nivel (PyMuPDF, Docling u OCR); el texto se une en orden de página.
+        analysis: resultado de `_analyze`, si ya se calculó.
+        profile: perfil del pipeline de Docling (ver Components/Model/Profiles.py).
+        """
+        pages, tiers, analysis_seconds = analysis or self._analyze(pdf_bytes)
+        tiers, skipped = self._cap(pages, tiers, get_profile(profile)['max_num_pages'])
+        texts: dict[int, str] = {n: pages[n - 1]['text'] for n, tier in tiers.items() if tier == PYMUPDF}
+        timings: dict[str, float] = {PYMUPDF: analysis_seconds, DOCLING: 0.0, OCR: 0.0}
+        languages: tuple[list[str], str] = (None, None)
+
+        for tier, do_ocr in ((DOCLING, False), (OCR, True)):
+            selected: list[int] = [n for n, page_tier in tiers.items() if page_tier == tier]
+            if not selected:
+                continue
+            langs: list[str] = None
+            if do_ocr:
+                langs, source, seconds = self._languages(pdf_bytes, pages, tiers)
+                languages = (langs, source)
+                timings[OCR] += seconds
+            print(f"Docling: {'OCR (EasyOCR ' + ','.join(langs) + ')' if do_ocr else 'sin OCR'} en páginas {selected} ...")
+            for page_range in page_runs(selected):
+                run_texts, _, seconds = self._convert_with_docling(
+                    pdf_bytes, do_ocr=do_ocr, page_range=page_range, profile=profile, langs=langs
+                )
+                texts.update(run_texts)
+                timings[tier] += seconds
+        return self._result(texts, tiers, timings, skipped, languages)
+
+    def extract_batch(self, pdfs: list[bytes], profile: str = BALANCED) -> list[dict]:
+        """
+        Extrae varios PDFs chicos. Los que sólo necesitan Docling sin OCR se convierten juntos
+        (conversión multi-documento de Docling); el resto va por `extract`.
+        """
+        results: list[dict] = [None] * len(pdfs)
+        layout: dict[int, float] = {}  # índice -> segundos de análisis con PyMuPDF
+        max_pages: int = get_profile(profile)['max_num_pages']
+        for index, pdf in enumerate(pdfs):
+            analysis = self._analyze(pdf)
+            within_limit: bool = not max_pages or len(analysis[1]) <= max_pages  # todas sus páginas van a Docling
+            if analysis[1] and within_limit and set(analysis[1].values()) == {DOCLING}:
+                layout[index] = analysis[2]
+            else:
+                results[index] = self.extract(pdf, analysis, profile)
+
+        if layout:
+            print(f'Docling: conversión en lote sin OCR de {len(layout)} documentos ...')
+            converted, seconds = self.converters.convert_all([pdfs[i] for i in layout], do_ocr=False, profile=profile)
+            for index, result in zip(layout, converted):
+                texts: dict[int, str] = self._page_texts(result)
+                timings: dict[str, float] = {PYMUPDF: layout[index], DOCLING: seconds / len(layout), OCR: 0.0}
+                results[index] = self._result(texts, {n: DOCLING for n in texts}, timings)
+        return results
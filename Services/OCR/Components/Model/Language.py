@@ -0,0 +1,52 @@
+from collections import Counter
+import re
+import os
+
+# Palabras frecuentes (funcionales y de CV) por idioma de EasyOCR. Las que aparecen en más de
+# un idioma se descartan al armar el índice: sólo cuentan las que distinguen al idioma.
+_STOPWORDS: dict[str, tuple[str, ...]] = {
+    'es': ('el', 'la', 'los', 'las', 'del', 'y', 'en', 'con', 'por', 'una', 'es', 'como', 'más', 'sus', 'al',
+           'experiencia', 'educación', 'habilidades', 'años', 'trabajo', 'desarrollo', 'conocimientos'),
+    'en': ('the', 'and', 'of', 'to', 'in', 'with', 'for', 'on', 'at', 'is', 'as', 'by', 'from', 'my',
+           'experience', 'education', 'skills', 'years', 'work', 'development', 'knowledge'),
+    'pt': ('o', 'os', 'da', 'do', 'das', 'dos', 'em', 'com', 'uma', 'não', 'ao', 'na', 'no',
+           'experiência', 'educação', 'habilidades', 'anos', 'trabalho', 'desenvolvimento', 'conhecimentos'),
+    'fr': ('le', 'les', 'des', 'et', 'du', 'une', 'avec', 'pour', 'dans', 'sur', 'est', 'au', 'aux',
+           'expérience', 'compétences', 'formation', 'ans', 'travail', 'développement', 'connaissances'),
+    'de': ('der', 'die', 'das', 'und', 'mit', 'für', 'von', 'zu', 'ist', 'im', 'den', 'auf', 'eine',
+           'erfahrung', 'kenntnisse', 'ausbildung', 'jahre', 'arbeit', 'entwicklung'),
+    'it': ('il', 'gli', 'della', 'delle', 'di', 'e', 'per', 'nel', 'che', 'sono', 'nella',
+           'esperienza', 'competenze', 'formazione', 'anni', 'lavoro', 'sviluppo', 'conoscenze'),
+}
+
+_counts: Counter = Counter(word for words in _STOPWORDS.values() for word in set(words))
+_INDEX: dict[str, str] = {
+    word: lang for lang, words in _STOPWORDS.items() for word in words if _counts[word] == 1
+}
+
+_WORD: re.Pattern = re.compile(r'[^\W\d_]+')
+
+
+def candidate_languages() -> list[str]:
+    """Idiomas entre los que se elige (OCR_LANGUAGE_CANDIDATES, p.ej. "es,en,pt")."""
+    langs: list[str] = [lang.strip() for lang in os.getenv('OCR_LANGUAGE_CANDIDATES', 'es,en').split(',')]
+    return [lang for lang in langs if lang in _STOPWORDS]
+
+
+def detect_languages(text: str, candidates: list[str], min_share: float = None, min_hits: int = None) -> list[str]:
+    """
+    Conjunto mínimo de idiomas del texto, por conteo de stopwords: el idioma con más
+    apariciones y los que tengan al menos `min_share` de las de éste (p.ej. un CV en español
+    con secciones en inglés). Devuelve [] si no hay evidencia suficiente (`min_hits`).
+    """
+    min_share = min_share if min_share is not None else float(os.getenv('OCR_LANGUAGE_MIN_SHARE', '0.25'))
+    min_hits = min_hits if min_hits is not None else int(os.getenv('OCR_LANGUAGE_MIN_HITS', '5'))
+    hits: Counter = Counter(
+        lang for lang in (_INDEX.get(word) for word in _WORD.findall(text.lower())) if lang in candidates
+    )
+    if not hits:
+        return []
+    (_, top), = hits.most_common(1)
+    if top < min_hits:
+        return []
+    return sorted(lang for lang, count in hits.items() if count >= top * min_share)
@@ -0,0 +1,73 @@
+import os
+
+FAST: str = 'fast'
+BALANCED: str = 'balanced'
+ACCURATE: str = 'accurate'
+
+# Perfiles del pipeline de Docling. Se pueden ajustar por entorno con
+# OCR_PROFILE_<PERFIL>_<OPCIÓN>, p.ej. OCR_PROFILE_FAST_MAX_NUM_PAGES=2.
+#   do_table_structure         reconocimiento de estructura de tablas (TableFormer)
+#   table_mode                 "fast" | "accurate" (modo de TableFormer)
+#   do_picture_classification  clasificación de imágenes
+#   ocr_scale                  escala a la que EasyOCR renderiza cada página (1 = 72 dpi; Docling usa 3)
+#   max_num_pages              páginas que pasan por Docling/OCR (0 = todas); las que quedan
+#                              afuera usan la capa de texto de PyMuPDF si tienen una
+# "balanced" (el perfil por defecto) es la configuración de Docling sin perfiles: no recorta páginas.
+PROFILES: dict[str, dict] = {
+    FAST: {
+        'do_table_structure': False,
+        'table_mode': 'fast',
+        'do_picture_classification': False,
+        'ocr_scale': 2.0,
+        'max_num_pages': 3,
+    },
+    BALANCED: {
+        'do_table_structure': True,
+        'table_mode': 'accurate',
+        'do_picture_classification': False,
+        'ocr_scale': 3.0,
+        'max_num_pages': 0,
+    },
+    ACCURATE: {
+        'do_table_structure': True,
+        'table_mode': 'accurate',
+        'do_picture_classification': True,
+        'ocr_scale': 4.0,
+        'max_num_pages': 0,
+    },
+}
+
+
+def _from_env(name: str, option: str, default):
+    value: str = os.getenv(f'OCR_PROFILE_{name.upper()}_{option.upper()}')
+    if value is None or value == '':
+        return default
+    if isinstance(default, bool):
+        return value.lower() == 'true'
+    return type(default)(value)
+
+
+def get_profile(name: str) -> dict:
+    """Opciones del perfil `name` con los ajustes de entorno aplicados."""
+    if name not in PROFILES:
+        raise ValueError(f'Unknown OCR profile: {name}')
+    return {option: _from_env(name, option, default) for option, default in PROFILES[name].items()}
+
+
+def resolve_profile(requested: str = None, overloaded: bool = False) -> tuple[str, str]:
+    """
+    Perfil a usar para un documento y el motivo, en orden de prioridad:
+      override   OCR_PROFILE_OVERRIDE fuerza un perfil para todos los documentos
+      upload     el perfil pedido al subir el archivo (`ocr_profile`)
+      backlog    la cola de OCR superó el umbral: se usa el perfil rápido
+      default    OCR_DEFAULT_PROFILE (por defecto "balanced")
+    """
+    override: str = os.getenv('OCR_PROFILE_OVERRIDE', '')
+    if override in PROFILES:
+        return override, 'override'
+    if requested in PROFILES:
+        return requested, 'upload'
+    if overloaded:
+        return FAST, 'backlog'
+    default: str = os.getenv('OCR_DEFAULT_PROFILE', BALANCED)
+    return (default if default in PROFILES else BALANCED), 'default'
@@ -0,0 +1,75 @@
+import unicodedata
+import fitz  # PyMuPDF
+
+
+def _garbage_ratio(text: str) -> float:
+    """
+    Proporción de glifos que no se pudieron mapear a texto: U+FFFD, caracteres de uso
+    privado (fuentes sin ToUnicode) y de control. Una capa de texto con la codificación
+    rota se ve "llena" de caracteres pero no sirve.
+    """
+    visible: list[str] = [ch for ch in text if not ch.isspace()]
+    if not visible:
+        return 0.0
+    bad: int = sum(1 for ch in visible if ch == '�' or unicodedata.category(ch) in ('Co', 'Cc', 'Cs'))
+    return bad / len(visible)
+
+
+def _order_score(blocks: list[tuple]) -> float:
+    """
+    Qué tan razonable es el orden de lectura de la capa de texto (1 = limpio).
+
+    Entre bloques consecutivos cuenta los saltos "hacia arriba" (uno se tolera: dos columnas
+    leídas columna por columna) y los pasos a un bloque de al lado en la misma altura (texto de
+    columnas distintas intercalado línea por línea). Si son muchos, hace falta el análisis de
+    layout de Docling.
+    """
+    if len(blocks) < 3:
+        return 1.0
+    jumps: int = 0
+    side_by_side: int = 0
+    for previous, current in zip(blocks, blocks[1:]):
+        # bloque: (x0, y0, x1, y1, texto, nro_bloque, tipo)
+        if current[1] < previous[1] and current[3] <= previous[1]:
+            jumps += 1
+        elif (current[0] >= previous[2] or current[2] <= previous[0]) and current[1] < previous[3] and current[3] > previous[1]:
+            side_by_side += 1
+    return 1.0 - (max(0, jumps - 1) + side_by_side) / (len(blocks) - 1)
+
+
+def analyze_pages(pdf_bytes: bytes) -> list[dict]:
+    """
+    Extrae con PyMuPDF la capa de texto de cada página y mide su calidad:
+      text     texto en el orden del PDF
+      chars    caracteres visibles (sin espacios); una página escaneada devuelve 0
+      density  caracteres visibles cada 10.000 pt² de página
+      garbage  proporción de glifos sin mapear
+      order    sanidad del orden de lectura (ver `_order_score`)
+    """
+    pages: list[dict] = []
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+        for page in pdf:
+            # Sólo bloques de texto (tipo 0), en el orden en que aparecen en el PDF.
+            blocks: list[tuple] = [b for b in page.get_text('blocks') if b[6] == 0 and b[4].strip()]
+            text: str = '\n'.join(b[4].strip() for b in blocks)
+            chars: int = sum(1 for ch in text if not ch.isspace())
+            area: float = max(1.0, page.rect.width * page.rect.height)
+            pages.append({
+                'text': text,
+                'chars': chars,
+                'density': chars * 10000 / area,
+                'garbage': _garbage_ratio(text),
+                'order': _order_score(blocks),
+            })
+    return pages
+
+
+def page_runs(pages: list[int]) -> list[tuple[int, int]]:
+    """Agrupa números de página (1-based) en rangos contiguos: [1, 2, 3, 5] -> [(1, 3), (5, 5)]."""
+    runs: list[tuple[int, int]] = []
+    for page in sorted(pages):
+        if runs and runs[-1][1] == page - 1:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
@@ -0,0 +1,23 @@
+from pymongo import database
+from gridfs import GridFS
+from bson import ObjectId
+import base64
+
+# Formato del PDF guardado en el bucket GridFS `documents` (campo `storage_format` del documento de `files`).
+# Los documentos anteriores no tienen el campo y están guardados en base64.
+RAW: str = 'raw'
+BASE64: str = 'base64'
+
+
+def storage_format(file_doc: dict) -> str:
+    return file_doc.get('storage_format', BASE64)
+
+
+def read_document(db: database.Database, file_doc: dict) -> bytes:
+    """Lee el PDF de GridFS y devuelve los bytes originales, sin importar el formato en que se guardó."""
+    fs: GridFS = GridFS(db, collection='documents')
+    grid_out = fs.get(ObjectId(file_doc['file_base64_id']))
+    content: bytes = grid_out.read()
+    if storage_format(file_doc) == BASE64:
+        return base64.b64decode(content)
+    return content
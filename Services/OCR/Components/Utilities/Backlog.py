@@ -0,0 +1,40 @@
+from pymongo import collection
+from threading import Lock
+import time
+import os
+
+
+class BacklogMonitor:
+    """
+    Tamaño de la cola de una etapa (documentos en "pending"), cacheado unos segundos para no
+    contar en cada documento. Cuando supera `threshold` la etapa está sobrecargada y el OCR
+    pasa al perfil rápido hasta ponerse al día.
+    """
+
+    def __init__(self, stage: str = 'ocr', threshold: int = None, ttl: float = None):
+        """
+        threshold: documentos pendientes a partir de los cuales se considera sobrecarga (0 = nunca).
+        ttl: segundos durante los que se reutiliza el último conteo.
+        """
+        self.stage = stage
+        self.threshold: int = threshold if threshold is not None else int(os.getenv('OCR_BACKLOG_FAST_THRESHOLD', '50'))
+        self.ttl: float = ttl if ttl is not None else float(os.getenv('OCR_BACKLOG_CACHE_SECONDS', '15'))
+        self._lock: Lock = Lock()
+        self._size: int = 0
+        self._counted_at: float = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def size(self, coll: collection.Collection) -> int:
+        with self._lock:
+            now: float = time.monotonic()
+            if self._counted_at is None or now - self._counted_at >= self.ttl:
+                # Usa el índice `{stage}_queue` (el status es su prefijo).
+                self._size = coll.count_documents({f'{self.stage}_status': 'pending'})
+                self._counted_at = now
+            return self._size
+
+    def overloaded(self, coll: collection.Collection) -> bool:
+        return self.enabled and self.size(coll) > self.threshold
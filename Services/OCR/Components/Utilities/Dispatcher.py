@@ -0,0 +1,102 @@
+from threading import Thread, Event
+from datetime import datetime as dt, timezone
+from pymongo.errors import OperationFailure, PyMongoError
+from Components.Mongo.mongo_connection import mongoDB_connection
+from Components.Utilities.Timer import Timer
+import time
+
+# Códigos de error de MongoDB relevantes para change streams
+_NOT_REPLICA_SET: int = 40573          # mongod standalone: no soporta $changeStream
+_HISTORY_LOST: tuple = (136, 280, 286)  # resume token fuera del oplog / inválido
+
+
+def stage_pipeline(stage: str, previous: str = None) -> list:
+    """
+    Filtra los eventos de `files` que pueden generar trabajo para `stage`:
+    inserts, archivos que vuelven a "pending" en esta etapa y archivos cuya
+    etapa anterior terminó.
+    """
+    conditions: list = [
+        {'operationType': 'insert'},
+        {f'updateDescription.updatedFields.{stage}_status': 'pending'},
+    ]
+    if previous:
+        conditions.append({f'updateDescription.updatedFields.{previous}_status': 'done'})
+    return [{'$match': {'$or': conditions}}]
+
+
+class ChangeStreamWatcher(Thread):
+    """
+    Escucha el change stream de `nlp-vitae.files` y despierta a los workers en cuanto
+    llega trabajo nuevo. El resume token se persiste en `dispatcher_state` para no perder
+    eventos entre reinicios. Si el servidor no soporta change streams (mongod standalone)
+    el hilo termina y los workers siguen con polling y backoff exponencial.
+    """
+
+    def __init__(self, name: str, pipeline: list, targets: list[Timer], retry_interval: float = 5):
+        self.name_id = name
+        self.pipeline = pipeline
+        self.targets = targets
+        self.retry_interval = retry_interval
+        self.available: bool = True
+        self._stopped: Event = Event()
+        super().__init__(daemon=True)
+
+    def _state(self):
+        return mongoDB_connection()['nlp-vitae']['dispatcher_state']
+
+    def _load_token(self) -> dict:
+        doc = self._state().find_one({'_id': self.name_id})
+        return doc.get('resume_token') if doc else None
+
+    def _save_token(self, token: dict) -> None:
+        self._state().update_one(
+            {'_id': self.name_id},
+            {'$set': {'resume_token': token, 'updated_at': dt.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def _reset_token(self) -> None:
+        self._state().delete_one({'_id': self.name_id})
+
+    def _wake_all(self) -> None:
+        for target in self.targets:
+            target.wake()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                coll = mongoDB_connection()['nlp-vitae']['files']
+                token: dict = self._load_token()
+                saved: dict = token
+                last_save: float = time.monotonic()
+                with coll.watch(self.pipeline, resume_after=token, max_await_time_ms=1000) as stream:
+                    print(f'Change stream opened ({self.name_id}).')
+                    # Al (re)conectar puede haber trabajo que llegó sin evento: drenamos la cola.
+                    self._wake_all()
+                    while not self._stopped.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._wake_all()
+                        token = stream.resume_token
+                        if token is not None and token != saved and (change is not None or time.monotonic() - last_save > 5):
+                            self._save_token(token)
+                            saved, last_save = token, time.monotonic()
+            except OperationFailure as err:
+                if err.code == _NOT_REPLICA_SET:
+                    print('Change streams are not available (standalone mongod). Falling back to polling.')
+                    self.available = False
+                    return
+                if err.code in _HISTORY_LOST:
+                    print(f'Resume token is no longer valid ({self.name_id}). Restarting change stream.')
+                    self._reset_token()
+                    self._wake_all()
+                    continue
+                print(f'An exception ocurred in change stream: {err}')
+                self._stopped.wait(self.retry_interval)
+            except PyMongoError as err:
+                print(f'An exception ocurred in change stream: {err}')
+                self._stopped.wait(self.retry_interval)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,203 @@
+from datetime import datetime as dt, timedelta, timezone
+from threading import Thread, Event
+from pymongo import ReturnDocument, collection
+from pymongo.errors import OperationFailure
+import socket
+import os
+import uuid
+
+
+# IndexOptionsConflict / IndexKeySpecsConflict
+_INDEX_CONFLICT: tuple = (85, 86)
+
+
+def new_owner_id() -> str:
+    """Identificador único del worker: host, pid y un sufijo aleatorio (uno por hilo/worker)."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class Lease:
+    """
+    Reclamo (lease) de un documento de `files` para una etapa del pipeline.
+
+    Campos que usa sobre el documento (stage = "ocr" | "ner" | "cv"):
+      {stage}_status      "waiting" | "pending" | "processing" | "done" | "error"
+      {stage}_queued_at   cuándo la etapa pasó a "pending"
+      {stage}_started_at  cuándo se reclamó por última vez
+      {stage}_finished_at cuándo terminó
+      {stage}_owner       owner id del worker que tiene el trabajo
+      {stage}_lease_until fecha en la que vence el lease si no se renueva
+      {stage}_attempts    cantidad de veces que se reclamó el documento
+
+    Al terminar, la etapa siguiente (`next_stage`) pasa de "waiting" a "pending".
+
+    Mientras el worker procesa, un hilo renueva el lease cada `duration / 3`
+    segundos. Si el worker se cae, el lease vence y otro worker lo reclama.
+    """
+
+    def __init__(self, coll: collection.Collection, stage: str, file_id: str, owner: str, duration: int,
+                 max_attempts: int, next_stage: str = None):
+        self.coll = coll
+        self.stage = stage
+        self.next_stage = next_stage
+        self.file_id = file_id
+        self.owner = owner
+        self.duration = duration
+        self.max_attempts = max_attempts
+        self.lost: bool = False
+        self._stop: Event = Event()
+        self._keeper: Thread = None
+
+    def filter(self) -> dict:
+        """Filtro que sólo matchea si este worker sigue siendo dueño del documento."""
+        return {'file_id': self.file_id, f'{self.stage}_owner': self.owner, f'{self.stage}_status': 'processing'}
+
+    def renew(self) -> bool:
+        res = self.coll.update_one(
+            self.filter(),
+            {'$set': {f'{self.stage}_lease_until': dt.now(timezone.utc) + timedelta(seconds=self.duration)}}
+        )
+        if res.matched_count == 0:
+            self.lost = True
+        return not self.lost
+
+    def complete(self, update: dict) -> bool:
+        """
+        Aplica `update` (p.ej. el $push del resultado) y marca la etapa como terminada,
+        sólo si el lease sigue siendo nuestro. Devuelve False si se perdió el lease.
+        """
+        now: dt = dt.now(timezone.utc)
+        update = {k: dict(v) for k, v in update.items()}
+        update.setdefault('$set', {}).update({f'{self.stage}_status': 'done', f'{self.stage}_finished_at': now})
+        if self.next_stage:
+            update['$set'].update({f'{self.next_stage}_status': 'pending', f'{self.next_stage}_queued_at': now})
+        update.setdefault('$unset', {}).update({f'{self.stage}_owner': '', f'{self.stage}_lease_until': ''})
+        res = self.coll.update_one(self.filter(), update)
+        if res.matched_count == 0:
+            self.lost = True
+        return not self.lost
+
+    def fail(self, error: str) -> None:
+        """Libera el documento: vuelve a "pending" o queda en "error" si agotó los intentos."""
+        doc = self.coll.find_one(self.filter(), {f'{self.stage}_attempts': 1})
+        if doc is None:
+            self.lost = True
+            return
+        attempts: int = doc.get(f'{self.stage}_attempts', 0)
+        status: str = 'error' if attempts >= self.max_attempts else 'pending'
+        self.coll.update_one(
+            self.filter(),
+            {'$set': {f'{self.stage}_status': status, f'{self.stage}_error': error},
+             '$unset': {f'{self.stage}_owner': '', f'{self.stage}_lease_until': ''}}
+        )
+
+    def release(self) -> None:
+        """Devuelve el documento a "pending" sin contar el intento (p.ej. al apagar el servicio)."""
+        res = self.coll.update_one(
+            self.filter(),
+            {'$set': {f'{self.stage}_status': 'pending'},
+             '$inc': {f'{self.stage}_attempts': -1},
+             '$unset': {f'{self.stage}_owner': '', f'{self.stage}_lease_until': ''}}
+        )
+        if res.matched_count == 0:
+            self.lost = True
+
+    # ---------- Renovación en segundo plano ----------
+    def _keep_alive(self):
+        interval: float = max(1.0, self.duration / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.renew():
+                    print(f'Lease lost for file_id: {self.file_id} ({self.stage}).')
+                    return
+            except Exception as err:
+                print(f'An exception ocurred renewing lease: {err}')
+
+    def __enter__(self):
+        self._keeper = Thread(target=self._keep_alive, daemon=True)
+        self._keeper.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._keeper is not None:
+            self._keeper.join()
+        return False
+
+
+class LeaseClaimer:
+    """
+    Reclama atómicamente (find_one_and_update) el documento más antiguo disponible
+    para una etapa. Es seguro usarlo desde varios hilos y varias réplicas a la vez.
+
+    Primero recupera trabajos con lease vencido (el worker anterior se cayó o quedó
+    colgado) y después toma el "pending" más antiguo; ambas consultas usan índices
+    compuestos sobre `{stage}_status`. Los leases vencidos que ya agotaron sus intentos
+    pasan a "error" (si no, quedarían en "processing" para siempre).
+    """
+
+    def __init__(self, stage: str, next_stage: str = None, duration: int = None, max_attempts: int = None):
+        self.stage = stage
+        self.next_stage = next_stage
+        self.duration = duration or int(os.getenv('LEASE_SECONDS', '120'))
+        self.max_attempts = max_attempts or int(os.getenv('LEASE_MAX_ATTEMPTS', '3'))
+
+    def ensure_indexes(self, coll: collection.Collection) -> None:
+        # "El pending más antiguo de la etapa X" (FIFO por `created_at`, fecha BSON)
+        queue: list = [(f'{self.stage}_status', 1), ('created_at', 1)]
+        try:
+            coll.create_index(queue, name=f'{self.stage}_queue')
+        except OperationFailure as err:
+            # Mismo nombre con otras claves: el índice anterior sobre `creation_date` (texto).
+            if err.code not in _INDEX_CONFLICT:
+                raise
+            try:
+                coll.drop_index(f'{self.stage}_queue')
+            except OperationFailure:
+                pass  # otra réplica ya lo borró
+            coll.create_index(queue, name=f'{self.stage}_queue')
+        # Leases vencidos de la etapa X
+        coll.create_index([(f'{self.stage}_status', 1), (f'{self.stage}_lease_until', 1)], name=f'{self.stage}_leases')
+
+    def expire(self, coll: collection.Collection, now: dt) -> int:
+        """Marca como "error" los leases vencidos sin intentos restantes. Devuelve cuántos."""
+        res = coll.update_many(
+            {f'{self.stage}_status': 'processing', f'{self.stage}_lease_until': {'$lt': now},
+             f'{self.stage}_attempts': {'$gte': self.max_attempts}},
+            {'$set': {f'{self.stage}_status': 'error',
+                      f'{self.stage}_error': f'Lease expired on the last attempt ({self.max_attempts} attempts)'},
+             '$unset': {f'{self.stage}_owner': '', f'{self.stage}_lease_until': ''}}
+        )
+        if res.modified_count:
+            print(f'{res.modified_count} expired {self.stage} leases without attempts left marked as error.')
+        return res.modified_count
+
+    def claim(self, coll: collection.Collection, owner: str, extra: dict = None) -> tuple[dict, Lease]:
+        """extra: condiciones adicionales que debe cumplir el documento (p.ej. tamaño máximo)."""
+        extra = extra or {}
+        now: dt = dt.now(timezone.utc)
+        self.expire(coll, now)
+        update: dict = {'$set': {
+            f'{self.stage}_status': 'processing',
+            f'{self.stage}_owner': owner,
+            f'{self.stage}_lease_until': now + timedelta(seconds=self.duration),
+            f'{self.stage}_started_at': now,
+        }, '$inc': {f'{self.stage}_attempts': 1}}
+
+        doc = coll.find_one_and_update(
+            {f'{self.stage}_status': 'processing', f'{self.stage}_lease_until': {'$lt': now},
+             f'{self.stage}_attempts': {'$lt': self.max_attempts}, **extra},
+            update,
+            sort=[(f'{self.stage}_lease_until', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            doc = coll.find_one_and_update(
+                {f'{self.stage}_status': 'pending', **extra},
+                update,
+                sort=[('created_at', 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+        if doc is None:
+            return None, None
+        return doc, Lease(coll, self.stage, doc['file_id'], owner, self.duration, self.max_attempts, self.next_stage)
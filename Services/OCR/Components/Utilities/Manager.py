@@ -1,27 +1,63 @@
+from contextlib import ExitStack
 from Components.Mongo.mongo_connection import mongoDB_connection
 from pymongo import MongoClient
 from Components.Utilities.Worker import Worker
+from Components.Utilities.Lease import Lease, LeaseClaimer, new_owner_id
+import os
 
 class Manager:
 
-    def __init__(self, worker: Worker=None):
+    def __init__(self, worker: Worker=None, batch_size: int = None, batch_max_bytes: int = None):
+        """
+        batch_size: cantidad máxima de PDFs chicos que se convierten juntos (1 = sin lotes).
+        batch_max_bytes: tamaño máximo de un PDF para entrar en un lote.
+        """
         self.worker: Worker = worker
+        self.owner: str = new_owner_id()
+        self.claimer: LeaseClaimer = LeaseClaimer(stage='ocr', next_stage='ner')
+        self.batch_size: int = batch_size or int(os.getenv('OCR_BATCH_SIZE', '4'))
+        self.batch_max_bytes: int = batch_max_bytes or int(os.getenv('OCR_BATCH_MAX_BYTES', str(512 * 1024)))
+        self._indexes_ready: bool = False
 
-    def search_for_files(self):
+    def _claim_batch(self, coll, file: dict, lease: Lease) -> tuple[list[dict], list[Lease]]:
+        """Si el archivo reclamado es chico, reclama otros chicos pendientes para convertirlos juntos."""
+        files: list[dict] = [file]
+        leases: list[Lease] = [lease]
+        if file.get('size', self.batch_max_bytes + 1) > self.batch_max_bytes:
+            return files, leases
+        # Un lote se convierte con un solo perfil: sólo se suman archivos con el mismo `ocr_profile`.
+        extra: dict = {'size': {'$lte': self.batch_max_bytes}, 'ocr_profile': file.get('ocr_profile')}
+        while len(files) < self.batch_size:
+            other, other_lease = self.claimer.claim(coll, self.owner, extra=extra)
+            if other is None:
+                break
+            files.append(other)
+            leases.append(other_lease)
+        return files, leases
+
+    def search_for_files(self) -> bool:
+        """Reclama el archivo más antiguo pendiente (y otros chicos, en lote) y lo procesa. Devuelve True si procesó alguno."""
         try:
             print('Searching for oldest File to start processing (OCR) ...')
             db : MongoClient = mongoDB_connection()
             coll = db['nlp-vitae']['files']
+            if not self._indexes_ready:
+                self.claimer.ensure_indexes(coll)
+                self._indexes_ready = True
 
-            file = coll.find_one(
-                {'results': []},
-                sort=[('creation_date', 1)]
-            )
+            file, lease = self.claimer.claim(coll, self.owner)
             if file:
-                print(f"File found. file_id: {file['file_id']}. Starting text extraction ...")
-                self.worker.process(file_id=file['file_id'])
+                files, leases = self._claim_batch(coll, file, lease)
+                file_ids: list[str] = [f['file_id'] for f in files]
+                print(f"Files claimed by {self.owner}. file_id: {', '.join(file_ids)}. Starting text extraction ...")
+                with ExitStack() as stack:
+                    for claimed in leases:
+                        stack.enter_context(claimed)
+                    self.worker.process_batch(file_ids=file_ids, leases=leases)
+                return True
             else:
                 print('No file found matching the criteria.')
+                return False
         except Exception as err:
             print(f'An exception ocurred: {err}')
-    
+            return False
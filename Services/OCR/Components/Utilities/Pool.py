@@ -0,0 +1,179 @@
+from concurrent.futures import ProcessPoolExecutor
+from threading import Condition, Lock
+from Components.Model.Profiles import BALANCED
+import multiprocessing
+import os
+
+# Variables que leen los runtimes numéricos (torch, ONNX Runtime, BLAS y Docling) para
+# dimensionar sus pools de hilos. Se fijan en cada proceso antes de importar Docling.
+_THREAD_ENV_VARS: tuple[str, ...] = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'DOCLING_NUM_THREADS',
+)
+
+# Extractor del proceso hijo (uno por proceso, con sus converters ya precalentados).
+_extractor = None
+
+
+def _limit_threads(threads: int) -> None:
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def _init_process(threads: int, easyocr_langs: list[str], warm_up_ocr: bool, warm_up_profiles: tuple[str, ...]) -> None:
+    """Inicializador de cada proceso del pool: limita hilos y construye los converters."""
+    global _extractor
+    _limit_threads(threads)
+    from Components.Model.Extraction import Extractor
+    _extractor = Extractor(easyocr_langs=easyocr_langs)
+    try:
+        _extractor.converters.warm_up(with_ocr=warm_up_ocr, profiles=warm_up_profiles)
+    except Exception as err:
+        print(f'An exception ocurred warming up Docling (pid {os.getpid()}): {err}')
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run(extractor, pdfs: list[bytes], profile: str) -> list[dict]:
+    if len(pdfs) == 1:
+        return [extractor.extract(pdfs[0], profile=profile)]
+    return extractor.extract_batch(pdfs, profile=profile)
+
+
+def _extract(pdfs: list[bytes], profile: str) -> tuple[int, list[dict], dict]:
+    """Tarea del pool: devuelve (pid, resultados, métricas de conversión del proceso)."""
+    results: list[dict] = _run(_extractor, pdfs, profile)
+    return os.getpid(), results, _extractor.converters.metrics.snapshot()
+
+
+def _merge_metrics(snapshots: list[dict]) -> dict:
+    """Suma las métricas de conversión de todos los procesos, por converter."""
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for key, entry in snapshot.items():
+            total = merged.setdefault(key, {
+                'init_seconds': 0.0, 'documents': 0, 'total_seconds': 0.0, 'last_seconds': 0.0, 'max_seconds': 0.0,
+            })
+            total['init_seconds'] = max(total['init_seconds'], entry['init_seconds'])
+            total['documents'] += entry['documents']
+            total['total_seconds'] = round(total['total_seconds'] + entry['total_seconds'], 3)
+            total['last_seconds'] = entry['last_seconds']
+            total['max_seconds'] = max(total['max_seconds'], entry['max_seconds'])
+    for total in merged.values():
+        total['avg_seconds'] = round(total['total_seconds'] / total['documents'], 3) if total['documents'] else 0.0
+    return merged
+
+
+class ExtractionPool:
+    """
+    Pool de procesos para la extracción de texto (Docling es CPU-bound y mantiene el GIL
+    durante buena parte del layout/OCR, así que los hilos no escalan).
+
+    Cada proceso tiene su propio Extractor con los converters precalentados y un límite
+    de hilos para torch/ONNX (`threads_per_process`) para no sobresuscribir los cores:
+    processes * threads_per_process ~ cantidad de cores.
+
+    `max_inflight_bytes` acota los bytes de PDF enviados al pool y todavía sin resultado;
+    quien llama se bloquea hasta que haya lugar.
+
+    Con processes=0 la extracción corre en el hilo que llama (comportamiento anterior).
+    """
+
+    def __init__(self, processes: int, threads_per_process: int, max_inflight_bytes: int,
+                 easyocr_langs: list[str] = None, warm_up_ocr: bool = True,
+                 warm_up_profiles: tuple[str, ...] = (BALANCED,)):
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.max_inflight_bytes = max_inflight_bytes
+        self.easyocr_langs = easyocr_langs
+        self.warm_up_ocr = warm_up_ocr
+        self.warm_up_profiles = warm_up_profiles
+        self._executor: ProcessPoolExecutor = None
+        self._extractor = None
+        self._inflight: int = 0
+        self._room: Condition = Condition()
+        self._metrics: dict[int, dict] = {}
+        self._metrics_lock: Lock = Lock()
+
+    @classmethod
+    def from_env(cls, warm_up_profiles: tuple[str, ...] = (BALANCED,)) -> 'ExtractionPool':
+        threads: int = int(os.getenv('OCR_THREADS_PER_PROCESS', '4'))
+        default_processes: int = max(1, (os.cpu_count() or 1) // threads)
+        return cls(
+            processes=int(os.getenv('OCR_POOL_PROCESSES', str(default_processes))),
+            threads_per_process=threads,
+            max_inflight_bytes=int(os.getenv('OCR_MAX_INFLIGHT_BYTES', str(256 * 1024 * 1024))),
+            warm_up_ocr=os.getenv('OCR_WARMUP_EASYOCR', 'true').lower() == 'true',
+            warm_up_profiles=warm_up_profiles,
+        )
+
+    def start(self) -> None:
+        """Levanta los procesos y espera a que todos terminen de precalentar sus converters."""
+        if self.processes <= 0:
+            from Components.Model.Extraction import Extractor
+            self._extractor = Extractor(easyocr_langs=self.easyocr_langs)
+            self._extractor.converters.warm_up(with_ocr=self.warm_up_ocr, profiles=self.warm_up_profiles)
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            # spawn: los procesos no heredan hilos ni conexiones de MongoDB del padre.
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_process,
+            initargs=(self.threads_per_process, self.easyocr_langs, self.warm_up_ocr, self.warm_up_profiles),
+        )
+        pids: set = {future.result() for future in [self._executor.submit(_ping) for _ in range(self.processes)]}
+        print(f'OCR pool started: {len(pids)} processes x {self.threads_per_process} threads.')
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _acquire(self, size: int) -> None:
+        with self._room:
+            # Un PDF más grande que el límite entra sólo si el pool está vacío.
+            self._room.wait_for(lambda: self._inflight == 0 or self._inflight + size <= self.max_inflight_bytes)
+            self._inflight += size
+
+    def _release(self, size: int) -> None:
+        with self._room:
+            self._inflight -= size
+            self._room.notify_all()
+
+    def extract(self, pdfs: list[bytes], profile: str = BALANCED) -> list[dict]:
+        """Extrae el texto de uno o varios PDFs (varios = conversión en lote). Bloquea hasta terminar."""
+        if self._executor is None:
+            if self._extractor is None:
+                raise RuntimeError('Extraction pool not started')
+            return _run(self._extractor, pdfs, profile)
+
+        size: int = sum(len(pdf) for pdf in pdfs)
+        self._acquire(size)
+        try:
+            pid, results, snapshot = self._executor.submit(_extract, pdfs, profile).result()
+        finally:
+            self._release(size)
+        with self._metrics_lock:
+            self._metrics[pid] = snapshot
+        return results
+
+    def metrics(self) -> dict:
+        if self._executor is None:
+            conversion: dict = self._extractor.converters.metrics.snapshot() if self._extractor else {}
+            return {'processes': 0, 'inflight_bytes': 0, 'conversion': conversion}
+        with self._metrics_lock:
+            snapshots: dict[int, dict] = dict(self._metrics)
+        return {
+            'processes': self.processes,
+            'threads_per_process': self.threads_per_process,
+            'inflight_bytes': self._inflight,
+            'conversion': _merge_metrics(list(snapshots.values())),
+            'per_process': {str(pid): snapshot for pid, snapshot in snapshots.items()},
+        }
@@ -1,36 +1,57 @@
 from threading import Thread, Event
-import time
 from Components.Utilities.Manager import Manager
 
 class Timer(Thread):
     
-    interval : int
+    interval : float
+    max_interval : float
 
-    def __init__(self, interval: int = None):
+    def __init__(self, interval: float = None, max_interval: float = None):
+        """
+        interval: espera mínima entre búsquedas cuando no hay trabajo.
+        max_interval: tope del backoff exponencial mientras la cola sigue vacía.
+        """
         self.interval = interval
+        self.max_interval = max_interval
         self._timer_runs: Event = Event()
         self._timer_runs.set()
-        super().__init__()
+        self._wake: Event = Event()
+        super().__init__(daemon=True)
     
     def run(self):
+        idle: float = self.interval
         while self._timer_runs.is_set():
-            self.timer()
-            time.sleep(self.interval)
+            if self.timer():
+                # Hubo trabajo: seguimos drenando la cola sin esperar.
+                idle = self.interval
+                continue
+            if self._wake.wait(idle):
+                self._wake.clear()
+                idle = self.interval
+            else:
+                idle = min(idle * 2, self.max_interval or idle)
+
+    def wake(self):
+        """Despierta al hilo (p.ej. desde el change stream) para que busque trabajo ya."""
+        self._wake.set()
     
     def stop(self):
         self._timer_runs.clear()
+        self._wake.set()
 
 class CustomTimer(Timer):
 
-    def __init__(self, interval: int = None, manager: Manager = None):
-        super().__init__(interval)
+    def __init__(self, interval: float = None, max_interval: float = None, manager: Manager = None):
+        super().__init__(interval, max_interval)
         self.manager = manager
 
     '''
     Your custom behaviour goes here (timer function).
+    Devuelve True si procesó un archivo (para seguir drenando la cola).
     '''
-    def timer(self):
+    def timer(self) -> bool:
         if self.manager:
-            self.manager.search_for_files()
+            return self.manager.search_for_files()
         else:
-            print("Manager instance not provided.")
\ No newline at end of file
+            print("Manager instance not provided.")
+            return False
@@ -1,70 +1,56 @@
 from datetime import datetime as dt
-from io import BytesIO
 from Components.Mongo.mongo_connection import mongoDB_connection
+from Components.Mongo.documents import read_document
+from Components.Utilities.Lease import Lease
+from Components.Utilities.Pool import ExtractionPool
+from Components.Utilities.Backlog import BacklogMonitor
+from Components.Model.Profiles import resolve_profile
 from pymongo import MongoClient
-from gridfs import GridFS
-from bson import ObjectId
-import base64
-
-# Docling
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.base_models import InputFormat, DocumentStream
-from docling.datamodel.pipeline_options import (
-    PdfPipelineOptions,
-    EasyOcrOptions,  # backend OCR EasyOCR
-)
 
 class Worker:
 
-    def __init__(self, enable_ocr_fallback: bool = True, easyocr_langs: list[str] = None):
-        """
-        enable_ocr_fallback: si True, si el PDF no tiene texto embebido
-                             reintenta con OCR (EasyOCR).
-        easyocr_langs: lista de idiomas para EasyOCR. Ej: ["es", "en"]
+    def __init__(self, pool: ExtractionPool, backlog: BacklogMonitor = None):
         """
-        self.enable_ocr_fallback = enable_ocr_fallback
-        self.easyocr_langs = easyocr_langs or ["es"]  # español por defecto
-
-    def _convert_with_docling(
-        self,
-        pdf_bytes: bytes,
-        do_ocr: bool = False,
-        ocr_backend: str = "easyocr",
-    ) -> tuple[str, str]:
+        pool: pool de extracción compartido por todos los workers del proceso
+              (ver Components/Utilities/Pool.py).
+        backlog: tamaño de la cola de OCR; si está sobrecargada se usa el perfil rápido.
         """
-        Retorna (texto, backend_usado)
-        backend_usado: "no_ocr" | "easyocr"
-        """
-        if do_ocr:
-            if ocr_backend == "easyocr":
-                pipeline = PdfPipelineOptions(
-                    do_ocr=True,
-                    # Si sospechás páginas escaneadas, esto ayuda:
-                    # force_full_page_ocr=True,
-                    ocr_options=EasyOcrOptions(lang=self.easyocr_langs),
-                )
-                backend_used = "easyocr"
-            else:
-                raise ValueError(f"OCR backend no soportado: {ocr_backend}")
+        self.pool: ExtractionPool = pool
+        self.backlog: BacklogMonitor = backlog or BacklogMonitor(threshold=0)
+
+    def _profile(self, coll, file_doc: dict) -> tuple[str, str]:
+        """Perfil de Docling para el documento y el motivo (ver Components/Model/Profiles.py)."""
+        return resolve_profile(file_doc.get('ocr_profile'), overloaded=self.backlog.overloaded(coll))
+
+    def _save(self, coll, file_id: str, lease: Lease, extracted: dict, duration: float, profile: tuple[str, str]) -> bool:
+        end_time: dt = dt.now()
+        update: dict = {'$push': {'results': {
+            'process': 'Docling',
+            'tier': extracted['tier'],                # "pymupdf", "docling", "ocr" o "mixed"
+            'ocr_backend': extracted['ocr_backend'],  # "no_ocr", "easyocr" o "mixed"
+            'pages': extracted['pages'],              # nivel y backend usados en cada página
+            'data': extracted['text'],
+            'duration': duration,
+            'timings': extracted['timings'],          # segundos por nivel
+            'profile': profile[0],                    # "fast", "balanced" o "accurate"
+            'profile_reason': profile[1],             # "override", "upload", "backlog" o "default"
+            'skipped_pages': extracted['skipped_pages'],
+            'languages': extracted['languages'],      # idiomas de EasyOCR elegidos para el documento
+            'language_source': extracted['language_source'],
+            'conversion_seconds': round(extracted['conversion_seconds'], 3),  # Docling, sin inicialización de modelos
+            'timestamp': end_time.isoformat(timespec='seconds')
+        }}}
+        if lease is not None:
+            if not lease.complete(update):
+                print(f'Lease lost for file_id: {file_id}. Result discarded.')
+                return False
         else:
-            pipeline = PdfPipelineOptions(do_ocr=False)
-            backend_used = "no_ocr"
-
-        converter = DocumentConverter(
-            format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline)}
-        )
+            coll.find_one_and_update({'file_id': file_id}, update)
 
-        stream = DocumentStream(name="input.pdf", stream=BytesIO(pdf_bytes))
-        result = converter.convert(stream)
+        print(f"File with file_id: {file_id} processed correctly. Tier: {extracted['tier']}. Backend: {extracted['ocr_backend']}.")
+        return True
 
-        # Elegí: texto plano o markdown
-        text = result.document.export_to_text()
-        # Si te interesa conservar estructura (títulos, listas, tablas):
-        # text = result.document.export_to_markdown()
-
-        return text, backend_used
-
-    def process(self, file_id: str):
+    def process(self, file_id: str, lease: Lease = None):
         try:
             db: MongoClient = mongoDB_connection()
             database = db['nlp-vitae']
@@ -76,41 +62,51 @@ class Worker:
                 print("No file found with the given file_id.")
                 return None
 
-            file_base64_id: str = file_doc['file_base64_id']
-            fs: GridFS = GridFS(database, collection='documents')
-            fs_file = fs.find_one({'_id': ObjectId(file_base64_id)})
-            file_content: bytes = fs_file.read()
-            decoded_content = base64.b64decode(file_content)
+            decoded_content: bytes = read_document(database, file_doc)
 
-            # 1) Intento SIN OCR (PDF nativo)
-            print('Docling: intentando extracción sin OCR...')
-            text, backend = self._convert_with_docling(decoded_content, do_ocr=False)
+            profile: tuple[str, str] = self._profile(coll, file_doc)
 
-            # 2) Fallback a OCR con EasyOCR si quedó vacío y está habilitado
-            if self.enable_ocr_fallback and not text.strip():
-                print('Docling: texto vacío; reintentando con OCR (EasyOCR)...')
-                text, backend = self._convert_with_docling(
-                    decoded_content,
-                    do_ocr=True,
-                    ocr_backend="easyocr",
-                )
+            # OCR sólo en las páginas que lo necesitan (PDF mixto: nativo + escaneado)
+            extracted: dict = self.pool.extract([decoded_content], profile=profile[0])[0]
 
-            end_time: dt = dt.now()
-            duration: float = (end_time - init_time).total_seconds()
+            duration: float = (dt.now() - init_time).total_seconds()
+            self._save(coll, file_id, lease, extracted, duration, profile)
 
-            coll.find_one_and_update(
-                {'file_id': file_id},
-                {'$push': {'results': {
-                    'process': 'Docling',
-                    'ocr_backend': backend,      # "no_ocr" o "easyocr"
-                    'data': text,
-                    'duration': duration,
-                    'timestamp': end_time.isoformat(timespec='seconds')
-                }}}
-            )
+        except Exception as err:
+            print(f'An exception occurred: {err}')
+            if lease is not None:
+                lease.fail(str(err))
+            return None
 
-            print(f'File with file_id: {file_id} processed correctly. Backend: {backend}.')
+    def process_batch(self, file_ids: list[str], leases: list[Lease]):
+        """
+        Procesa varios PDFs chicos en una sola conversión de Docling. Si el lote falla,
+        se reintenta cada documento por separado para que un PDF roto no arrastre al resto.
+        """
+        if len(file_ids) == 1:
+            return self.process(file_id=file_ids[0], lease=leases[0])
+        try:
+            db: MongoClient = mongoDB_connection()
+            database = db['nlp-vitae']
+            coll = database['files']
+            init_time: dt = dt.now()
 
+            docs: dict = {doc['file_id']: doc for doc in coll.find({'file_id': {'$in': file_ids}})}
+            pdfs: list[bytes] = [read_document(database, docs[file_id]) for file_id in file_ids]
+            # Los documentos de un lote comparten `ocr_profile` (ver Manager._claim_batch).
+            profile: tuple[str, str] = self._profile(coll, docs[file_ids[0]])
+            results: list[dict] = self.pool.extract(pdfs, profile=profile[0])
         except Exception as err:
-            print(f'An exception occurred: {err}')
+            print(f'An exception occurred processing batch of {len(file_ids)} files: {err}. Retrying one by one.')
+            for file_id, lease in zip(file_ids, leases):
+                self.process(file_id=file_id, lease=lease)
             return None
+
+        # Duración del lote repartida entre sus documentos.
+        duration: float = (dt.now() - init_time).total_seconds() / len(file_ids)
+        for file_id, lease, extracted in zip(file_ids, leases, results):
+            try:
+                self._save(coll, file_id, lease, extracted, duration, profile)
+            except Exception as err:
+                print(f'An exception occurred: {err}')
+                lease.fail(str(err))
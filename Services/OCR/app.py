@@ -2,12 +2,35 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from threading import Thread
+import os
 from Components.Utilities.Timer import CustomTimer
+from Components.Utilities.Dispatcher import ChangeStreamWatcher, stage_pipeline
 from Components.Utilities.Manager import Manager
 from Components.Utilities.Worker import Worker
+from Components.Utilities.Pool import ExtractionPool
+from Components.Utilities.Backlog import BacklogMonitor
+from Components.Model.Profiles import FAST, resolve_profile
+from Components.Mongo.mongo_connection import close_connection, pool_stats
 from fastapi.middleware.cors import CORSMiddleware
 
-_timer: CustomTimer = CustomTimer(manager=Manager(worker=Worker()))
+# Con la cola por encima de OCR_BACKLOG_FAST_THRESHOLD se convierte con el perfil rápido.
+_backlog: BacklogMonitor = BacklogMonitor()
+# Pool de procesos de extracción (OCR_POOL_PROCESSES=0: extracción en el mismo proceso).
+# Se precalientan el perfil por defecto y, si puede activarse, el rápido.
+_pool: ExtractionPool = ExtractionPool.from_env(
+    warm_up_profiles=tuple(dict.fromkeys([resolve_profile()[0]] + ([FAST] if _backlog.enabled else [])))
+)
+# Cantidad de workers concurrentes dentro del proceso (cada uno reclama sus propios archivos);
+# por defecto uno por proceso del pool para mantenerlos a todos ocupados.
+_concurrency: int = int(os.getenv('WORKER_CONCURRENCY', str(max(1, _pool.processes))))
+_worker: Worker = Worker(pool=_pool, backlog=_backlog)
+_timers: list[CustomTimer] = [CustomTimer(manager=Manager(worker=_worker)) for _ in range(_concurrency)]
+# Despierta a los workers apenas llega trabajo (change streams); sin replica set quedan en polling.
+_watcher: ChangeStreamWatcher = ChangeStreamWatcher(
+    name='ocr-files',
+    pipeline=stage_pipeline('ocr', previous=None),
+    targets=_timers
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,15 +42,27 @@ async def lifespan(app: FastAPI):
 def onStart():
     try:
         print('Initializing Task (Thread).')
-        _timer.interval = 5
-        _timer.start()
+        # Levanta el pool; cada proceso construye y precalienta sus converters de Docling.
+        try:
+            _pool.start()
+        except Exception as ex:
+            print(f'An exception ocurred starting the OCR pool: {ex}')
+        for _timer in _timers:
+            _timer.interval = float(os.getenv('POLL_MIN_INTERVAL', '1'))
+            _timer.max_interval = float(os.getenv('POLL_MAX_INTERVAL', '30'))
+            _timer.start()
+        _watcher.start()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
 def onStop():
     try:
         print('Ending Task (Thread).')
-        _timer.stop()
+        _watcher.stop()
+        for _timer in _timers:
+            _timer.stop()
+        _pool.shutdown()
+        close_connection()
     except Exception as ex:
         print(f'An exception ocurred: {ex}')
 
@@ -47,6 +82,20 @@ def health() -> JSONResponse:
         content={'status' : 'OCR Service is OK'}
     )
 
+@app.get('/health/mongo', summary='MongoDB pool statistics', description="Returns connection pool statistics of the shared MongoDB client.", tags=['Health'])
+def health_mongo() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={'pool' : pool_stats()}
+    )
+
+@app.get('/metrics', summary='Conversion metrics', description='Returns per-document Docling conversion times (without model initialisation) per converter, aggregated over the OCR pool processes.', tags=['Metrics'])
+def metrics() -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content=_pool.metrics()
+    )
+
 @app.get('/tversion', summary='Tesseract version', description='Returns details of tesseract version installed', tags=['Tesseract'])
 def tversion() -> JSONResponse:
     try:
@@ -6,10 +6,31 @@ function base() {
   return useSettings.getState().baseUrl
 }
 
+type FilesPage = { data?: any[]; pagination?: { next_cursor?: string | null } }
+
+// Recorre todas las páginas de un listado siguiendo `next_cursor`.
+async function allPages(path: string): Promise<{ data: any[] }> {
+  const data: any[] = []
+  let cursor: string | null | undefined = undefined
+  do {
+    const sep = path.includes('?') ? '&' : '?'
+    const page: FilesPage = await api.get<FilesPage>(cursor ? `${path}${sep}cursor=${encodeURIComponent(cursor)}` : path)
+      .catch((err: Error) => {
+        // El listado responde 404 cuando no hay ningún archivo.
+        if (!cursor && err.message.startsWith('HTTP 404')) return {}
+        throw err
+      })
+    data.push(...(page.data ?? []))
+    cursor = page.pagination?.next_cursor
+  } while (cursor)
+  return { data }
+}
+
 export const FilesAPI = {
-  getAll: () => api.get<AnyJson>('/file/all'),
+  // Resumen de todos los archivos (con el array `skills` completo); el JSON del NER se pide por archivo con getById.
+  getAll: () => allPages('/file/all?limit=200&fields=skills&with_total=false'),
   getById: (file_id: string) => api.get<AnyJson>(`/file/filter/id/${encodeURIComponent(file_id)}`),
-  getByDate: (creation_date: string) => api.get<AnyJson>(`/file/filter/date/${encodeURIComponent(creation_date)}`),
+  getByDate: (creation_date: string) => allPages(`/file/filter/date/${encodeURIComponent(creation_date)}?limit=200&fields=skills&with_total=false`),
 }
 
 export const HealthAPI = { check: () => api.get<AnyJson>('/health') }
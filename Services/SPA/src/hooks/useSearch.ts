@@ -133,9 +133,9 @@ export function useSearch() {
       const fileName = file.name || file.filename || file.file_name || 'Archivo sin nombre'
       const fileId = file.file_id || file._id || file.id || Math.random().toString()
       
-      // Extraer contenido NER si existe
-      let content = null
-      if (Array.isArray(file.results)) {
+      // Habilidades canónicas del listado; si el archivo trae `results`, el contenido NER
+      let content = Array.isArray(file.skills) ? file.skills : null
+      if (!content && Array.isArray(file.results)) {
         const nerResult = file.results.find((r: any) => r?.process === 'NER')
         content = nerResult?.data || file.results[0]?.data
       }
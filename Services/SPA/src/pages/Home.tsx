@@ -1,6 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { FilesAPI, HealthAPI, UploadAPI, DownloadAPI, PictureAPI } from '../api/nlpvitae'
-import { useMemo, useState } from 'react'
+import { useMemo, useRef, useState } from 'react'
 import DataTable, { Column } from '../components/DataTable'
 import Modal from '../components/Modal'
 import ExtractedView from '../components/ExtractedView';
@@ -75,6 +75,7 @@ export default function Home(){
   const [viewerData, setViewerData] = useState<any>(null)
 
   const [viewerPicUrl, setViewerPicUrl] = useState<string | undefined>(undefined)
+  const viewerIdRef = useRef<string | undefined>(undefined)
 
 
   const rows = useMemo(() => {
@@ -117,6 +118,20 @@ export default function Home(){
             // 3) recién ahora actualizá el state
             setViewerPicUrl(url)
             setViewerOpen(true)
+
+            // 4) el listado trae sólo el resumen: el JSON del NER se pide (y cachea) por archivo
+            viewerIdRef.current = r.id ? String(r.id) : undefined
+            if (r.id) {
+              const id = String(r.id)
+              qc.fetchQuery({ queryKey:['file', id], queryFn: () => FilesAPI.getById(id) })
+                .then(res => {
+                  // Si mientras tanto se abrió otro archivo, se descarta la respuesta.
+                  if (viewerIdRef.current !== id) return
+                  const full = normalize([((res as AnyRec)?.data ?? res) as AnyRec])[0]
+                  setViewerData(full.extracted ?? full.raw)
+                })
+                .catch(err => console.error('file detail:', err))
+            }
           }}
         >
           Ver datos